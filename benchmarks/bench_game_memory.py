@@ -0,0 +1,41 @@
+"""Measure the memory held by parsed games.
+
+Run from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_game_memory.py
+
+A corpus of 10k games is parsed and kept alive while tracemalloc reports the
+bytes and the number of live allocations attributable to them, along with the
+peak traced memory while parsing.
+"""
+
+import tracemalloc
+
+from bench_lexer import make_game
+
+from style_predictor.pgn_parser.game import get_games
+
+CORPUS_SIZE = 10_000
+
+
+def main():
+    data = make_game(40) * CORPUS_SIZE
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    games = get_games(data)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    size = sum(stat.size_diff for stat in stats)
+    blocks = sum(stat.count_diff for stat in stats)
+    print(f"games parsed:       {len(games)}")
+    print(f"bytes per game:     {size / len(games):.0f}")
+    print(f"allocations/game:   {blocks / len(games):.1f}")
+    print(f"peak while parsing: {peak / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Count the TLS handshakes saved by the pooled http session of a worker.
+
+Run from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_http_pool.py
+
+A local https server stands in for chess.com, with a self-signed certificate
+made by the openssl command. A worker handles TASKS sessions of ARCHIVES
+archives each, first with a new session per task as before, then with the
+pooled session of the process. The server counts the handshakes it completes,
+the client its requests and the connections it opens, through trace hooks
+given to the sessions of the benchmark only.
+"""
+
+import asyncio
+import functools
+import os
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import aiohttp
+import django
+
+TASKS = 20
+ARCHIVES = 24
+CONCURRENCY = 4
+BODY = b'[Event "Live Chess"]\n\n1. e4 e5 1-0\n\n' * 200
+
+stats = {"requests": 0, "connections": 0}
+
+
+async def count_request(*_):
+    stats["requests"] += 1
+
+
+async def count_connection(*_):
+    stats["connections"] += 1
+
+
+trace = aiohttp.TraceConfig()
+trace.on_request_start.append(count_request)
+trace.on_connection_create_end.append(count_connection)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    handshakes = 0
+
+    def setup(self):
+        super().setup()
+        Handler.handshakes += 1
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(directory: str) -> ThreadingHTTPServer:
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1"]
+        + ["-subj", "/CN=127.0.0.1", "-keyout", key, "-out", cert],
+        check=True,
+        capture_output=True,
+    )
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def fetch_archives(session: aiohttp.ClientSession, url: str):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def fetch(month: int):
+        async with semaphore, session.get(f"{url}/{month}/pgn", ssl=False) as resp:
+            _ = await resp.read()
+
+    _ = await asyncio.gather(*(fetch(month) for month in range(ARCHIVES)))
+
+
+async def fresh_sessions(url: str):
+    for _ in range(TASKS):
+        connector = aiohttp.TCPConnector(limit=CONCURRENCY)
+        async with aiohttp.ClientSession(
+            connector=connector, trace_configs=[trace]
+        ) as session:
+            await fetch_archives(session, url)
+
+
+async def pooled_session(url: str):
+    # Imported once django is set up, by main.
+    from style_predictor.apis.pgn.http_pool import (
+        close_aiohttp_session,
+        get_aiohttp_session,
+    )
+
+    traced = functools.partial(aiohttp.ClientSession, trace_configs=[trace])
+    with mock.patch.object(aiohttp, "ClientSession", traced):
+        session = get_aiohttp_session()
+    for _ in range(TASKS):
+        await fetch_archives(get_aiohttp_session(), url)
+    assert get_aiohttp_session() is session  # nosec
+    await close_aiohttp_session()
+
+
+def bench(name: str, run, url: str):
+    Handler.handshakes = 0
+    stats.update(requests=0, connections=0)
+    started = time.perf_counter()
+    asyncio.run(run(url))
+    elapsed = time.perf_counter() - started
+    print(
+        f"{name:<16} {Handler.handshakes:>5} handshakes "
+        f"{Handler.handshakes / TASKS:>6.1f}/task {stats['requests']:>5} requests "
+        f"{stats['connections']:>4} connections {elapsed:>7.2f}s"
+    )
+    return Handler.handshakes
+
+
+def main():
+    _ = os.environ.setdefault("DJANGO_SETTINGS_MODULE", "my_chess_style.settings.dev")
+    django.setup()
+    with tempfile.TemporaryDirectory() as directory:
+        server = start_server(directory)
+        url = f"https://127.0.0.1:{server.server_port}"
+        print(f"{TASKS} tasks of {ARCHIVES} archives, {CONCURRENCY} in flight")
+        fresh = bench("session per task", fresh_sessions, url)
+        pooled = bench("pooled session", pooled_session, url)
+        print(f"handshakes saved: {fresh - pooled} ({1 - pooled / fresh:.0%})")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
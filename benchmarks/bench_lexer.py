@@ -0,0 +1,80 @@
+"""Benchmark the PGN lexer throughput against the size of the input.
+
+Run from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_lexer.py
+
+Both the length of a single game and the number of games in a chunk are scaled.
+Linear lexing keeps games/sec constant as games are added to a chunk and keeps
+moves/sec constant as the movetext of a game grows. The headers only mode is
+compared against full lexing on the same chunk.
+"""
+
+import timeit
+
+from style_predictor.pgn_parser.file_processing import Lexer
+
+HEADER = """[Event "Live Chess"]
+[Site "Chess.com"]
+[White "playerOne"]
+[Black "playerTwo"]
+[Result "1-0"]
+[ECO "C20"]
+[TimeControl "600"]
+
+"""
+MOVE_PAIRS = (
+    "e4 {[%clk 0:09:59.2]} 1... e5 {[%clk 0:09:58.1]}",
+    "Nf3 {[%clk 0:09:57.0]} 2... Nc6 {[%clk 0:09:55.4]}",
+    "Bb5 {[%clk 0:09:50.2]} 3... a6 {[%clk 0:09:49.9]}",
+    "Ba4 {[%clk 0:09:47.7]} 4... Nf6 {[%clk 0:09:45.3]}",
+)
+
+
+def make_game(moves: int) -> str:
+    """Build a game with `moves` full moves, wrapped like an exported PGN."""
+    movetext = [f"{i + 1}. {MOVE_PAIRS[i % len(MOVE_PAIRS)]}" for i in range(moves)]
+    lines = [" ".join(movetext[i : i + 4]) for i in range(0, len(movetext), 4)]
+    return HEADER + "\n".join(lines) + " 1-0\n\n"
+
+
+def bench(data: str, repeat: int = 3, headers_only: bool = False) -> float:
+    """Return the best wall time in seconds to lex `data`."""
+    return min(
+        timeit.repeat(
+            lambda: Lexer(data, headers_only=headers_only).lex(),
+            number=1,
+            repeat=repeat,
+        )
+    )
+
+
+def main():
+    print("Scaling the number of games per chunk (40 moves per game)")
+    print(f"{'games':>8} {'chars':>10} {'seconds':>10} {'games/sec':>12}")
+    game = make_game(40)
+    for count in (100, 200, 400, 800, 1600):
+        data = game * count
+        elapsed = bench(data)
+        print(f"{count:>8} {len(data):>10} {elapsed:>10.4f} {count / elapsed:>12.1f}")
+
+    print()
+    print("Scaling the length of a single game")
+    print(f"{'moves':>8} {'chars':>10} {'seconds':>10} {'moves/sec':>12}")
+    for moves in (250, 500, 1000, 2000, 4000):
+        data = make_game(moves)
+        elapsed = bench(data)
+        print(f"{moves:>8} {len(data):>10} {elapsed:>10.4f} {moves / elapsed:>12.1f}")
+
+    print()
+    print("Full lexing against headers only (1600 games, 40 moves per game)")
+    print(f"{'mode':>14} {'seconds':>10} {'games/sec':>12}")
+    data = game * 1600
+    for headers_only in (False, True):
+        elapsed = bench(data, headers_only=headers_only)
+        mode = "headers only" if headers_only else "full"
+        print(f"{mode:>14} {elapsed:>10.4f} {1600 / elapsed:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
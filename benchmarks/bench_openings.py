@@ -0,0 +1,142 @@
+"""Benchmark opening classification: ply trie against first-move buckets.
+
+Run from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_openings.py
+
+Every opening of data/*.tsv is turned into a game by appending a few moves
+and classified with each approach. The buckets approach is the linear
+`startswith` scan that the trie replaced. The mapped index is the prebuilt
+file written by `import_chess_openings`, its build time is the time to open it.
+The trie and mapped index are given the games as plies, see `to_plies`.
+"""
+
+import glob
+import os
+import random
+import tempfile
+import timeit
+from collections import defaultdict
+from typing import NamedTuple
+
+from style_predictor.openings import (
+    MappedOpeningIndex,
+    OpeningFound,
+    OpeningIndex,
+    to_plies,
+    write_index,
+)
+
+
+class TSVOpening(NamedTuple):
+    eco_code: str
+    full_name: str
+    moves: str
+
+
+def load_openings() -> list[TSVOpening]:
+    """Load the openings, longest moves first like `get_openings_from_cache`."""
+    openings: list[TSVOpening] = []
+    for path in sorted(glob.glob("data/*.tsv")):
+        with open(path, encoding="utf-8") as f:
+            next(f)
+            openings.extend(TSVOpening(*line.strip().split("\t")) for line in f)
+    return sorted(openings, key=lambda opening: -len(opening.moves))
+
+
+def bucket_openings_by_first_move(
+    openings: list[TSVOpening],
+) -> dict[str, list[TSVOpening]]:
+    buckets: dict[str, list[TSVOpening]] = defaultdict(list)
+    for opening in openings:
+        parts = opening.moves.split(" ")
+        key = " ".join(parts[:2]) if len(parts) >= 2 else opening.moves
+        buckets[key].append(opening)
+    return buckets
+
+
+def find_best_opening_by_moves(
+    move_str: str, opening_bucket: dict[str, list[TSVOpening]]
+) -> OpeningFound | None:
+    parts = move_str.split(" ")
+    first_move = " ".join(parts[:2]) if len(parts) >= 2 else move_str
+    candidates = opening_bucket.get(first_move, [])
+    return next(
+        (
+            OpeningFound(opening.eco_code, opening.full_name)
+            for opening in candidates
+            if move_str.startswith(opening.moves)
+        ),
+        None,
+    )
+
+
+def main():
+    openings = load_openings()
+    rng = random.Random(0)
+    games = [
+        f"{opening.moves} {rng.choice(('a3', 'h3', 'Kh1'))} {rng.choice(('a6', 'h6'))}"
+        for opening in openings
+    ] * 5
+    # Games reach the trie as plies, decoded once per game by `PGNGame.plies`.
+    game_plies = [to_plies(g) for g in games]
+
+    build_buckets = min(
+        timeit.repeat(lambda: bucket_openings_by_first_move(openings), number=1)
+    )
+    build_trie = min(timeit.repeat(lambda: OpeningIndex(openings), number=1))
+    buckets = bucket_openings_by_first_move(openings)
+    index = OpeningIndex(openings)
+
+    bucket_results = [find_best_opening_by_moves(g, buckets) for g in games]
+    trie_results = [index.find_by_moves(g) for g in game_plies]
+    mismatches = sum(a != b for a, b in zip(bucket_results, trie_results))
+
+    lookup_buckets = min(
+        timeit.repeat(
+            lambda: [find_best_opening_by_moves(g, buckets) for g in games],
+            number=1,
+            repeat=3,
+        )
+    )
+    lookup_trie = min(
+        timeit.repeat(
+            lambda: [index.find_by_moves(g) for g in game_plies], number=1, repeat=3
+        )
+    )
+    print(f"openings: {len(openings)}, games: {len(games)}, mismatches: {mismatches}")
+    print(f"{'approach':>10} {'build (ms)':>12} {'games/sec':>12}")
+    print(
+        f"{'buckets':>10} {build_buckets * 1000:>12.1f} "
+        f"{len(games) / lookup_buckets:>12.0f}"
+    )
+    print(f"{'trie':>10} {build_trie * 1000:>12.1f} {len(games) / lookup_trie:>12.0f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "openings.idx")
+        write_index(openings, path)
+        open_mapped = min(
+            timeit.repeat(lambda: MappedOpeningIndex.open(path), number=1)
+        )
+        mapped = MappedOpeningIndex.open(path)
+        mismatches = sum(
+            mapped.find_by_moves(g) != expected
+            for g, expected in zip(game_plies, trie_results)
+        )
+        lookup_mapped = min(
+            timeit.repeat(
+                lambda: [mapped.find_by_moves(g) for g in game_plies],
+                number=1,
+                repeat=3,
+            )
+        )
+        print(
+            f"{'mapped':>10} {open_mapped * 1000:>12.1f} "
+            f"{len(games) / lookup_mapped:>12.0f}"
+            f"   (file {os.path.getsize(path) / 1024:.0f} KiB, "
+            f"mismatches: {mismatches})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,5 +2,6 @@
 set -e
 
 . /app/.venv/bin/activate
+python manage.py import_chess_openings --index-only
 
-exec celery -A my_chess_style worker --loglevel=info --without-heartbeat --without-gossip --without-mingle --concurrency=4 -E
+exec celery -A my_chess_style worker --loglevel=info --without-heartbeat --without-gossip --without-mingle --concurrency=${CELERY_WORKER_CONCURRENCY:-4} -E
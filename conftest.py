@@ -0,0 +1,6 @@
+import os
+
+import django
+
+_ = os.environ.setdefault("DJANGO_SETTINGS_MODULE", "my_chess_style.settings.dev")
+django.setup()
@@ -132,6 +132,28 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploads, fetched games and their indexes are written to storage by the web
+# container and read back by the celery workers, so MEDIA_ROOT must be on a
+# volume shared by both (media_files in docker-compose.yml).
+# https://docs.djangoproject.com/en/5.2/ref/settings/#media-root
+MEDIA_ROOT = os.getenv("MEDIA_ROOT") or str(BASE_DIR.parent / "media")
+
+# Uploads larger than FILE_UPLOAD_MAX_MEMORY_SIZE are spooled to a temporary
+# file in FILE_UPLOAD_TEMP_DIR while they are received, rather than in memory.
+# https://docs.djangoproject.com/en/5.2/ref/settings/#file-upload-max-memory-size
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(
+    os.getenv("FILE_UPLOAD_MAX_MEMORY_SIZE", str(2 * 1024 * 1024))
+)
+FILE_UPLOAD_TEMP_DIR = os.getenv("FILE_UPLOAD_TEMP_DIR") or None
+# gzip, bz2, xz and zip uploads are decompressed before their analysis, up to
+# ANALYSIS_MAX_DECOMPRESSED_BYTES of pgn.
+ANALYSIS_MAX_DECOMPRESSED_BYTES = int(
+    os.getenv("ANALYSIS_MAX_DECOMPRESSED_BYTES", str(4 * 1024**3))
+)
+# Stored pgn files are compressed in blocks of PGN_STORAGE_BLOCK_SIZE bytes of
+# pgn, so a chunk of games is read by decompressing only the blocks it spans.
+PGN_STORAGE_BLOCK_SIZE = int(os.getenv("PGN_STORAGE_BLOCK_SIZE", str(1024 * 1024)))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -149,6 +171,89 @@ CELERY_ACCEPT_CONTENT = ["json", "pickle"]
 CELERY_RESULT_ACCEPT_CONTENT = ["json", "pickle"]
 CELERY_TASK_TRACK_STARTED = True
 CELERY_IGNORE_RESULT = False
+CELERY_WORKER_CONCURRENCY = int(os.getenv("CELERY_WORKER_CONCURRENCY", "4"))
+
+# Game analysis chunk planning.
+# Chunks aim to take ANALYSIS_CHUNK_TARGET_SECONDS on one worker process given
+# ANALYSIS_BYTES_PER_SECOND of pgn analysed per process, but never hold fewer
+# than ANALYSIS_CHUNK_MIN_GAMES games. Tune the throughput from the chunk plans
+# recorded on PGNFileUpload.
+ANALYSIS_CHUNK_TARGET_SECONDS = float(os.getenv("ANALYSIS_CHUNK_TARGET_SECONDS", "5"))
+ANALYSIS_CHUNK_MIN_GAMES = int(os.getenv("ANALYSIS_CHUNK_MIN_GAMES", "10"))
+ANALYSIS_BYTES_PER_SECOND = int(
+    os.getenv("ANALYSIS_BYTES_PER_SECOND", str(4 * 1024 * 1024))
+)
+
+# Analysis results of chunks are cached by the hash of their pgn. Each worker
+# process keeps the ANALYSIS_RESULT_CACHE_SIZE most recently used results, and
+# all of them are shared through the cache for ANALYSIS_RESULT_CACHE_TIMEOUT
+# seconds after their last use, at most ANALYSIS_RESULT_CACHE_MAX_ENTRIES of
+# them.
+ANALYSIS_RESULT_CACHE_SIZE = int(os.getenv("ANALYSIS_RESULT_CACHE_SIZE", "256"))
+ANALYSIS_RESULT_CACHE_TIMEOUT = int(
+    os.getenv("ANALYSIS_RESULT_CACHE_TIMEOUT", str(7 * 24 * 60 * 60))
+)
+ANALYSIS_RESULT_CACHE_MAX_ENTRIES = int(
+    os.getenv("ANALYSIS_RESULT_CACHE_MAX_ENTRIES", "100000")
+)
+
+# Analyses of completed chess.com months and of lichess batches are kept for
+# ARCHIVE_RESULT_TTL seconds, after which their games are fetched again.
+ARCHIVE_RESULT_TTL = int(os.getenv("ARCHIVE_RESULT_TTL", str(30 * 24 * 60 * 60)))
+
+# With ANALYSIS_PIPELINE, each chess.com archive is analysed as soon as it is
+# downloaded instead of once all of them are. The state of the pipeline is
+# kept in the cache for ANALYSIS_PIPELINE_TIMEOUT seconds.
+ANALYSIS_PIPELINE = os.getenv("ANALYSIS_PIPELINE", "false").lower() == "true"
+ANALYSIS_PIPELINE_TIMEOUT = int(os.getenv("ANALYSIS_PIPELINE_TIMEOUT", "3600"))
+
+# Lichess games are fetched from the latest game of the previous analysis of a
+# user, less LICHESS_WATERMARK_OVERLAP_SECONDS for the games then in progress.
+# The new games are analysed and cached by batches of LICHESS_BATCH_GAMES.
+LICHESS_WATERMARK_OVERLAP_SECONDS = int(
+    os.getenv("LICHESS_WATERMARK_OVERLAP_SECONDS", str(24 * 60 * 60))
+)
+LICHESS_BATCH_GAMES = int(os.getenv("LICHESS_BATCH_GAMES", "1000"))
+
+# Requests to the chess platforms are limited to FETCH_RATE_LIMITS of
+# (requests per second, burst) across all the workers through a token bucket
+# in RATE_LIMIT_REDIS_URL, kept per process when empty. Throttled requests are
+# retried after a jittered backoff from FETCH_BACKOFF_BASE_SECONDS doubling up
+# to FETCH_BACKOFF_CAP_SECONDS, and halve the requests in flight, at most
+# CHESS_DOT_COM_MAX_CONCURRENCY.
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", REDIS_URI)
+FETCH_RATE_LIMITS = {
+    "chess_dot_com": (
+        float(os.getenv("CHESS_DOT_COM_RATE_LIMIT", "10")),
+        float(os.getenv("CHESS_DOT_COM_BURST", "15")),
+    ),
+    "lichess": (
+        float(os.getenv("LICHESS_RATE_LIMIT", "1")),
+        float(os.getenv("LICHESS_BURST", "2")),
+    ),
+}
+CHESS_DOT_COM_MAX_CONCURRENCY = int(os.getenv("CHESS_DOT_COM_MAX_CONCURRENCY", "15"))
+FETCH_BACKOFF_BASE_SECONDS = float(os.getenv("FETCH_BACKOFF_BASE_SECONDS", "1"))
+FETCH_BACKOFF_CAP_SECONDS = float(os.getenv("FETCH_BACKOFF_CAP_SECONDS", "60"))
+
+# Each worker process keeps up to HTTP_POOL_SIZE connections per host alive for
+# HTTP_KEEPALIVE_SECONDS, shared by all its requests to the chess platforms, and
+# caches the addresses of the hosts for HTTP_DNS_CACHE_SECONDS.
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "15"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "30"))
+HTTP_DNS_CACHE_SECONDS = int(os.getenv("HTTP_DNS_CACHE_SECONDS", "300"))
+
+# chess.com archives of completed months are cached compressed for
+# ARCHIVE_CACHE_TIMEOUT seconds. Past ARCHIVE_CACHE_MAX_BYTES of compressed
+# archives, those of the users analysed the longest ago are evicted.
+ARCHIVE_CACHE_TIMEOUT = int(os.getenv("ARCHIVE_CACHE_TIMEOUT", str(30 * 24 * 60 * 60)))
+ARCHIVE_CACHE_MAX_BYTES = int(
+    os.getenv("ARCHIVE_CACHE_MAX_BYTES", str(512 * 1024 * 1024))
+)
+
+# Prebuilt chess openings index written by `import_chess_openings` and
+# memory-mapped by the celery worker processes.
+OPENINGS_INDEX_PATH = os.getenv("OPENINGS_INDEX_PATH", "data/openings.idx")
 
 CACHES = {
     "default": {
@@ -157,3 +262,16 @@ CACHES = {
         "TIMEOUT": None,
     }
 }
+
+# Which users of the chess.com archive cache were analysed the longest ago is
+# tracked in ARCHIVE_CACHE_REDIS_URL, the redis of the cache by default, and
+# per process when empty.
+ARCHIVE_CACHE_REDIS_URL = os.getenv(
+    "ARCHIVE_CACHE_REDIS_URL", CACHES["default"]["LOCATION"]
+)
+
+# Likewise, which shared analysis results were used the longest ago is tracked
+# in ANALYSIS_RESULT_CACHE_REDIS_URL, and per process when empty.
+ANALYSIS_RESULT_CACHE_REDIS_URL = os.getenv(
+    "ANALYSIS_RESULT_CACHE_REDIS_URL", CACHES["default"]["LOCATION"]
+)
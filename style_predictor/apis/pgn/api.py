@@ -5,24 +5,39 @@ from typing import Any
 
 from berserk.exceptions import ResponseError
 from chessdotcom import ChessDotComClientError
+from django.core.files.base import ContentFile
 from django.http import HttpRequest
 from dotenv import load_dotenv
 from ninja import File, Form, Router, UploadedFile
 
-from style_predictor.apis.pgn.models import RoastRegister
+from style_predictor.apis.pgn.chunked_upload import (
+    ChunkError,
+    append_chunk,
+    file_sha256,
+    parse_content_range,
+    upload_offset,
+)
+from style_predictor.apis.pgn.models import FileSource, PGNFileUpload, RoastRegister
+from style_predictor.apis.pgn.rate_limit import get_fetch_metrics
 from style_predictor.apis.pgn.utils import (
     does_chess_dot_com_player_exists,
     does_lichess_player_exists,
 )
+from style_predictor.pgn_parser.file_processing.decompress import detect_compression
 from style_predictor.schemas import (
+    ChunkedUploadDetails,
     ExternalUser,
+    FinalizeUpload,
     FormDetails,
     MessageError,
 )
 from style_predictor.tasks import (
+    content_sha256,
+    get_result_cache,
+    link_blob,
     pgn_get_chess_com_games_by_user,
-    pgn_get_games_from_file,
     pgn_get_lichess_games_by_user,
+    queue_analysis,
 )
 
 _ = load_dotenv()
@@ -44,14 +59,143 @@ def file_upload(
     <b>:png_file:</b> File with games, either archive/compressed file or .pgn file.
     """
     session_id = uuid.uuid4()
-    username = details.usernames
-    pgn_file.name = str(session_id)
-    _ = pgn_get_games_from_file.delay(session_id, username, pgn_file.read().decode())
-    LOG.info(f"Started processing of session with ID: {session_id}")
+    # Compressed uploads are hashed by the workers once inflated.
+    compressed = detect_compression(pgn_file) is not None
+    upload_file = PGNFileUpload(
+        user=None,
+        session_id=session_id,
+        usernames=details.usernames,
+        source=FileSource.FILE,
+        content_hash=None if compressed else content_sha256(pgn_file.chunks()),
+    )
+    # Django spools large uploads to a temporary file, which is copied to
+    # storage chunk by chunk unless its content is stored already. Only the
+    # session id goes through the broker.
+    if not link_blob(upload_file):
+        upload_file.file.save(str(session_id), pgn_file, save=False)
     _ = RoastRegister(session_id=session_id, include_roast=details.include_roast).save()
+    _ = queue_analysis(upload_file, record_upload=True)
+    LOG.info(f"Started processing of session with ID: {session_id}")
     return {"status_id": str(session_id)}
 
 
+@router.post("/uploads/")
+def create_chunked_upload(request: HttpRequest, details: ChunkedUploadDetails):
+    """Start an upload of a large file, sent in chunks.
+
+    @body
+
+    <b>:usernames:</b> List of usernames used by client in the games separated by '||'
+
+    <b>:size:</b> Size of the file in bytes, if known.
+
+    The chunks are then sent in order with `PUT /uploads/{upload_id}/`, each
+    with its `Content-Range` and the hex sha256 of its bytes in
+    `X-Content-SHA256`. An interrupted upload resumes from the offset returned
+    by `GET /uploads/{upload_id}/`. The analysis starts once the upload is
+    finalized with `POST /uploads/{upload_id}/finalize/`.
+    """
+    session_id = uuid.uuid4()
+    upload_file = PGNFileUpload(
+        user=None,
+        session_id=session_id,
+        usernames=details.usernames,
+        source=FileSource.FILE,
+        upload_complete=False,
+        upload_size=details.size,
+    )
+    upload_file.file.save(str(session_id), ContentFile(b""), save=False)
+    upload_file.save()
+    _ = RoastRegister(session_id=session_id, include_roast=details.include_roast).save()
+    return {"upload_id": str(session_id), "offset": 0}
+
+
+def get_chunked_upload(upload_id: uuid.UUID) -> PGNFileUpload | None:
+    return PGNFileUpload.objects.filter(
+        session_id=upload_id, source=FileSource.FILE
+    ).first()
+
+
+@router.get("/uploads/{upload_id}/", response={200: Any, 404: MessageError})
+def chunked_upload_offset(request: HttpRequest, upload_id: uuid.UUID):
+    """Bytes of the upload received so far, to resume it from."""
+    if (upload_file := get_chunked_upload(upload_id)) is None:
+        return 404, {"message": "Upload not found."}
+    return {
+        "upload_id": str(upload_id),
+        "offset": upload_offset(upload_file),
+        "complete": upload_file.upload_complete,
+    }
+
+
+@router.put(
+    "/uploads/{upload_id}/",
+    response={200: Any, 400: MessageError, 404: MessageError, 409: MessageError},
+)
+def upload_chunk(request: HttpRequest, upload_id: uuid.UUID):
+    """Append a chunk to the upload.
+
+    The body holds the bytes of the chunk, its `Content-Range` header their
+    range in the file and its `X-Content-SHA256` header their hex sha256.
+    Chunks must be sent in order, a chunk already received is acknowledged
+    again.
+    """
+    if (upload_file := get_chunked_upload(upload_id)) is None:
+        return 404, {"message": "Upload not found."}
+    if upload_file.upload_complete:
+        return 409, {"message": "The upload is already finalized."}
+    try:
+        start, end, total = parse_content_range(request.headers.get("Content-Range"))
+        if total is not None and upload_file.upload_size is None:
+            upload_file.upload_size = total
+            upload_file.save(update_fields=["upload_size"])
+        offset = append_chunk(
+            upload_file, start, end, request, request.headers.get("X-Content-SHA256")
+        )
+    except ChunkError as e:
+        return e.status, {"message": e.message}
+    return {"upload_id": str(upload_id), "offset": offset}
+
+
+@router.post(
+    "/uploads/{upload_id}/finalize/",
+    response={200: Any, 400: MessageError, 404: MessageError, 409: MessageError},
+)
+def finalize_chunked_upload(
+    request: HttpRequest, upload_id: uuid.UUID, details: FinalizeUpload
+):
+    """Complete the upload and start its analysis.
+
+    @body
+
+    <b>:sha256:</b> Hex sha256 of the whole file, checked when given.
+    """
+    if (upload_file := get_chunked_upload(upload_id)) is None:
+        return 404, {"message": "Upload not found."}
+    if upload_file.upload_complete:
+        return 409, {"message": "The upload is already finalized."}
+    offset = upload_offset(upload_file)
+    if upload_file.upload_size is not None and offset != upload_file.upload_size:
+        return 400, {
+            "message": f"Received {offset} of {upload_file.upload_size} bytes."
+        }
+    content_hash = file_sha256(upload_file)
+    if details.sha256 and content_hash != details.sha256.lower():
+        return 400, {"message": "The upload does not match its checksum."}
+    upload_file.upload_complete = True
+    with upload_file.file.open("rb") as f:
+        compressed = detect_compression(f) is not None
+    # Compressed uploads are hashed by the workers once inflated.
+    if not compressed:
+        upload_file.content_hash = content_hash
+        chunks_name = upload_file.file.name
+        if link_blob(upload_file):
+            upload_file.file.storage.delete(chunks_name)
+    _ = queue_analysis(upload_file, record_upload=True)
+    LOG.info(f"Started processing of session with ID: {upload_id}")
+    return {"status_id": str(upload_id)}
+
+
 @router.post("/external_user/", response={200: Any, 404: MessageError})
 def external_user(request: HttpRequest, external_user: ExternalUser):
     """Get games by users from various chess platforms( currently Lichess, Chess.com)
@@ -66,13 +210,15 @@ def external_user(request: HttpRequest, external_user: ExternalUser):
             if not does_chess_dot_com_player_exists(external_user.username):
                 return 404, {"message": "User has not been found on Chess.com"}
             session_id = uuid.uuid4()
+            # Saved first, as the analysis may reuse a finished session and
+            # look the roast up before this returns.
+            _ = RoastRegister(
+                session_id=session_id, include_roast=external_user.include_roast
+            ).save()
             _ = pgn_get_chess_com_games_by_user.delay(
                 session_id, external_user.username
             )
             LOG.info(f"Started processing of session with ID: {session_id}")
-            _ = RoastRegister(
-                session_id=session_id, include_roast=external_user.include_roast
-            ).save()
             return {"status_id": str(session_id)}
         except ChessDotComClientError as e:
             return e.status_code, {"message": json.loads(e.text)["message"]}
@@ -82,11 +228,20 @@ def external_user(request: HttpRequest, external_user: ExternalUser):
             if not does_lichess_player_exists(external_user.username):
                 return 404, {"message": "User has not been found on Lichess"}
             session_id = uuid.uuid4()
-            _ = pgn_get_lichess_games_by_user.delay(session_id, external_user.username)
-            LOG.info(f"Started processing of session with ID: {session_id}")
             _ = RoastRegister(
                 session_id=session_id, include_roast=external_user.include_roast
             ).save()
+            _ = pgn_get_lichess_games_by_user.delay(session_id, external_user.username)
+            LOG.info(f"Started processing of session with ID: {session_id}")
             return {"status_id": str(session_id)}
         except ResponseError as e:
             return e.status_code, {"message": e.reason}
+
+
+@router.get("/fetch_metrics/")
+def fetch_metrics(request: HttpRequest):
+    """Requests made to each chess platform, how many were throttled and the
+    milliseconds spent waiting for the rate limits, along with the hits and
+    misses of the analysis result cache.
+    """
+    return {**get_fetch_metrics(), "result_cache": get_result_cache().stats()}
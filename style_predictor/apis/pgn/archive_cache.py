@@ -0,0 +1,295 @@
+import logging
+import time
+import zlib
+from collections.abc import Iterable
+from urllib.parse import urlparse
+
+import redis
+from django.core.cache import BaseCache
+
+LOG = logging.getLogger(__name__)
+
+# Bumped whenever the format of the stored archives changes.
+ARCHIVE_CACHE_VERSION = 1
+ARCHIVE_CACHE_PREFIX = "archive"
+COMPRESSION_LEVEL = 6
+
+# Records an archive of a user and marks the user as the most recently used.
+# Users past their expiry are dropped, then the least recently used users
+# other than this one until the archives hold at most the cap.
+# KEYS: the least recently used order, the expiries, the totals and the
+# archives of the user. ARGV: the user, the url of the archive, its compressed
+# and raw sizes, the timeout ("" for none), the cap and the prefix of the keys
+# of the archives of each user.
+# Returns the urls of the evicted archives.
+RECORD_ARCHIVE_SCRIPT = """
+local lru, expires, totals, archives = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local owner, url = ARGV[1], ARGV[2]
+local size, raw = tonumber(ARGV[3]), tonumber(ARGV[4])
+local timeout, max_bytes, prefix = tonumber(ARGV[5]), tonumber(ARGV[6]), ARGV[7]
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local function forget(entry)
+    local old_size, old_raw = string.match(entry, "(%d+):(%d+)")
+    redis.call("HINCRBY", totals, "bytes", -tonumber(old_size))
+    redis.call("HINCRBY", totals, "raw_bytes", -tonumber(old_raw))
+    redis.call("HINCRBY", totals, "archives", -1)
+end
+
+local function drop(user, evicted)
+    local key = prefix .. user
+    local entries = redis.call("HGETALL", key)
+    for i = 1, #entries, 2 do
+        forget(entries[i + 1])
+        if evicted then
+            table.insert(evicted, entries[i])
+        end
+    end
+    redis.call("DEL", key)
+    redis.call("ZREM", lru, user)
+    redis.call("ZREM", expires, user)
+end
+
+for _, user in ipairs(redis.call("ZRANGEBYSCORE", expires, "-inf", now)) do
+    drop(user, nil)
+end
+
+local old = redis.call("HGET", archives, url)
+if old then
+    forget(old)
+end
+redis.call("HSET", archives, url, size .. ":" .. raw)
+redis.call("HINCRBY", totals, "bytes", size)
+redis.call("HINCRBY", totals, "raw_bytes", raw)
+redis.call("HINCRBY", totals, "archives", 1)
+redis.call("ZADD", lru, now, owner)
+if timeout then
+    redis.call("ZADD", expires, now + timeout, owner)
+end
+
+local evicted = {}
+while (tonumber(redis.call("HGET", totals, "bytes")) or 0) > max_bytes do
+    local user = nil
+    for _, oldest in ipairs(redis.call("ZRANGE", lru, 0, 1)) do
+        if oldest ~= owner then
+            user = oldest
+            break
+        end
+    end
+    if not user then
+        break
+    end
+    drop(user, evicted)
+end
+return evicted
+"""
+
+# Marks the users in ARGV as the most recently used, if they are still cached.
+TOUCH_USERS_SCRIPT = """
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+for _, user in ipairs(ARGV) do
+    redis.call("ZADD", KEYS[1], "XX", now, user)
+end
+"""
+
+
+def archive_owner(url: str) -> str:
+    """Get the username in the url of a chess.com archive.
+
+    Args:
+        url: e.g. https://api.chess.com/pub/player/{username}/games/2024/01
+
+    Returns:
+        The username in lower case, or the url itself for other urls.
+    """
+    parts = urlparse(url).path.split("/")
+    try:
+        return parts[parts.index("player") + 1].lower()
+    except (ValueError, IndexError):
+        return url
+
+
+class ArchiveCache:
+    """Compressed cache of the chess.com archives of completed months.
+
+    Archives are stored zlib compressed for `timeout` seconds. The compressed
+    bytes of the archives of each user are accounted, along with when the
+    user's archives were last used. When the archives of all the users exceed
+    `max_bytes`, those of the users not seen for the longest are evicted.
+
+    The accounting lives in this process, so each process only evicts the
+    archives it stored. See `RedisArchiveCache` for one shared by all the
+    workers.
+    """
+
+    def __init__(self, backend: BaseCache, max_bytes: int, timeout: int | None):
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        # Archives of each user, as url to [compressed, raw] size.
+        self._archives: dict[str, dict[str, list[int]]] = {}
+        self._last_access: dict[str, float] = {}
+        self._expires: dict[str, float] = {}
+
+    def _key(self, url: str) -> str:
+        return f"{ARCHIVE_CACHE_PREFIX}:{ARCHIVE_CACHE_VERSION}:{url}"
+
+    def get_many(self, urls: Iterable[str]) -> dict[str, str]:
+        """Get the archives stored for `urls` in a single round trip.
+
+        Args:
+            urls: urls of the archives.
+
+        Returns:
+            dict of url to the pgn of the archive, for the archives found.
+        """
+        keys = {self._key(url): url for url in urls}
+        if not keys:
+            return {}
+        try:
+            values = self.backend.get_many(list(keys))
+        except Exception as exc:
+            LOG.warning(f"Archive cache unavailable: {exc}")
+            return {}
+        archives = {
+            keys[key]: zlib.decompress(data).decode("utf-8")
+            for key, data in values.items()
+        }
+        if archives:
+            self._touch({archive_owner(url) for url in archives})
+        return archives
+
+    def set(self, url: str, pgn: str):
+        """Store the archive at `url`, evicting other archives when over the cap."""
+        raw = pgn.encode("utf-8")
+        data = zlib.compress(raw, COMPRESSION_LEVEL)
+        try:
+            self.backend.set(self._key(url), data, self.timeout)
+        except Exception as exc:
+            LOG.warning(f"Archive cache unavailable: {exc}")
+            return
+        evicted = self._record(archive_owner(url), url, len(data), len(raw))
+        if not evicted:
+            return
+        try:
+            self.backend.delete_many([self._key(url) for url in evicted])
+        except Exception as exc:
+            LOG.warning(f"Archive cache unavailable: {exc}")
+        LOG.info(
+            f"Evicted {len(evicted)} archives to keep under {self.max_bytes} bytes."
+        )
+
+    def _touch(self, owners: Iterable[str]):
+        """Mark the archives of `owners` as just used."""
+        now = time.time()
+        for owner in self._last_access.keys() & set(owners):
+            self._last_access[owner] = now
+
+    def _record(self, owner: str, url: str, size: int, raw: int) -> list[str]:
+        """Account the archive at `url` of `owner`, of `size` compressed bytes.
+
+        Returns:
+            The urls of the archives to evict.
+        """
+        now = time.time()
+        for user in [u for u, expires in self._expires.items() if expires < now]:
+            self._drop(user)
+        self._archives.setdefault(owner, {})[url] = [size, raw]
+        self._last_access[owner] = now
+        if self.timeout is not None:
+            self._expires[owner] = now + self.timeout
+        total = self.stats()["bytes"]
+        evicted: list[str] = []
+        for user in sorted(self._last_access, key=self._last_access.__getitem__):
+            if total <= self.max_bytes:
+                break
+            if user != owner:
+                urls = self._drop(user)
+                total -= sum(size for size, _ in urls.values())
+                evicted.extend(urls)
+        return evicted
+
+    def _drop(self, owner: str) -> dict[str, list[int]]:
+        self._last_access.pop(owner, None)
+        self._expires.pop(owner, None)
+        return self._archives.pop(owner, {})
+
+    def stats(self) -> dict[str, int]:
+        """Memory used by the cached archives, compressed and not."""
+        sizes = [size for urls in self._archives.values() for size in urls.values()]
+        return {
+            "users": len(self._archives),
+            "archives": len(sizes),
+            "bytes": sum(size for size, _ in sizes),
+            "raw_bytes": sum(raw for _, raw in sizes),
+        }
+
+
+class RedisArchiveCache(ArchiveCache):
+    """Archive cache accounted in redis, so the cap holds across all the workers.
+
+    The users are kept in a sorted set by when their archives were last used
+    and the archives of each user in a hash of their sizes, so recording an
+    archive and evicting the least recently used users is a single atomic call
+    whatever the number of users. Archives are stored without accounting when
+    redis is unavailable.
+    """
+
+    def __init__(
+        self,
+        backend: BaseCache,
+        client: redis.Redis,
+        max_bytes: int,
+        timeout: int | None,
+    ):
+        super().__init__(backend, max_bytes, timeout)
+        self.client = client
+        self._record_script = client.register_script(RECORD_ARCHIVE_SCRIPT)
+        self._touch_script = client.register_script(TOUCH_USERS_SCRIPT)
+
+    def _state_key(self, name: str) -> str:
+        return f"{ARCHIVE_CACHE_PREFIX}:{ARCHIVE_CACHE_VERSION}:{name}"
+
+    def _touch(self, owners: Iterable[str]):
+        try:
+            self._touch_script(keys=[self._state_key("lru")], args=sorted(owners))
+        except redis.RedisError as exc:
+            LOG.warning(f"Archive cache accounting unavailable: {exc}")
+
+    def _record(self, owner: str, url: str, size: int, raw: int) -> list[str]:
+        try:
+            evicted = self._record_script(
+                keys=[
+                    self._state_key("lru"),
+                    self._state_key("expires"),
+                    self._state_key("totals"),
+                    self._state_key(f"user:{owner}"),
+                ],
+                args=[
+                    owner,
+                    url,
+                    size,
+                    raw,
+                    "" if self.timeout is None else self.timeout,
+                    self.max_bytes,
+                    self._state_key("user:"),
+                ],
+            )
+        except redis.RedisError as exc:
+            LOG.warning(f"Archive cache accounting unavailable: {exc}")
+            return []
+        return [url.decode("utf-8") for url in evicted]
+
+    def stats(self) -> dict[str, int]:
+        with self.client.pipeline(transaction=False) as pipe:
+            _ = pipe.zcard(self._state_key("lru"))
+            _ = pipe.hgetall(self._state_key("totals"))
+            users, totals = pipe.execute()
+        return {
+            "users": users,
+            "archives": int(totals.get(b"archives", 0)),
+            "bytes": int(totals.get(b"bytes", 0)),
+            "raw_bytes": int(totals.get(b"raw_bytes", 0)),
+        }
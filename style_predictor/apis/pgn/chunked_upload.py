@@ -0,0 +1,109 @@
+import hashlib
+import re
+from typing import IO
+
+from style_predictor.apis.pgn.models import PGNFileUpload
+
+content_range_pattern = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+# Bytes read from the request at a time, so chunks of any size are appended
+# in constant memory.
+READ_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    """A chunk that cannot be appended to the upload, answered with `status`."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def parse_content_range(header: str | None) -> tuple[int, int, int | None]:
+    """Parse the Content-Range header of a chunk.
+
+    Args:
+        header: e.g. `bytes 0-1048575/5242880`, the total may be `*`.
+
+    Returns:
+        (start, end, total) of the chunk, end being exclusive and total None
+        when not given.
+
+    Raises:
+        ChunkError: if the header is missing or invalid.
+    """
+    match = content_range_pattern.match(header or "")
+    if match is None:
+        raise ChunkError(400, "Content-Range must be `bytes <start>-<end>/<total>`.")
+    start, last = int(match[1]), int(match[2])
+    if last < start:
+        raise ChunkError(400, "Content-Range ends before it starts.")
+    total = None if match[3] == "*" else int(match[3])
+    return start, last + 1, total
+
+
+def upload_offset(upload_file: PGNFileUpload) -> int:
+    """Bytes of the upload received so far, the next chunk starts there."""
+    return upload_file.file.storage.size(upload_file.file.name)
+
+
+def append_chunk(
+    upload_file: PGNFileUpload,
+    start: int,
+    end: int,
+    stream: IO[bytes],
+    sha256: str | None,
+) -> int:
+    """Append the bytes from `start` to `end` of the upload, read from `stream`.
+
+    Chunks already received are acknowledged without being written again, so
+    that clients can retry a chunk whose response was lost. A chunk whose
+    checksum does not match is discarded.
+
+    Args:
+        upload_file: upload being received.
+        start: offset of the first byte of the chunk.
+        end: offset after the last byte of the chunk.
+        stream: body of the request.
+        sha256: hex digest of the chunk sent by the client.
+
+    Returns:
+        Bytes of the upload received, including the chunk.
+
+    Raises:
+        ChunkError: if the chunk does not start at the offset received so far,
+            goes past the size of the upload or does not match its checksum.
+    """
+    offset = upload_offset(upload_file)
+    if end <= offset:
+        return offset
+    if start != offset:
+        raise ChunkError(409, f"Expected a chunk starting at byte {offset}.")
+    if upload_file.upload_size is not None and end > upload_file.upload_size:
+        raise ChunkError(400, f"The upload has {upload_file.upload_size} bytes.")
+    if not sha256:
+        raise ChunkError(400, "X-Content-SHA256 of the chunk is required.")
+
+    digest = hashlib.sha256()
+    received = 0
+    with upload_file.file.storage.open(upload_file.file.name, "r+b") as f:
+        f.seek(start)
+        while received < end - start and (
+            data := stream.read(min(READ_SIZE, end - start - received))
+        ):
+            digest.update(data)
+            f.write(data)
+            received += len(data)
+        if received != end - start or digest.hexdigest() != sha256.lower():
+            f.truncate(start)
+            raise ChunkError(400, "The chunk does not match its range or checksum.")
+    return end
+
+
+def file_sha256(upload_file: PGNFileUpload) -> str:
+    """Hex digest of the bytes of the upload received so far."""
+    digest = hashlib.sha256()
+    with upload_file.file.storage.open(upload_file.file.name, "rb") as f:
+        while data := f.read(READ_SIZE):
+            digest.update(data)
+    return digest.hexdigest()
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+from functools import lru_cache
+from weakref import WeakKeyDictionary, WeakSet
+
+import aiohttp
+import palitra
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+LOG = logging.getLogger(__name__)
+
+USER_AGENT = "My Chess Style App"
+headers = {
+    "User-Agent": USER_AGENT,
+    "Accept-Encoding": "gzip",
+    "Accept": "application/json, text/plain, */*",
+}
+
+# One pooled session per event loop, the workers run every coroutine on the
+# single loop of palitra so they hold one.
+_sessions: WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession] = (
+    WeakKeyDictionary()
+)
+# Synchronous sessions reusing the connections of the pool, closed with it.
+_mounted: WeakSet[requests.Session] = WeakSet()
+
+
+def pooled_adapter() -> HTTPAdapter:
+    """Adapter keeping up to HTTP_POOL_SIZE connections alive per host."""
+    return HTTPAdapter(
+        pool_connections=settings.HTTP_POOL_SIZE,
+        pool_maxsize=settings.HTTP_POOL_SIZE,
+    )
+
+
+def mount_pool(session: requests.Session) -> requests.Session:
+    """Make `session` reuse the connections of the pool."""
+    adapter = pooled_adapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    _mounted.add(session)
+    return session
+
+
+@lru_cache(maxsize=1)
+def get_requests_session() -> requests.Session:
+    """Get the http session of this process for the synchronous requests."""
+    session = mount_pool(requests.Session())
+    session.headers.update(headers)
+    return session
+
+
+def get_aiohttp_session() -> aiohttp.ClientSession:
+    """Get the http session of the running event loop.
+
+    The connections are kept alive for HTTP_KEEPALIVE_SECONDS and the
+    resolved addresses cached for HTTP_DNS_CACHE_SECONDS, so the archives of
+    every task handled by the worker go through the same connections.
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=settings.HTTP_POOL_SIZE,
+            keepalive_timeout=settings.HTTP_KEEPALIVE_SECONDS,
+            use_dns_cache=True,
+            ttl_dns_cache=settings.HTTP_DNS_CACHE_SECONDS,
+        )
+        session = aiohttp.ClientSession(connector=connector, headers=headers)
+        _sessions[loop] = session
+    return session
+
+
+async def close_aiohttp_session():
+    """Close the http session of the running event loop, if any."""
+    if (session := _sessions.pop(asyncio.get_running_loop(), None)) is not None:
+        await session.close()
+
+
+async def open_aiohttp_session():
+    _ = get_aiohttp_session()
+
+
+def open_http_pool():
+    """Open the sessions of this process, on the loop of palitra for aiohttp."""
+    _ = get_requests_session()
+    palitra.run(open_aiohttp_session())
+
+
+def close_http_pool():
+    """Close the sessions of this process and their connections."""
+    if palitra.is_runner_alive():
+        palitra.run(close_aiohttp_session())
+    for session in list(_mounted):
+        session.close()
+    get_requests_session.cache_clear()
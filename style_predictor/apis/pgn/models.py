@@ -25,6 +25,19 @@ class PGNFileUpload(TimeStampedModel):
     session_id = models.UUIDField(default=uuid.uuid4, editable=False)
     usernames = models.TextField(null=True, blank=True)
     source = models.IntegerField(choices=FileSource.choices, default=FileSource.FILE)
+    chunk_plan = models.JSONField(null=True, blank=True)
+    # [result_key, start, end] of the completed monthly archives in the file,
+    # their analysis is cached under result_key once done.
+    archive_ranges = models.JSONField(null=True, blank=True)
+    # Analyses of the archives found in the cache, merged with those of the file.
+    cached_results = models.JSONField(null=True, blank=True)
+    # Chunked uploads are analysed once finalized, with upload_size bytes when
+    # the client declared it.
+    upload_complete = models.BooleanField(default=True)
+    upload_size = models.BigIntegerField(null=True, blank=True)
+    # sha256 of the games as received. Sessions with the same content share
+    # its stored file, and the analysis of a finished one.
+    content_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True)
 
     @override
     def __str__(self) -> str:
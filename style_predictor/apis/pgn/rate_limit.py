@@ -0,0 +1,323 @@
+import asyncio
+import functools
+import logging
+import random
+import time
+from collections.abc import AsyncIterator, Sequence
+from contextlib import asynccontextmanager
+
+import redis
+from django.conf import settings
+from django.core.cache import BaseCache, cache
+
+LOG = logging.getLogger(__name__)
+
+METRICS_PREFIX = "fetch-metrics"
+METRIC_NAMES = ("requests", "throttled_responses", "throttled_ms")
+
+# Refills the bucket for the time since the last request and takes a token.
+# Returns the seconds to wait for a token, the token is not taken then. The
+# time is read from redis so that the clocks of the workers do not matter.
+TAKE_TOKEN_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class TokenBucket:
+    """Token bucket allowing `rate` requests per second, in bursts of `capacity`.
+
+    The bucket lives in this process, see `RedisTokenBucket` for one shared by
+    all the workers.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._ts: float | None = None
+
+    def take(self, now: float) -> float:
+        """Take a token at time `now`.
+
+        Returns:
+            0 when a token was taken, else the seconds until one is available.
+        """
+        ts = now if self._ts is None else self._ts
+        tokens = min(self.capacity, self._tokens + max(0.0, now - ts) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._tokens, self._ts = tokens, now
+        return wait
+
+    def take_now(self) -> float:
+        """Take a token at the current time, see `take`."""
+        return self.take(time.time())
+
+    async def take_async(self) -> float:
+        """Take a token at the current time without blocking the event loop."""
+        return self.take_now()
+
+    async def acquire(self) -> float:
+        """Wait for a token.
+
+        Returns:
+            The seconds waited.
+        """
+        waited = 0.0
+        while wait := await self.take_async():
+            await asyncio.sleep(wait)
+            waited += wait
+        return waited
+
+    def acquire_sync(self) -> float:
+        """Wait for a token, blocking the thread."""
+        waited = 0.0
+        while wait := self.take_now():
+            time.sleep(wait)
+            waited += wait
+        return waited
+
+
+class RedisTokenBucket(TokenBucket):
+    """Token bucket kept in redis, so the limit holds across all the workers.
+
+    Requests go through when redis is unavailable, rather than stalling the
+    fetches.
+    """
+
+    def __init__(self, client: redis.Redis, key: str, rate: float, capacity: float):
+        super().__init__(rate, capacity)
+        self.key = key
+        self._script = client.register_script(TAKE_TOKEN_SCRIPT)
+
+    def take(self, now: float) -> float:
+        """Take a token, `now` is not used as the time is read from redis."""
+        return self.take_now()
+
+    def take_now(self) -> float:
+        try:
+            return float(self._script(keys=[self.key], args=[self.rate, self.capacity]))
+        except redis.RedisError as exc:
+            LOG.warning(f"Rate limit {self.key} unavailable: {exc}")
+            return 0.0
+
+    async def take_async(self) -> float:
+        # The redis client blocks, so the script runs in a thread.
+        return await asyncio.to_thread(self.take_now)
+
+
+def backoff_delay(
+    attempt: int, base: float, cap: float, rng: random.Random | None = None
+) -> float:
+    """Exponential backoff with full jitter.
+
+    Args:
+        attempt: number of the retry, from 0.
+        base: delay of the first retry.
+        cap: longest delay.
+        rng: source of the jitter.
+
+    Returns:
+        Seconds to wait, uniformly drawn up to `base * 2 ** attempt`.
+    """
+    return (rng or random).uniform(0, min(cap, base * 2**attempt))
+
+
+class AdaptiveConcurrency:
+    """Limit of the requests in flight, adapted to throttling by the server.
+
+    The limit grows by one once as many requests as the limit succeed in a row
+    (additive increase) and is halved on every throttled request
+    (multiplicative decrease). The limit outlives the event loops of the
+    batches of requests, so one is kept per process and platform.
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int | None = None):
+        self.minimum = minimum
+        self.maximum = maximum or initial
+        self.limit = float(initial)
+        self.in_flight = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._condition = asyncio.Condition()
+
+    def _get_condition(self) -> asyncio.Condition:
+        # A condition only serves the event loop it was first used in.
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self._condition = loop, asyncio.Condition()
+        return self._condition
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one of the requests in flight."""
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with condition:
+                self.in_flight -= 1
+                condition.notify_all()
+
+    def on_success(self):
+        self.limit = min(self.maximum, self.limit + 1 / int(self.limit))
+
+    def on_throttle(self):
+        self.limit = max(self.minimum, self.limit / 2)
+
+
+class FetchMetrics:
+    """Counters of the requests to a platform, shared by all the workers
+    through the `backend` cache.
+    """
+
+    def __init__(self, name: str, backend: BaseCache):
+        self.name = name
+        self.backend = backend
+
+    def _key(self, metric: str) -> str:
+        return f"{METRICS_PREFIX}:{self.name}:{metric}"
+
+    def incr(self, metric: str, delta: int = 1):
+        key = self._key(metric)
+        try:
+            self.backend.add(key, 0, None)
+            self.backend.incr(key, delta)
+        except Exception as exc:
+            LOG.warning(f"Fetch metric {key} not recorded: {exc}")
+
+    def record_request(self, throttled_seconds: float = 0.0):
+        """Count a request and the time spent waiting for the rate limit to allow it."""
+        self.incr("requests")
+        if throttled_seconds:
+            self.incr("throttled_ms", int(throttled_seconds * 1000))
+
+    def record_throttle(self, seconds: float):
+        """Count a request throttled by the server and the time backing off.
+
+        The request itself was counted when it was made.
+        """
+        self.incr("throttled_responses")
+        if seconds:
+            self.incr("throttled_ms", int(seconds * 1000))
+
+    def get(self, names: Sequence[str] = METRIC_NAMES) -> dict[str, int]:
+        """Get the counters `names`, `throttled_ms` being the time spent waiting."""
+        try:
+            values = self.backend.get_many([self._key(metric) for metric in names])
+        except Exception as exc:
+            LOG.warning(f"Fetch metrics of {self.name} unavailable: {exc}")
+            values = {}
+        return {metric: values.get(self._key(metric), 0) for metric in names}
+
+
+class RateLimiter:
+    """Limits the requests to a platform: a shared token bucket for the rate,
+    an adaptive limit of the requests in flight and jittered backoff when
+    throttled anyway.
+    """
+
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        concurrency: AdaptiveConcurrency,
+        metrics: FetchMetrics,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 60.0,
+    ):
+        self.bucket = bucket
+        self.concurrency = concurrency
+        self.metrics = metrics
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+    @asynccontextmanager
+    async def request(self) -> AsyncIterator[None]:
+        """Wait for the limits to allow a request and hold it while it is made."""
+        async with self.concurrency.slot():
+            waited = await self.bucket.acquire()
+            self.metrics.record_request(throttled_seconds=waited)
+            yield
+
+    def on_success(self):
+        self.concurrency.on_success()
+
+    async def on_throttle(self, attempt: int, retry_after: str | None = None):
+        """Back off after the server throttled a request.
+
+        Args:
+            attempt: number of the retry, from 0.
+            retry_after: value of the Retry-After header, when sent.
+        """
+        self.concurrency.on_throttle()
+        delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        LOG.info(
+            f"Throttled by {self.metrics.name}, retrying in {delay:.1f}s with "
+            f"{int(self.concurrency.limit)} requests in flight."
+        )
+        self.metrics.record_throttle(delay)
+        await asyncio.sleep(delay)
+
+
+@functools.cache
+def get_token_bucket(name: str) -> TokenBucket:
+    """Get the token bucket of a platform, shared through redis when configured."""
+    rate, capacity = settings.FETCH_RATE_LIMITS[name]
+    if not settings.RATE_LIMIT_REDIS_URL:
+        return TokenBucket(rate, capacity)
+    client = redis.Redis.from_url(settings.RATE_LIMIT_REDIS_URL)
+    return RedisTokenBucket(client, f"rate-limit:{name}", rate, capacity)
+
+
+@functools.cache
+def get_concurrency(name: str, concurrency: int) -> AdaptiveConcurrency:
+    """Get the limit of the requests in flight to a platform in this process,
+    so that a throttled batch of requests slows down the next ones too.
+    """
+    return AdaptiveConcurrency(concurrency)
+
+
+def get_rate_limiter(name: str, concurrency: int) -> RateLimiter:
+    """Get a rate limiter for a batch of requests to a platform.
+
+    Args:
+        name: platform, a key of `settings.FETCH_RATE_LIMITS`.
+        concurrency: most requests in flight.
+    """
+    return RateLimiter(
+        get_token_bucket(name),
+        get_concurrency(name, concurrency),
+        FetchMetrics(name, cache),
+        backoff_base=settings.FETCH_BACKOFF_BASE_SECONDS,
+        backoff_cap=settings.FETCH_BACKOFF_CAP_SECONDS,
+    )
+
+
+def get_fetch_metrics() -> dict[str, dict[str, int]]:
+    """Get the counters of the requests to each platform."""
+    return {
+        name: FetchMetrics(name, cache).get() for name in settings.FETCH_RATE_LIMITS
+    }
@@ -1,27 +1,41 @@
 import asyncio
 import logging
 import os
-from datetime import datetime
+import re
+import time
+from collections.abc import AsyncIterator, Iterator
+from datetime import UTC, datetime
+from functools import lru_cache
 
 import aiohttp
 import berserk
-from chessdotcom import ChessDotComClient
+import redis
+from chessdotcom import ChessDotComClientError
+from django.conf import settings
 from django.core.cache import cache
 from dotenv import load_dotenv
 
+from style_predictor.apis.pgn.archive_cache import ArchiveCache, RedisArchiveCache
+from style_predictor.apis.pgn.http_pool import (
+    get_aiohttp_session,
+    get_requests_session,
+    mount_pool,
+)
+from style_predictor.apis.pgn.rate_limit import (
+    RateLimiter,
+    backoff_delay,
+    get_rate_limiter,
+)
+
 LOG = logging.getLogger(__name__)
 
 _ = load_dotenv()
-headers = {
-    "User-Agent": "My Chess Style App",
-    "Accept-Encoding": "gzip",
-    "Accept": "application/json, text/plain, */*",
-}
-session = berserk.TokenSession(os.getenv("LICHESS_API_KEY", ""))
-chessdotcomClient: ChessDotComClient = ChessDotComClient(
-    user_agent="My Chess Style App"
-)
+session = mount_pool(berserk.TokenSession(os.getenv("LICHESS_API_KEY", "")))
 lichessClient = berserk.Client(session=session)
+CHESS_DOT_COM_API = "https://api.chess.com/pub"
+# Exports of the games of a player retried when throttled by lichess.
+LICHESS_MAX_ATTEMPTS = 5
+lichess_tag_pattern = re.compile(r'^\[(Site|UTCDate|UTCTime) "([^"]*)"\]', re.MULTILINE)
 
 
 def does_lichess_player_exists(username: str):
@@ -57,18 +71,92 @@ def does_lichess_player_exists(username: str):
     return is_present
 
 
-def get_lichess_games(username: str) -> str:
-    """Get all games of `username` from lichess platform.
+def iter_lichess_games(username: str, since: int | None = None) -> Iterator[str]:
+    """Stream the games of `username` from lichess platform, newest first.
 
     Args:
         username: Username of user to get games from lichess.
+        since: only get the games started from this time, in ms since the epoch.
+
+    Returns:
+        Iterator over the pgn of each game.
+
+    Raises:
+        ResponseError: if lichess refuses the export, or keeps throttling it.
+    """
+    limiter = get_rate_limiter("lichess", 1)
+    attempt = 0
+    while True:
+        limiter.metrics.record_request(throttled_seconds=limiter.bucket.acquire_sync())
+        games = lichessClient.games.export_by_player(username, as_pgn=True, since=since)
+        try:
+            first = next(games, None)
+        except berserk.exceptions.ResponseError as exc:
+            if exc.status_code != 429 or attempt + 1 >= LICHESS_MAX_ATTEMPTS:
+                raise
+            delay = backoff_delay(
+                attempt,
+                settings.FETCH_BACKOFF_BASE_SECONDS,
+                settings.FETCH_BACKOFF_CAP_SECONDS,
+            )
+            LOG.info(f"Throttled by lichess, retrying in {delay:.1f}s.")
+            limiter.metrics.record_throttle(delay)
+            time.sleep(delay)
+            attempt += 1
+            continue
+        if first is not None:
+            yield first
+            yield from games
+        return
+
+
+def lichess_game_start(pgn: str) -> tuple[int, str]:
+    """Get when a lichess game started and its url from its tag pairs.
+
+    Args:
+        pgn: pgn of a single game.
 
     Returns:
-        string of all games.
+        (start time in ms since the epoch, url of the game). The time is 0 when
+        missing and the url is the pgn itself when missing.
     """
-    games: list[str] = []
-    games = list(lichessClient.games.export_by_player(username, as_pgn=True))
-    return "\r\n".join(games)
+    tags = dict(lichess_tag_pattern.findall(pgn))
+    try:
+        started = datetime.strptime(
+            f"{tags['UTCDate']} {tags['UTCTime']}", "%Y.%m.%d %H:%M:%S"
+        ).replace(tzinfo=UTC)
+    except (KeyError, ValueError):
+        return 0, tags.get("Site", pgn)
+    return int(started.timestamp() * 1000), tags.get("Site", pgn)
+
+
+def get_chess_dot_com(path: str) -> dict:
+    """Get a resource of the public API of chess.com on the pooled session.
+
+    Args:
+        path: path of the resource, like "/player/{username}".
+
+    Returns:
+        The json of the resource.
+
+    Raises:
+        ChessDotComClientError: if chess.com does not answer with the resource.
+    """
+    url = f"{CHESS_DOT_COM_API}{path}"
+    resp = get_requests_session().get(url, timeout=30)
+    if resp.status_code != 200:
+        try:
+            data = resp.json()
+        except ValueError:
+            data = {}
+        raise ChessDotComClientError(
+            status_code=resp.status_code,
+            response_text=resp.text,
+            headers=dict(resp.headers),
+            json=data,
+            url=url,
+        )
+    return resp.json()
 
 
 def does_chess_dot_com_player_exists(username: str):
@@ -91,7 +179,7 @@ def does_chess_dot_com_player_exists(username: str):
     is_present: bool | None = cache.get(cache_key)
     if is_present is None:
         try:
-            _ = chessdotcomClient.get_player_profile(username)
+            _ = get_chess_dot_com(f"/player/{username}")
             cache.set(
                 cache_key,
                 True,
@@ -103,6 +191,25 @@ def does_chess_dot_com_player_exists(username: str):
     return is_present
 
 
+@lru_cache(maxsize=1)
+def get_archive_cache() -> ArchiveCache:
+    """Get the cache of the chess.com archives of completed months, accounted in
+    redis when configured.
+    """
+    if not settings.ARCHIVE_CACHE_REDIS_URL:
+        return ArchiveCache(
+            cache,
+            max_bytes=settings.ARCHIVE_CACHE_MAX_BYTES,
+            timeout=settings.ARCHIVE_CACHE_TIMEOUT,
+        )
+    return RedisArchiveCache(
+        cache,
+        redis.Redis.from_url(settings.ARCHIVE_CACHE_REDIS_URL),
+        max_bytes=settings.ARCHIVE_CACHE_MAX_BYTES,
+        timeout=settings.ARCHIVE_CACHE_TIMEOUT,
+    )
+
+
 def should_cache_archive(url: str, today: datetime | None = None) -> bool:
     try:
         today = today or datetime.now()
@@ -113,47 +220,80 @@ def should_cache_archive(url: str, today: datetime | None = None) -> bool:
 
 
 async def fetch_archive(
-    archive_url: str, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore
-):
-    async with semaphore:
-        while True:
-            async with session.get(f"{archive_url}/pgn") as resp:
-                if resp.status == 429:
-                    if retry_after := resp.headers.get("Retry-After"):
-                        LOG.info(f"Rate limited. Retrying after {retry_after} seconds.")
-                        await asyncio.sleep(int(retry_after))
-                    else:
-                        # Implement exponential backoff here if no Retry-After
-                        await asyncio.sleep(45)  # Example fixed delay
-                elif resp.status == 200:
-                    resp = await resp.text()
-                    if should_cache_archive(archive_url):
-                        cache.set(archive_url, resp)
-
-                    return resp
-                else:
-                    LOG.error(f"Failed to fetch {archive_url}: {resp.status}")
-                    return ""
-
-
-async def get_chess_dot_com_games(username: str) -> str:
-    """Get all games of `username` from chess.com platform.
+    archive_url: str,
+    session: aiohttp.ClientSession,
+    limiter: RateLimiter,
+    max_attempts: int = 8,
+) -> str:
+    """Fetch the games of a monthly archive of chess.com within the rate limits.
+
+    Throttled requests are retried after the Retry-After sent by chess.com or
+    a jittered backoff, whichever is longer.
 
     Args:
-        username: Username of user to get games from chess.com.
+        archive_url: url of the monthly game archive.
+        session: http session to fetch with.
+        limiter: limits of the requests to chess.com.
+        max_attempts: requests made before giving up on a throttled archive.
 
     Returns:
-        string of all games.
+        The pgn of the games, empty when the archive could not be fetched.
     """
-    conn_limit = 15
-    semaphore = asyncio.Semaphore(conn_limit)
-    response = chessdotcomClient.get_player_game_archives(username)
-    archives: dict[str, list[str]] = response.json.get("archives", [])
-    lookup = {url: cache.get(url) for url in archives}
-    cached = [pgn for pgn in lookup.values() if pgn]
-    to_fetch = [url for url, pgn in lookup.items() if not pgn]
-    connection = aiohttp.TCPConnector(limit=conn_limit)
-    async with aiohttp.ClientSession(connector=connection) as session:
-        tasks = [fetch_archive(archive, session, semaphore) for archive in to_fetch]
-        fetched = await asyncio.gather(*tasks)
-    return "\n\n".join([*cached, *fetched])
+    for attempt in range(max_attempts):
+        async with limiter.request(), session.get(f"{archive_url}/pgn") as resp:
+            if resp.status == 200:
+                limiter.on_success()
+                pgn = await resp.text()
+                if should_cache_archive(archive_url):
+                    get_archive_cache().set(archive_url, pgn)
+                return pgn
+            if resp.status != 429:
+                LOG.error(f"Failed to fetch {archive_url}: {resp.status}")
+                return ""
+            retry_after = resp.headers.get("Retry-After")
+        await limiter.on_throttle(attempt, retry_after)
+    LOG.error(f"Failed to fetch {archive_url}: still throttled")
+    return ""
+
+
+def get_chess_dot_com_archive_urls(username: str) -> list[str]:
+    """Get the urls of the monthly game archives of `username` on chess.com.
+
+    Args:
+        username: Username of user to get the archives of.
+
+    Returns:
+        list of archive urls, oldest month first.
+    """
+    return get_chess_dot_com(f"/player/{username}/games/archives").get("archives", [])
+
+
+async def iter_chess_dot_com_archives(
+    archives: list[str],
+) -> AsyncIterator[tuple[str, str]]:
+    """Get the games of each archive as soon as it is available.
+
+    Archives already fetched come from the cache in a single lookup, the others
+    are fetched concurrently on the pooled session of the event loop and
+    yielded in the order they complete, so only the archives in flight are
+    held in memory.
+
+    Args:
+        archives: urls of the monthly game archives.
+
+    Returns:
+        Iterator over (url, games of the archive), the games being empty when
+        the archive could not be fetched.
+    """
+    limiter = get_rate_limiter("chess_dot_com", settings.CHESS_DOT_COM_MAX_CONCURRENCY)
+    cached = get_archive_cache().get_many(url for url in archives)
+    for url, pgn in cached.items():
+        yield url, pgn
+    to_fetch = [url for url in archives if url not in cached]
+    session = get_aiohttp_session()
+
+    async def fetch(url: str) -> tuple[str, str]:
+        return url, await fetch_archive(url, session, limiter)
+
+    for fetched in asyncio.as_completed([fetch(url) for url in to_fetch]):
+        yield await fetched
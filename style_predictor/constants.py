@@ -5,6 +5,8 @@ ANALYZE_GAMES_TASK: str = "pgn_analyze_games"
 CHESS_STYLE_TASK: str = "pgn_determine_chess_playing_style"
 ANALYZE_PGN_CHUNK_TASK: str = "pgn_analyze_chunk"
 FINALIZE_ANALYSIS_TASK: str = "pgn_finalize_analysis"
+PIPELINE_CHUNK_DONE_TASK: str = "pgn_pipeline_chunk_done"
+PIPELINE_CHUNK_FAILED_TASK: str = "pgn_pipeline_chunk_failed"
 ROASTING_TASK = "pgn_roast_user"
 WHITE_WIN: str = "1-0"
 BLACK_WIN: str = "0-1"
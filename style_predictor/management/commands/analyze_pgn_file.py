@@ -0,0 +1,145 @@
+import json
+import math
+import multiprocessing
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Any, override
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.core.management.base import CommandParser
+from django.db import connections
+
+from style_predictor.pgn_parser.file_processing.splitter import (
+    iter_range_offsets,
+    map_file,
+)
+from style_predictor.tasks import (
+    analyze_pgn_buffer,
+    get_opening_index,
+    merge_chunk_results,
+)
+
+# Ranges handed to each worker process, so uneven ranges still balance out.
+RANGES_PER_WORKER = 4
+
+
+def analyze_range(
+    path: str, session_id: str, usernames: str, start: int, end: int, idx: int
+) -> dict[str, Any]:
+    """Analyse the games between `start` and `end` of the pgn file at `path`.
+
+    The shared result cache is left alone, so no cache server is needed.
+    """
+    with open(path, "rb") as f, map_file(f) as buffer:
+        return analyze_pgn_buffer(
+            session_id, usernames, buffer, start, end, idx, use_cache=False
+        )
+
+
+class Command(BaseCommand):
+    """We analyse a pgn file from disk without going through celery.
+
+    The file is memory-mapped and cut into byte ranges at game boundaries, the
+    ranges are analysed in a pool of processes and their results merged the
+    same way as `finalize_analysis` does for the chunks of an upload.
+    The worker processes are forked so they share the openings index and the
+    pages of the mapped file with this process.
+    """
+
+    help = "Analyses the games of a large pgn file using all the cores."
+
+    @override
+    def add_arguments(self, parser: CommandParser) -> None:
+        _ = parser.add_argument("path", help="Path of the pgn file.")
+        _ = parser.add_argument(
+            "--usernames",
+            default="",
+            help="Usernames to analyse the games for, separated by ||.",
+        )
+        _ = parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of worker processes, defaults to the number of cores.",
+        )
+        _ = parser.add_argument(
+            "--range-size",
+            type=int,
+            default=None,
+            help="Bytes of pgn in each range, defaults to a size keeping all "
+            "the workers busy.",
+        )
+        _ = parser.add_argument(
+            "--output", default=None, help="Write the analysis to this json file."
+        )
+        return super().add_arguments(parser)
+
+    def handle(self, *args, **kwargs):
+        path: str = kwargs["path"]
+        workers: int = max(kwargs["workers"], 1)
+        session_id = str(uuid4())
+        started = time.perf_counter()
+        with open(path, "rb") as f, map_file(f) as buffer:
+            total_bytes = len(buffer)
+            range_size = kwargs["range_size"] or max(
+                min(
+                    int(
+                        settings.ANALYSIS_BYTES_PER_SECOND
+                        * settings.ANALYSIS_CHUNK_TARGET_SECONDS
+                    ),
+                    math.ceil(total_bytes / (workers * RANGES_PER_WORKER)),
+                ),
+                1,
+            )
+            ranges = list(iter_range_offsets(buffer, range_size))
+        self.stdout.write(
+            self.style.HTTP_INFO(
+                f"Analysing {path} ({total_bytes / 2**20:.1f} MiB) in "
+                f"{len(ranges)} ranges with {workers} workers."
+            )
+        )
+
+        # Loaded before forking so the workers inherit it, and connections are
+        # closed so that no worker reuses the socket of this process.
+        get_opening_index()
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("fork")
+        ) as executor:
+            objects = list(
+                executor.map(
+                    analyze_range,
+                    repeat(path),
+                    repeat(session_id),
+                    repeat(kwargs["usernames"]),
+                    [start for start, _ in ranges],
+                    [end for _, end in ranges],
+                    range(len(ranges)),
+                )
+            )
+        result = merge_chunk_results(session_id, objects)
+        elapsed = time.perf_counter() - started
+
+        output = json.dumps(result, indent=2)
+        if kwargs["output"]:
+            with open(kwargs["output"], "w", encoding="utf-8") as f:
+                _ = f.write(output)
+        else:
+            self.stdout.write(output)
+        games = result.get("count", 0)
+        # ru_maxrss is in KiB, RUSAGE_CHILDREN holds the largest worker.
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        peak_worker_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Analysed {games} games in {elapsed:.2f}s "
+                f"({games / max(elapsed, 1e-9):.0f} games/sec, "
+                f"{total_bytes / 2**20 / max(elapsed, 1e-9):.1f} MiB/sec). "
+                f"Peak RSS {peak_rss:.0f} MiB, {peak_worker_rss:.0f} MiB per worker."
+            )
+        )
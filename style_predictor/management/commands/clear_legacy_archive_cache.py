@@ -0,0 +1,50 @@
+from itertools import batched
+from typing import override
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import BaseCommand
+from django.core.management.base import CommandParser
+
+from style_predictor.apis.pgn.utils import CHESS_DOT_COM_API
+
+# Archives used to be cached under their bare url, without expiry.
+LEGACY_ARCHIVE_PATTERN = f"{CHESS_DOT_COM_API}/player/*/games/*"
+DELETE_BATCH = 500
+
+
+class Command(BaseCommand):
+    """We delete the chess.com archives cached by the earlier archive cache.
+
+    The archives cached under their bare url never expire and are not
+    accounted against ARCHIVE_CACHE_MAX_BYTES, so they are looked up with
+    SCAN in the redis of the cache and deleted in batches.
+    Nothing is left to delete once it ran, so it is run once when deploying
+    the archive cache rather than on every start.
+    """
+
+    help = "Deletes the chess.com archives cached without expiry."
+
+    @override
+    def add_arguments(self, parser: CommandParser) -> None:
+        _ = parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the keys to delete.",
+        )
+        return super().add_arguments(parser)
+
+    def handle(self, *args, **kwargs):
+        client = redis.Redis.from_url(settings.CACHES["default"]["LOCATION"])
+        keys = client.scan_iter(match=cache.make_key(LEGACY_ARCHIVE_PATTERN))
+        dry_run = kwargs.get("dry_run", False)
+        found = 0
+        for batch in batched(keys, DELETE_BATCH):
+            if not dry_run:
+                _ = client.delete(*batch)
+            found += len(batch)
+        if dry_run:
+            self.stdout.write(f"Found {found} legacy archives in the cache.")
+            return
+        self.stdout.write(f"Deleted {found} legacy archives from the cache.")
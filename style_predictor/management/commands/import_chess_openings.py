@@ -2,10 +2,12 @@ import os
 from typing import override
 
 import requests
+from django.conf import settings
 from django.core.management import BaseCommand
 from django.core.management.base import CommandParser
 
 from style_predictor.models import ChessOpening
+from style_predictor.openings import write_index
 
 DATA_DIR = "data"
 LOCAL_ECO_FILE = DATA_DIR + "/{}.tsv"
@@ -18,7 +20,9 @@ class Command(BaseCommand):
     It checks for the flag --skip-download, which tells the program to not download
     but use local files.
     If the flag is not set, then it tries downloading from github and stores to the file.
-    Later, we store the data to the database.
+    Later, we store the data to the database and write the prebuilt openings index
+    used by the celery workers.
+    The flag --index-only only writes the index from the local files.
     """
 
     help = "Imports ECO chess openings from lichess TSV files"
@@ -30,12 +34,17 @@ class Command(BaseCommand):
             action="store_true",
             help="Skip download and just save downloaded files to DB.",
         )
+        _ = parser.add_argument(
+            "--index-only",
+            action="store_true",
+            help="Only write the openings index from the local files.",
+        )
         return super().add_arguments(parser)
 
     def handle(self, *args, **kwargs):
         os.makedirs(DATA_DIR, exist_ok=True)
         tsv_file_options = ["a", "b", "c", "d", "e"]
-        if not kwargs.get("skip_download", False):
+        if not kwargs.get("skip_download", False) and not kwargs.get("index_only"):
             for i in tsv_file_options:
                 file_url = ECO_DOWNLOAD_URL.format(i)
                 file = LOCAL_ECO_FILE.format(i)
@@ -77,6 +86,16 @@ class Command(BaseCommand):
                     )
                     count += 1
             total_count += count
+        # Same order as the openings read from the database by the workers.
+        all_openings.sort(key=lambda opening: -len(opening.moves))
+        write_index(all_openings, settings.OPENINGS_INDEX_PATH)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Wrote openings index {settings.OPENINGS_INDEX_PATH}."
+            )
+        )
+        if kwargs.get("index_only", False):
+            return
         ChessOpening.objects.bulk_create(all_openings)
 
         self.stdout.write(self.style.SUCCESS(f"✅ Imported {total_count} openings."))
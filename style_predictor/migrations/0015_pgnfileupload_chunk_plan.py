@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("style_predictor", "0014_alter_taskresult_stage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pgnfileupload",
+            name="chunk_plan",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
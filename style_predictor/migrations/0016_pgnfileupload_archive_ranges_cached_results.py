@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("style_predictor", "0015_pgnfileupload_chunk_plan"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pgnfileupload",
+            name="archive_ranges",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="pgnfileupload",
+            name="cached_results",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
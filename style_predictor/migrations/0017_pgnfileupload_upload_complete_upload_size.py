@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("style_predictor", "0016_pgnfileupload_archive_ranges_cached_results"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pgnfileupload",
+            name="upload_complete",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name="pgnfileupload",
+            name="upload_size",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
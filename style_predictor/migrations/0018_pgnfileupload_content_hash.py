@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("style_predictor", "0017_pgnfileupload_upload_complete_upload_size"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pgnfileupload",
+            name="content_hash",
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,286 @@
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from typing import Protocol
+
+move_number_pattern = re.compile(r"\d+\.+")
+
+
+@dataclass(frozen=True)
+class OpeningFound:
+    eco_code: str
+    full_name: str
+
+
+class Opening(Protocol):
+    eco_code: str
+    full_name: str
+    moves: str
+
+
+def to_plies(moves: str) -> tuple[str, ...]:
+    """Convert movetext to the canonical sequence of plies.
+
+    Move numbers are dropped and the SAN moves interned, so "1.e4 e5" and
+    "1. e4 1... e5" both give ("e4", "e5"), the same as `PGNGame.plies`.
+
+    Args:
+        moves: movetext, e.g. "1. e4 e5 2. Nf3".
+
+    Returns:
+        Tuple of the SAN moves.
+    """
+    plies = move_number_pattern.sub(" ", moves).split()
+    return tuple(sys.intern(ply) for ply in plies)
+
+
+class _Node:
+    __slots__ = ("children", "opening")
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        self.opening: OpeningFound | None = None
+
+
+class OpeningIndex:
+    """Index of the chess openings for classifying games by their moves.
+
+    The openings are held in a trie with one level per ply of their moves,
+    so the longest opening matching a game is found in a single walk down the
+    plies of the game instead of comparing it with every candidate opening.
+    """
+
+    def __init__(self, openings: Iterable[Opening]):
+        self._root = _Node()
+        self.fallbacks: dict[str, str] = {}
+        for opening in openings:
+            self.fallbacks[opening.eco_code] = opening.full_name
+            node = self._root
+            for ply in to_plies(opening.moves):
+                node = node.children.setdefault(ply, _Node())
+            # Keep the first opening seen for a given sequence of moves.
+            if node.opening is None:
+                node.opening = OpeningFound(opening.eco_code, opening.full_name)
+
+    def find_by_moves(self, plies: Sequence[str]) -> OpeningFound | None:
+        """Get the longest chess opening the moves provided start with.
+
+        Args:
+            plies: SAN moves to categorize, e.g. ("e4", "e5", "Nf3").
+
+        Returns:
+            The longest matching opening, else None.
+        """
+        node = self._root
+        found: OpeningFound | None = None
+        for ply in plies:
+            if (node := node.children.get(ply)) is None:
+                break
+            if node.opening is not None:
+                found = node.opening
+        return found
+
+
+# Layout of the prebuilt index file, every number is a little-endian int32:
+#   header          magic, version and the counts below
+#   string_offsets  n_strings + 1 offsets into the string blob
+#   edge_starts     n_nodes + 1, the edges of node i are [start[i], start[i + 1])
+#   node_openings   n_nodes opening ids, -1 when no opening ends at the node
+#   edge_plies      n_edges string ids, sorted within each node
+#   edge_children   n_edges node ids
+#   opening_ecos    n_openings string ids
+#   opening_names   n_openings string ids
+#   fallback_ecos   n_fallbacks string ids
+#   fallback_names  n_fallbacks string ids, the name to use for each ECO code
+#   string blob     utf-8 encoded plies, ECO codes and names, each stored once
+INDEX_MAGIC = b"MCSOPIDX"
+INDEX_VERSION = 2
+_header = struct.Struct("<8s7i")
+
+
+def write_index(openings: Iterable[Opening], path: str | os.PathLike[str]):
+    """Write the prebuilt index of the openings to `path`.
+
+    Args:
+        openings: openings to index, longest moves first.
+        path: where to write the index.
+    """
+    strings: dict[str, int] = {}
+
+    def intern_string(value: str) -> int:
+        return strings.setdefault(value, len(strings))
+
+    index = OpeningIndex(openings)
+    opening_ids: dict[OpeningFound, int] = {}
+    nodes: list[_Node] = [index._root]
+    edge_starts: list[int] = [0]
+    node_openings: list[int] = []
+    edge_plies: list[int] = []
+    edge_children: list[int] = []
+    # Nodes are numbered breadth first, children get their ids as they are queued.
+    for node in nodes:
+        if node.opening is None:
+            node_openings.append(-1)
+        else:
+            node_openings.append(opening_ids.setdefault(node.opening, len(opening_ids)))
+        edges = sorted(
+            (intern_string(ply), child) for ply, child in node.children.items()
+        )
+        for ply_id, child in edges:
+            edge_plies.append(ply_id)
+            edge_children.append(len(nodes))
+            nodes.append(child)
+        edge_starts.append(len(edge_plies))
+    opening_ecos = [intern_string(found.eco_code) for found in opening_ids]
+    opening_names = [intern_string(found.full_name) for found in opening_ids]
+    fallback_ecos = [intern_string(eco_code) for eco_code in index.fallbacks]
+    fallback_names = [intern_string(name) for name in index.fallbacks.values()]
+
+    encoded = [value.encode("utf-8") for value in strings]
+    string_offsets = [0]
+    for value in encoded:
+        string_offsets.append(string_offsets[-1] + len(value))
+    blob = b"".join(encoded)
+
+    # Written aside and renamed so workers never map a partially written file.
+    tmp_path = f"{os.fspath(path)}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(
+            _header.pack(
+                INDEX_MAGIC,
+                INDEX_VERSION,
+                len(strings),
+                len(nodes),
+                len(edge_plies),
+                len(opening_ecos),
+                len(fallback_ecos),
+                len(blob),
+            )
+        )
+        for section in (
+            string_offsets,
+            edge_starts,
+            node_openings,
+            edge_plies,
+            edge_children,
+            opening_ecos,
+            opening_names,
+            fallback_ecos,
+            fallback_names,
+        ):
+            f.write(array("i", section).tobytes())
+        f.write(blob)
+    os.replace(tmp_path, path)
+
+
+class MappedOpeningIndex:
+    """Opening index read from a file written by `write_index`.
+
+    The file is memory-mapped so every worker process on a host shares the
+    same pages. Opening it only reads the ECO fallbacks, the nodes of the trie
+    are decoded as games first reach them.
+    """
+
+    def __init__(self, buffer: bytes | mmap.mmap):
+        (
+            magic,
+            version,
+            n_strings,
+            n_nodes,
+            n_edges,
+            n_openings,
+            n_fallbacks,
+            blob_len,
+        ) = _header.unpack_from(buffer)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError("Not a chess openings index file.")
+        if sys.byteorder != "little":
+            raise ValueError("Chess openings index files are little-endian.")
+        self._buffer = buffer
+        view = memoryview(buffer)
+        pos = _header.size
+        sections = []
+        for count in (
+            n_strings + 1,
+            n_nodes + 1,
+            n_nodes,
+            n_edges,
+            n_edges,
+            n_openings,
+            n_openings,
+            n_fallbacks,
+            n_fallbacks,
+        ):
+            sections.append(view[pos : pos + count * 4].cast("i"))
+            pos += count * 4
+        (
+            self._string_offsets,
+            self._edge_starts,
+            self._node_openings,
+            self._edge_plies,
+            self._edge_children,
+            self._opening_ecos,
+            self._opening_names,
+            fallback_ecos,
+            fallback_names,
+        ) = sections
+        self._blob = view[pos : pos + blob_len]
+        # Lookups of the nodes and openings visited so far in this process.
+        self._children: dict[int, dict[str, tuple[int, int]]] = {}
+        self._found: dict[int, OpeningFound] = {}
+        self.fallbacks: dict[str, str] = {
+            self._string(eco): self._string(name)
+            for eco, name in zip(fallback_ecos, fallback_names)
+        }
+
+    @classmethod
+    def open(cls, path: str | os.PathLike[str]) -> "MappedOpeningIndex":
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _string(self, string_id: int) -> str:
+        start, end = self._string_offsets[string_id : string_id + 2]
+        return str(self._blob[start:end], "utf-8")
+
+    def _node_children(self, node: int) -> dict[str, tuple[int, int]]:
+        """Map the plies leaving `node` to their child node and its opening."""
+        if (children := self._children.get(node)) is None:
+            children = self._children[node] = {}
+            for edge in range(self._edge_starts[node], self._edge_starts[node + 1]):
+                child = self._edge_children[edge]
+                children[self._string(self._edge_plies[edge])] = (
+                    child,
+                    self._node_openings[child],
+                )
+        return children
+
+    def find_by_moves(self, plies: Sequence[str]) -> OpeningFound | None:
+        """Get the longest chess opening the moves provided start with.
+
+        Args:
+            plies: SAN moves to categorize, e.g. ("e4", "e5", "Nf3").
+
+        Returns:
+            The longest matching opening, else None.
+        """
+        node = 0
+        found = -1
+        for ply in plies:
+            if (edge := self._node_children(node).get(ply)) is None:
+                break
+            node, opening = edge
+            if opening != -1:
+                found = opening
+        if found == -1:
+            return None
+        if (opening := self._found.get(found)) is None:
+            opening = self._found[found] = OpeningFound(
+                self._string(self._opening_ecos[found]),
+                self._string(self._opening_names[found]),
+            )
+        return opening
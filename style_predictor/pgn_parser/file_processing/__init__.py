@@ -1,4 +1,4 @@
-__all__ = ("Lexer", "MoveToken", "Token", "Parser", "TokenType")
+__all__ = ("Lexer", "MoveToken", "MovetextToken", "Token", "Parser", "TokenType")
 
-from .lexer import Lexer, MoveToken, Token, TokenType
+from .lexer import Lexer, MovetextToken, MoveToken, Token, TokenType
 from .parser import Parser
@@ -0,0 +1,125 @@
+import struct
+import zlib
+from collections.abc import Iterable, Iterator
+from typing import IO
+
+from .decompress import iter_stream
+
+# Stored pgn files are cut into blocks of raw pgn compressed independently,
+# followed by the index of the blocks:
+#   MAGIC | block 0 | block 1 | ... | (offset, length) of each block | FOOTER
+# so a range of the pgn is read by decompressing only the blocks it spans.
+MAGIC = b"PGNBLK1\n"
+INDEX_ENTRY = struct.Struct("<QI")
+# Offset of the index, raw size of the pgn, size of a block, number of blocks.
+FOOTER = struct.Struct("<QQII")
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+COMPRESSION_LEVEL = 6
+
+
+def is_block_file(handle: IO[bytes]) -> bool:
+    """Whether an open binary file is in the block format, keeping its position."""
+    position = handle.tell()
+    _ = handle.seek(0)
+    head = handle.read(len(MAGIC))
+    _ = handle.seek(position)
+    return head == MAGIC
+
+
+def iter_block_file(
+    data: Iterable[bytes], block_size: int = DEFAULT_BLOCK_SIZE
+) -> Iterator[bytes]:
+    """Compress pgn into the block format as a stream.
+
+    Args:
+        data: raw pgn, in pieces of any size.
+        block_size: bytes of raw pgn in each block.
+
+    Returns:
+        Iterator over the bytes of the block file, one block at a time.
+    """
+    yield MAGIC
+    offset = len(MAGIC)
+    index: list[tuple[int, int]] = []
+    raw_size = 0
+    pending = bytearray()
+
+    def compress(block: bytes | bytearray) -> bytes:
+        nonlocal offset
+        compressed = zlib.compress(block, COMPRESSION_LEVEL)
+        index.append((offset, len(compressed)))
+        offset += len(compressed)
+        return compressed
+
+    for piece in data:
+        raw_size += len(piece)
+        pending += piece
+        while len(pending) >= block_size:
+            yield compress(pending[:block_size])
+            del pending[:block_size]
+    if pending:
+        yield compress(pending)
+    yield b"".join(INDEX_ENTRY.pack(*entry) for entry in index)
+    yield FOOTER.pack(offset, raw_size, block_size, len(index))
+
+
+class BlockReader:
+    """Random access to the pgn of an open block file."""
+
+    def __init__(self, handle: IO[bytes]):
+        self.handle = handle
+        _ = handle.seek(-FOOTER.size, 2)
+        index_offset, self.size, self.block_size, count = FOOTER.unpack(
+            handle.read(FOOTER.size)
+        )
+        _ = handle.seek(index_offset)
+        data = handle.read(INDEX_ENTRY.size * count)
+        self.index: list[tuple[int, int]] = list(INDEX_ENTRY.iter_unpack(data))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _read_blocks(self, first: int, last: int) -> Iterator[bytes]:
+        """Decompress the blocks from `first` to `last` included."""
+        start = self.index[first][0]
+        _ = self.handle.seek(start)
+        blocks = self.index[first : last + 1]
+        data = memoryview(self.handle.read(sum(length for _, length in blocks)))
+        for offset, length in blocks:
+            yield zlib.decompress(data[offset - start : offset - start + length])
+
+    def read_range(self, start: int, end: int) -> bytes:
+        """Read the pgn between `start` and `end`, decompressing only the
+        blocks the range spans.
+        """
+        end = min(end, self.size)
+        if start >= end:
+            return b""
+        first, last = start // self.block_size, (end - 1) // self.block_size
+        data = b"".join(self._read_blocks(first, last))
+        offset = first * self.block_size
+        return data[start - offset : end - offset]
+
+    def iter_blocks(self) -> Iterator[bytes]:
+        """Decompress the pgn one block at a time."""
+        for i in range(len(self.index)):
+            yield from self._read_blocks(i, i)
+
+
+def read_range(handle: IO[bytes], start: int, end: int) -> bytes:
+    """Read the pgn between `start` and `end` of an open file, plain or in
+    the block format.
+    """
+    if is_block_file(handle):
+        return BlockReader(handle).read_range(start, end)
+    _ = handle.seek(start)
+    return handle.read(end - start)
+
+
+def iter_pgn(handle: IO[bytes]) -> Iterator[bytes]:
+    """Read the pgn of an open file, plain or in the block format, as a stream."""
+    if is_block_file(handle):
+        yield from BlockReader(handle).iter_blocks()
+    else:
+        _ = handle.seek(0)
+        yield from iter_stream(handle)
@@ -0,0 +1,114 @@
+import bz2
+import gzip
+import io
+import lzma
+import zipfile
+import zlib
+from collections.abc import Iterator
+from typing import IO
+
+# Leading bytes of each supported compressed format.
+MAGIC_NUMBERS = {
+    b"\x1f\x8b": "gzip",
+    b"BZh": "bz2",
+    b"\xfd7zXZ\x00": "xz",
+    b"PK\x03\x04": "zip",
+    b"PK\x05\x06": "zip",
+}
+READ_SIZE = 1024 * 1024
+
+
+class DecompressionError(ValueError):
+    """A compressed upload that cannot be decompressed."""
+
+
+def detect_compression(handle: IO[bytes]) -> str | None:
+    """Get the compression format of an open binary file from its first bytes.
+
+    The position of the file is left unchanged.
+
+    Returns:
+        One of gzip, bz2, xz or zip, None for files that are not compressed.
+    """
+    position = handle.tell()
+    head = handle.read(max(len(magic) for magic in MAGIC_NUMBERS))
+    _ = handle.seek(position)
+    for magic, compression in MAGIC_NUMBERS.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def iter_stream(stream: IO[bytes]) -> Iterator[bytes]:
+    """Read an open binary file as a stream of blocks of READ_SIZE bytes."""
+    while data := stream.read(READ_SIZE):
+        yield data
+
+
+def _iter_zip(handle: IO[bytes]) -> Iterator[bytes]:
+    with zipfile.ZipFile(handle) as archive:
+        members = [info for info in archive.infolist() if not info.is_dir()]
+        pgn_members = [
+            info for info in members if info.filename.lower().endswith(".pgn")
+        ]
+        for info in pgn_members or members:
+            with archive.open(info) as member:
+                yield from iter_stream(member)
+            # Games of the next member start on a line of their own.
+            yield b"\n\n"
+
+
+def iter_decompressed(
+    handle: IO[bytes], compression: str, max_size: int | None = None
+) -> Iterator[bytes]:
+    """Decompress an open binary file as a stream of blocks.
+
+    Only one block is held in memory at a time. The `.pgn` members of zip
+    archives are concatenated, or all the files when none is named `.pgn`.
+
+    Args:
+        handle: compressed file, seekable for zip archives.
+        compression: format of the file, see `detect_compression`.
+        max_size: most bytes to inflate, protecting against decompression bombs.
+
+    Returns:
+        Iterator over the decompressed bytes.
+
+    Raises:
+        DecompressionError: if the file is corrupt or inflates past `max_size`.
+    """
+    openers = {"gzip": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+    size = 0
+    try:
+        if compression == "zip":
+            blocks = _iter_zip(handle)
+        else:
+            blocks = iter_stream(openers[compression](handle, "rb"))
+        for block in blocks:
+            size += len(block)
+            if max_size is not None and size > max_size:
+                raise DecompressionError(f"Upload inflates past {max_size} bytes.")
+            yield block
+    except (OSError, EOFError, lzma.LZMAError, zlib.error, zipfile.BadZipFile) as exc:
+        raise DecompressionError(f"Corrupt {compression} upload: {exc}") from exc
+
+
+class IteratorReader(io.RawIOBase):
+    """Read-only file over an iterator of byte blocks, to stream them to storage."""
+
+    def __init__(self, blocks: Iterator[bytes]):
+        self._blocks = blocks
+        self._pending = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            if (block := next(self._blocks, None)) is None:
+                return 0
+            self._pending = memoryview(block)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import re
+import struct
+import zlib
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from .splitter import GameScanner
+
+# Index files are MAGIC, the crc32 of the payload, then the payload: the
+# zlib-compressed JSON of the columns.
+MAGIC = b"PGNIDX1\n"
+CRC = struct.Struct("<I")
+INDEX_SUFFIX = ".idx"
+# Header tags kept for each game. Elo tags are stored as numbers, the others
+# as codes into the distinct values of their column.
+INDEXED_TAGS = (
+    "Result",
+    "White",
+    "Black",
+    "WhiteElo",
+    "BlackElo",
+    "TimeControl",
+    "Date",
+    "ECO",
+)
+ELO_TAGS = ("WhiteElo", "BlackElo")
+tag_pair_bytes_pattern = re.compile(
+    rb'(?:\xef\xbb\xbf)?\s*\[([A-Za-z0-9_]+)[ \t]+"((?:[^"\\\r\n]|\\.)*)"[^\n]*\n?'
+)
+escape_pattern = re.compile(r"\\(.)")
+
+
+class GameIndexError(ValueError):
+    """A game index that is corrupt or does not match its pgn."""
+
+
+def index_name(name: str) -> str:
+    """Name in storage of the index of the stored pgn file `name`."""
+    return f"{name}{INDEX_SUFFIX}"
+
+
+class GameIndex:
+    """Offsets, lengths and key header fields of the games of a pgn file.
+
+    Each field is a column with a value per game, so filters and counts run
+    over lists rather than over the pgn.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        sha256: str,
+        starts: list[int],
+        lengths: list[int],
+        columns: dict[str, list[int | None]],
+        values: dict[str, list[str]],
+    ):
+        self.size = size
+        self.sha256 = sha256
+        self.starts = starts
+        self.lengths = lengths
+        self.columns = columns
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def column(self, tag: str) -> list[Any]:
+        """Values of a header tag for each game, "" or None when missing."""
+        if tag in ELO_TAGS:
+            return self.columns[tag]
+        values = self.values[tag]
+        return [values[code] for code in self.columns[tag]]
+
+    def where(self, tag: str, values: Iterable[str | int]) -> list[int]:
+        """Numbers of the games whose `tag` is one of `values`.
+
+        Names and other text are compared in any case.
+        """
+        if tag in ELO_TAGS:
+            wanted = set(values)
+            return [i for i, elo in enumerate(self.columns[tag]) if elo in wanted]
+        wanted = {str(value).lower() for value in values}
+        codes = {i for i, v in enumerate(self.values[tag]) if v.lower() in wanted}
+        return [i for i, code in enumerate(self.columns[tag]) if code in codes]
+
+    def games_between(self, start: int = 0, end: int | None = None) -> range:
+        """Numbers of the games beginning between `start` and `end`."""
+        end = self.size if end is None else end
+        return range(bisect_left(self.starts, start), bisect_left(self.starts, end))
+
+    def iter_offsets(
+        self, start: int = 0, end: int | None = None
+    ) -> Iterator[tuple[int, int]]:
+        """(start, end) offsets of the games beginning between `start` and `end`,
+        like `iter_game_offsets` over the pgn.
+        """
+        end = self.size if end is None else end
+        for i in self.games_between(start, end):
+            game_start = self.starts[i]
+            yield game_start, min(game_start + self.lengths[i], end)
+
+    def iter_chunk_offsets(
+        self, games: Iterable[int], chunk_size: int
+    ) -> Iterator[tuple[int, int]]:
+        """Group games into chunks of at most `chunk_size` consecutive games.
+
+        The games left out of `games` end a chunk, so that the chunks only
+        hold the games given.
+
+        Args:
+            games: numbers of the games, in increasing order.
+            chunk_size: maximum number of games in a chunk.
+
+        Returns:
+            Iterator over the (start, end) offsets of each chunk.
+        """
+        chunk: list[int] = []
+        for game in games:
+            if chunk and (game != chunk[-1] + 1 or len(chunk) == chunk_size):
+                yield self._chunk_offsets(chunk)
+                chunk = []
+            chunk.append(game)
+        if chunk:
+            yield self._chunk_offsets(chunk)
+
+    def _chunk_offsets(self, games: list[int]) -> tuple[int, int]:
+        return self.starts[games[0]], self.starts[games[-1]] + self.lengths[games[-1]]
+
+    def to_bytes(self) -> bytes:
+        payload = zlib.compress(
+            json.dumps(
+                {
+                    "size": self.size,
+                    "sha256": self.sha256,
+                    "starts": self.starts,
+                    "lengths": self.lengths,
+                    "columns": self.columns,
+                    "values": self.values,
+                },
+                separators=(",", ":"),
+            ).encode("utf-8")
+        )
+        return MAGIC + CRC.pack(zlib.crc32(payload)) + payload
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "GameIndex":
+        """Load an index written by `to_bytes`.
+
+        Raises:
+            GameIndexError: if the data is not an index or fails its checksum.
+        """
+        header = len(MAGIC) + CRC.size
+        if data[: len(MAGIC)] != MAGIC or len(data) < header:
+            raise GameIndexError("Not a game index.")
+        (crc,) = CRC.unpack_from(data, len(MAGIC))
+        payload = data[header:]
+        if zlib.crc32(payload) != crc:
+            raise GameIndexError("The game index does not match its checksum.")
+        fields = json.loads(zlib.decompress(payload))
+        return cls(**fields)
+
+
+class GameIndexBuilder:
+    """Build the index of pgn read as a stream, in pieces of any size.
+
+    Only the games not yet complete are kept in memory, so the index is built
+    while the pgn goes to storage.
+    """
+
+    def __init__(self):
+        self._pending = bytearray()
+        # Offset in the pgn of the first pending byte.
+        self._offset = 0
+        # Games found in the pending bytes, scanned up to `_scanned`.
+        self._scanner = GameScanner()
+        self._scanned = 0
+        self._digest = hashlib.sha256()
+        self.starts: list[int] = []
+        self.lengths: list[int] = []
+        self.columns: dict[str, list[int | None]] = {tag: [] for tag in INDEXED_TAGS}
+        self._codes: dict[str, dict[str, int]] = {
+            tag: {} for tag in INDEXED_TAGS if tag not in ELO_TAGS
+        }
+
+    def feed(self, piece: bytes):
+        """Add the next piece of the pgn."""
+        self._digest.update(piece)
+        self._pending += piece
+        # Games are only looked for in whole lines.
+        if cut := self._pending.rfind(b"\n") + 1:
+            self._scan(cut, final=False)
+
+    def iter_feed(self, data: Iterable[bytes]) -> Iterator[bytes]:
+        """Feed each piece of `data` to the index as it is passed on."""
+        for piece in data:
+            self.feed(piece)
+            yield piece
+
+    def finish(self) -> GameIndex:
+        """Index the last game and get the index of the whole pgn."""
+        self._scan(len(self._pending), final=True)
+        return GameIndex(
+            size=self._offset,
+            sha256=self._digest.hexdigest(),
+            starts=self.starts,
+            lengths=self.lengths,
+            columns=self.columns,
+            values={tag: list(codes) for tag, codes in self._codes.items()},
+        )
+
+    def _scan(self, end: int, final: bool):
+        scanner = self._scanner
+        # Only the lines fed since the last scan are looked at, so a game
+        # spanning many pieces is scanned once.
+        for start, stop in scanner.scan(self._pending, self._scanned, end):  # pyright: ignore [reportArgumentType]
+            self._add(start, stop)
+        # The last game found may go on in the next piece.
+        if final and scanner.game_start is not None:
+            self._add(scanner.game_start, end)
+            scanner.game_start = None
+        consumed = end if scanner.game_start is None else scanner.game_start
+        del self._pending[:consumed]
+        self._offset += consumed
+        self._scanned = end - consumed
+        scanner.tags_end = max(scanner.tags_end - consumed, 0)
+        if scanner.game_start is not None:
+            scanner.game_start -= consumed
+
+    def _add(self, start: int, end: int):
+        self.starts.append(self._offset + start)
+        self.lengths.append(end - start)
+        tags: dict[str, str] = {}
+        pos = start
+        while match := tag_pair_bytes_pattern.match(self._pending, pos, end):
+            tags[match[1].decode("ascii")] = match[2].decode("utf-8", errors="replace")
+            pos = match.end()
+        for tag in INDEXED_TAGS:
+            value = escape_pattern.sub(r"\1", tags.get(tag, ""))
+            if tag in ELO_TAGS:
+                self.columns[tag].append(int(value) if value.isdigit() else None)
+            else:
+                codes = self._codes[tag]
+                self.columns[tag].append(codes.setdefault(value, len(codes)))
+
+
+def build_game_index(data: Iterable[bytes]) -> GameIndex:
+    """Index pgn read in pieces of any size."""
+    builder = GameIndexBuilder()
+    for piece in data:
+        builder.feed(piece)
+    return builder.finish()
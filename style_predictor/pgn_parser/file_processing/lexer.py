@@ -1,4 +1,5 @@
 import re
+from collections.abc import Iterator
 from dataclasses import dataclass
 from enum import Enum, auto
 from typing import override
@@ -14,6 +15,8 @@ movetext_pattern = re.compile(
     r"(?P<blackcomment>\{[^}]*\})?\s*"
 )
 game_term_pattern = re.compile(r"(?P<gameterm>\*|0-1|1/2-1/2|1-0)")
+next_tag_pair_pattern = re.compile(r"\n[ \t]*\[[A-Za-z0-9_]+\s")
+game_terms = ("1/2-1/2", "1-0", "0-1", "*")
 
 
 class TokenType(Enum):
@@ -37,9 +40,12 @@ class TokenType(Enum):
     PROMOTIONPIECE = auto()
     CAPTURE = auto()
     INVALID = auto()
+    MOVETEXT = auto()
 
 
 class Position:
+    __slots__ = ("column", "linenumber")
+
     linenumber: int
     column: int
 
@@ -52,14 +58,14 @@ class Position:
         return f"Position({self.linenumber}, {self.column})"
 
 
-@dataclass
+@dataclass(slots=True)
 class Token:
     tvalue: str
     ttype: TokenType
     tpos: Position
 
 
-@dataclass
+@dataclass(slots=True)
 class MoveToken(Token):
     twhitemovecomment: str | None = None
     tblackmovecomment: str | None = None
@@ -68,138 +74,188 @@ class MoveToken(Token):
     tblackmove: str | None = None
 
 
+@dataclass(slots=True)
+class MovetextToken(Token):
+    """Span of movetext in `tsource` that has not been lexed yet."""
+
+    tsource: str = ""
+    tstart: int = 0
+    tend: int = 0
+
+
 class Lexer:
-    def __init__(self, data: str):
+    def __init__(
+        self,
+        data: str,
+        headers_only: bool = False,
+        start: int = 0,
+        end: int | None = None,
+    ):
+        """
+        Args:
+            data: pgn text to lex.
+            headers_only: skip the movetext, only recording where it lies.
+            start: position in `data` to start lexing from.
+            end: position in `data` to stop lexing at, defaults to its length.
+        """
         self._buffer = data
-        self._buffer_pos: int = 0
+        self._buffer_pos: int = start
+        self._buffer_end: int = len(data) if end is None else end
+        self._headers_only = headers_only
         self._loc = Position(1, 1)
-        self._tokens: list[Token] = list()
 
-    def lex(self) -> None | list[Token]:
+    def lex(self) -> list[Token]:
+        return list(self.iter_tokens())
+
+    def iter_tokens(self) -> Iterator[Token]:
+        """Lazily lex the buffer, yielding tokens as soon as they are read."""
         while True:
             match self.peek():
                 case "[":
-                    self.lex_tag_pair()
+                    yield from self.lex_tag_pair()
                 case "\n":
                     _ = self.read()
                     self._cr_pos()
                     if self.peek() and self.peek().isdigit():
-                        self.lex_movetext()
-                        # break
+                        if self._headers_only:
+                            yield from self.skip_movetext()
+                        else:
+                            yield from self.lex_movetext()
                 case None:
                     break
                 case _:
                     _ = self.read()
-        return self._tokens
 
-    def lex_tag_pair(self):
+    def lex_tag_pair(self) -> Iterator[Token]:
         # r"\[([A-Za-z0-9\_\+\=\-\:]*)\s\"(.*)\"\]"
         c = self.read()
         self._expect(str(c), "[", "TagPair Not correctly structured")
-        self._tokens.append(
-            Token(
-                str(c), TokenType.LSQB, Position(self._loc.linenumber, self._loc.column)
-            )
+        yield Token(
+            str(c), TokenType.LSQB, Position(self._loc.linenumber, self._loc.column)
         )
         self._incr_pos_column()
-        self.lex_tag_name()
-        self.lex_tag_value()
+        yield self.lex_tag_name()
+        yield self.lex_tag_value()
         c = self.read()
         self._expect(str(c), "]", "TagPair Not correctly structured")
-        self._tokens.append(
-            Token(
-                str(c), TokenType.RSQB, Position(self._loc.linenumber, self._loc.column)
-            )
+        yield Token(
+            str(c), TokenType.RSQB, Position(self._loc.linenumber, self._loc.column)
         )
         self._incr_pos_column()
 
-    def lex_tag_name(self):
+    def lex_tag_name(self) -> Token:
         tag_name: str = ""
         while (
             not (self.peek()) == '"'
             and not (self.peek()) == "\n"
             and not (self.peek()) == "]"
         ):
-            if data := self.read():
-                tag_name += data
-                self._incr_pos_column()
-        self._tokens.append(
-            Token(
-                tag_name.strip(),
-                TokenType.TAGNAME,
-                Position(self._loc.linenumber, self._loc.column - len(tag_name)),
-            )
+            data = self.read()
+            if data is None:
+                raise PGNLexerError("TagPair Not correctly structured")
+            tag_name += data
+            self._incr_pos_column()
+        return Token(
+            tag_name.strip(),
+            TokenType.TAGNAME,
+            Position(self._loc.linenumber, self._loc.column - len(tag_name)),
         )
 
-    def lex_tag_value(self):
+    def lex_tag_value(self) -> Token:
         tag_value: str = ""
         c = self.read()
         self._expect(str(c), '"', "TagPair Not correctly structured")
         self._incr_pos_column()
         while not (self.peek()) == '"':
-            if data := self.read():
-                tag_value += data
-                self._incr_pos_column()
-        self._tokens.append(
-            Token(
-                tag_value.strip(),
-                TokenType.TAGVALUE,
-                Position(self._loc.linenumber, self._loc.column - len(tag_value)),
-            )
+            data = self.read()
+            if data is None:
+                raise PGNLexerError("TagPair Not correctly structured")
+            tag_value += data
+            self._incr_pos_column()
+        tok = Token(
+            tag_value.strip(),
+            TokenType.TAGVALUE,
+            Position(self._loc.linenumber, self._loc.column - len(tag_value)),
         )
         c = self.read()
         self._expect(str(c), '"', "TagPair Not correctly structured")
         self._incr_pos_column()
+        return tok
+
+    def lex_movetext(self) -> Iterator[Token]:
+        """Lex the movetext of a game starting at the current buffer position.
 
-    def lex_movetext(self):
+        The patterns are matched in place on the original buffer, anchored at
+        `_buffer_pos`, so each character is visited once. The whitespace classes
+        in the patterns already cover line breaks, so newlines need no rewriting.
+        """
+        buffer = self._buffer
         while True:
-            match = movetext_pattern.match(
-                self._buffer[self._buffer_pos :].replace("\n", " ")
-            )
+            match = movetext_pattern.match(buffer, self._buffer_pos, self._buffer_end)
             if match:
-                movenumber = match.groupdict().get("movenumber")
-                tok: MoveToken | None = None
-                if movenumber:
-                    tok = MoveToken(
-                        movenumber,
-                        TokenType.MOVENUMBER,
-                        Position(self._loc.linenumber, self._loc.column),
-                    )
-                if not tok:
-                    return
-                whitemove = match.groupdict().get("whitemove")
+                movenumber, whitemove, whitecomment, _, blackmove, blackcomment = (
+                    match.groups()
+                )
+                tok = MoveToken(
+                    movenumber,
+                    TokenType.MOVENUMBER,
+                    Position(self._loc.linenumber, self._loc.column),
+                )
                 if whitemove:
                     tok.twhitemove = whitemove
-                whitecomment = match.groupdict().get("whitecomment")
                 if whitecomment:
                     tok.twhitemovecomment = whitecomment
-                blackmove = match.groupdict().get("blackmove")
                 if blackmove:
                     tok.tblackmove = blackmove
-                blackcomment = match.groupdict().get("blackcomment")
                 if blackcomment:
                     tok.tblackmovecomment = blackcomment
-                self._tokens.append(tok)
-                self._buffer_pos += match.end()
+                yield tok
+                self._buffer_pos = match.end()
             else:
                 term = game_term_pattern.match(
-                    self._buffer[self._buffer_pos :].replace("\n", " ")
+                    buffer, self._buffer_pos, self._buffer_end
                 )
                 if term:
-                    gameterm = term.groupdict().get("gameterm")
-                    if gameterm:
-                        self._tokens.append(
-                            Token(
-                                gameterm,
-                                TokenType.GAMETERM,
-                                Position(self._loc.linenumber, self._loc.column),
-                            )
-                        )
+                    yield Token(
+                        term.group("gameterm"),
+                        TokenType.GAMETERM,
+                        Position(self._loc.linenumber, self._loc.column),
+                    )
+                    self._buffer_pos = term.end()
+                break
+
+    def skip_movetext(self) -> Iterator[Token]:
+        """Record the span of the movetext at the current position without lexing it.
 
+        The movetext runs up to the next tag pair line and its game
+        termination marker is read off its end.
+        """
+        buffer = self._buffer
+        start = self._buffer_pos
+        next_tag_pair = next_tag_pair_pattern.search(buffer, start, self._buffer_end)
+        end = next_tag_pair.start() if next_tag_pair else self._buffer_end
+        self._buffer_pos = end
+        yield MovetextToken(
+            "",
+            TokenType.MOVETEXT,
+            Position(self._loc.linenumber, self._loc.column),
+            buffer,
+            start,
+            end,
+        )
+        while end > start and buffer[end - 1].isspace():
+            end -= 1
+        for gameterm in game_terms:
+            if buffer.endswith(gameterm, start, end):
+                yield Token(
+                    gameterm,
+                    TokenType.GAMETERM,
+                    Position(self._loc.linenumber, self._loc.column),
+                )
                 break
 
     def read(self) -> str | None:
-        if self._buffer_pos >= len(self._buffer):
+        if self._buffer_pos >= self._buffer_end:
             return None
         res = self._buffer[self._buffer_pos]
         self._buffer_pos += 1
@@ -219,7 +275,7 @@ class Lexer:
         self._buffer_pos -= 1
 
     def peek(self) -> str | None:
-        if self._buffer_pos >= len(self._buffer):
+        if self._buffer_pos >= self._buffer_end:
             return None
         return self._buffer[self._buffer_pos]
 
@@ -1,54 +1,81 @@
+from collections.abc import Iterable, Iterator
+from sys import intern
+
 from style_predictor.pgn_parser.exceptions import PGNParserError
 from style_predictor.pgn_parser.game import PGNGame
 from style_predictor.pgn_parser.game.game import PGNMove
 
-from .lexer import MoveToken, Token, TokenType
+from .lexer import Lexer, MovetextToken, MoveToken, Token, TokenType
+
+
+def _intern(value: str | None) -> str | None:
+    return intern(value) if value else value
+
+
+def move_from_token(move_token: MoveToken) -> PGNMove:
+    mod_black_comment = None
+    mod_white_comment = None
+    if move_token.twhitemovecomment:
+        mod_white_comment = move_token.twhitemovecomment[1:-1]
+    if move_token.tblackmovecomment:
+        mod_black_comment = move_token.tblackmovecomment[1:-1]
+    # Move numbers and SAN moves repeat across games, so share a single copy
+    # of each.
+    move_obj: dict[str, str | None] = {
+        "move_number": intern(move_token.tvalue),
+        "white_move": _intern(move_token.twhitemove),
+        "white_move_comment": mod_white_comment,
+        "black_move": _intern(move_token.tblackmove),
+        "black_move_comment": mod_black_comment,
+    }
+    return PGNMove(move_obj)
+
+
+def parse_movetext(source: str, start: int, end: int) -> list[PGNMove]:
+    """Parse the moves of the movetext lying between `start` and `end` in `source`."""
+    tokens = Lexer(source, start=start, end=end).lex_movetext()
+    return [move_from_token(tok) for tok in tokens if isinstance(tok, MoveToken)]
 
 
 class Parser:
-    def __init__(self, tokens: list[Token]):
-        self._tokens: list[Token] = tokens
+    def __init__(self, tokens: Iterable[Token]):
+        self._tokens: Iterable[Token] = tokens
 
     def parse(self) -> list[PGNGame]:
-        games: list[PGNGame] = list()
+        return list(self.iter_parse())
+
+    def iter_parse(self) -> Iterator[PGNGame]:
+        """Lazily parse the tokens, yielding each game once it is terminated.
+
+        The tokens are consumed as an iterator so only the game being built is
+        held in memory.
+        """
         game: PGNGame = PGNGame()
         tokens = iter(self._tokens)
-        while True:
-            try:
-                token = next(tokens)
-            except StopIteration:
-                break
+        for token in tokens:
             if token.ttype == TokenType.GAMETERM:
-                games.append(game)
+                yield game
                 game = PGNGame()
             elif token.ttype == TokenType.TAGNAME:
                 tag_name = token.tvalue
-                token_tvalue = next(tokens)
+                token_tvalue = self._next(tokens)
                 if token_tvalue.ttype != TokenType.TAGVALUE:
                     raise PGNParserError(f"Invalid Tag value: {token_tvalue.ttype}")
                 tag_value = token_tvalue.tvalue
                 game.add_tag(tag_name, tag_value)
+            elif token.ttype == TokenType.MOVETEXT and isinstance(token, MovetextToken):
+                game.add_movetext(token.tsource, token.tstart, token.tend)
             elif token.ttype == TokenType.MOVENUMBER and isinstance(token, MoveToken):
                 move_token = token
                 while True:
-                    mod_black_comment = None
-                    mod_white_comment = None
-                    if move_token.twhitemovecomment:
-                        mod_white_comment = move_token.twhitemovecomment[1:-1]
-                    if move_token.tblackmovecomment:
-                        mod_black_comment = move_token.tblackmovecomment[1:-1]
-                    move_obj: dict[str, str | None] = {
-                        "move_number": move_token.tvalue,
-                        "white_move": move_token.twhitemove,
-                        "white_move_comment": mod_white_comment,
-                        "black_move": move_token.tblackmove,
-                        "black_move_comment": mod_black_comment,
-                    }
-                    game.add_move(PGNMove(move_obj))
-                    move_token = next(tokens)
+                    game.add_move(move_from_token(move_token))
+                    move_token = self._next(tokens)
                     if move_token.ttype == TokenType.GAMETERM:
                         break
-                games.append(game)
+                yield game
                 game = PGNGame()
 
-        return games
+    def _next(self, tokens: Iterator[Token]) -> Token:
+        if (token := next(tokens, None)) is None:
+            raise PGNParserError("Unexpected end of tokens")
+        return token
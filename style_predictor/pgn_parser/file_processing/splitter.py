@@ -0,0 +1,201 @@
+import io
+import mmap
+import re
+from collections.abc import Iterator
+from contextlib import contextmanager
+from itertools import batched
+from typing import IO
+
+tag_line_pattern = re.compile(r"\s*\[[A-Za-z0-9_]+\s")
+tag_line_bytes_pattern = re.compile(
+    rb"^(?:\xef\xbb\xbf)?[ \t]*\[[A-Za-z0-9_]+[ \t][^\n]*", re.MULTILINE
+)
+non_space_bytes_pattern = re.compile(rb"\S")
+
+Buffer = bytes | mmap.mmap
+
+
+def iter_game_texts(handle: IO[str] | IO[bytes]) -> Iterator[str]:
+    """Read a pgn file line by line and yield the text of each game.
+
+    A game begins at the first tag pair line following the movetext of the
+    previous game, so only one game is held in memory at a time.
+
+    Args:
+        handle: open pgn file, in either text or binary mode.
+
+    Returns:
+        Iterator over the text of the games in the file.
+    """
+    lines: list[str] = []
+    in_movetext = False
+    for line in handle:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        if tag_line_pattern.match(line):
+            if in_movetext:
+                yield "".join(lines)
+                lines.clear()
+                in_movetext = False
+        elif line.strip():
+            in_movetext = True
+        lines.append(line)
+    if any(line.strip() for line in lines):
+        yield "".join(lines)
+
+
+@contextmanager
+def map_file(handle: IO[bytes]) -> Iterator[Buffer]:
+    """Memory-map an open binary file for reading.
+
+    Falls back to reading the file when it cannot be mapped, e.g. files that
+    are empty or not backed by a file descriptor.
+    """
+    try:
+        buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError, io.UnsupportedOperation):
+        yield handle.read()
+        return
+    try:
+        yield buffer
+    finally:
+        buffer.close()
+
+
+class GameScanner:
+    """Find where games begin in pgn scanned in several passes, each resuming
+    where the previous one stopped.
+
+    Attributes:
+        game_start: offset of the last game found, None before the first.
+        tags_end: offset of the end of the last tag pair line.
+    """
+
+    def __init__(self, start: int = 0):
+        self.game_start: int | None = None
+        self.tags_end = start
+
+    def scan(self, buffer: Buffer, start: int, end: int) -> Iterator[tuple[int, int]]:
+        """Find the games ended by the tag pair lines between `start` and `end`.
+
+        Args:
+            buffer: pgn data.
+            start: offset of a line to resume from, where the previous pass
+                stopped.
+            end: offset to stop looking for games at.
+
+        Returns:
+            Iterator over the (start, end) offsets of each game ended, the last
+            game found going on past `end` as far as this pass knows.
+        """
+        for tag_line in tag_line_bytes_pattern.finditer(buffer, start, end):
+            if self.game_start is None:
+                self.game_start = tag_line.start()
+            elif non_space_bytes_pattern.search(
+                buffer, self.tags_end, tag_line.start()
+            ):
+                yield self.game_start, tag_line.start()
+                self.game_start = tag_line.start()
+            self.tags_end = tag_line.end()
+
+
+def iter_game_offsets(
+    buffer: Buffer, start: int = 0, end: int | None = None
+) -> Iterator[tuple[int, int]]:
+    """Find where each game lies in the pgn data without copying it.
+
+    A game begins at the first tag pair line following the movetext of the
+    previous game, which copes with games not starting with an Event tag and
+    with CRLF line endings. Anything before the first tag pair is skipped.
+
+    Args:
+        buffer: pgn data, e.g. a memory-mapped file.
+        start: offset to start looking for games from.
+        end: offset to stop looking for games at, defaults to the buffer length.
+
+    Returns:
+        Iterator over the (start, end) offsets of each game.
+    """
+    end = len(buffer) if end is None else end
+    scanner = GameScanner(start)
+    yield from scanner.scan(buffer, start, end)
+    if scanner.game_start is not None:
+        yield scanner.game_start, end
+
+
+def decode_range(buffer: Buffer, start: int, end: int) -> str:
+    """Decode the pgn text lying between `start` and `end` in `buffer`."""
+    return buffer[start:end].decode("utf-8", errors="replace")
+
+
+def iter_chunk_offsets(
+    game_offsets: Iterator[tuple[int, int]], chunk_size: int
+) -> Iterator[tuple[int, int]]:
+    """Group the games into chunks of at most `chunk_size` consecutive games.
+
+    Args:
+        game_offsets: (start, end) offsets of each game.
+        chunk_size: maximum number of games in a chunk.
+
+    Returns:
+        Iterator over the (start, end) offsets of each chunk.
+    """
+    for chunk in batched(game_offsets, chunk_size):
+        yield chunk[0][0], chunk[-1][1]
+
+
+def find_game_start(buffer: Buffer, pos: int, end: int | None = None) -> int:
+    """Find the offset of the first game beginning at or after `pos`.
+
+    Only the pgn from the line holding `pos` to the end of the following game
+    is scanned, so cuts can be placed in a large file without reading it all.
+
+    Args:
+        buffer: pgn data, e.g. a memory-mapped file.
+        pos: offset to look for a game from.
+        end: offset to stop looking at, defaults to the buffer length.
+
+    Returns:
+        Offset of the game, else `end` when no game begins after `pos`.
+    """
+    end = len(buffer) if end is None else end
+    if pos >= end:
+        return end
+    line_start = buffer.rfind(b"\n", 0, pos) + 1
+    for game_start, game_end in iter_game_offsets(buffer, line_start, end):
+        # Searching from the middle of the tag pairs of a game finds its
+        # remaining tag pairs first, which do not follow any movetext.
+        if game_start >= pos and not _follows_tag_pair(buffer, game_start):
+            return game_start
+        return game_end
+    return end
+
+
+def _follows_tag_pair(buffer: Buffer, pos: int) -> bool:
+    """Whether the last non-blank line before `pos` is a tag pair."""
+    pos -= 1
+    while pos >= 0 and buffer[pos] in b" \t\r\n":
+        pos -= 1
+    return pos >= 0 and buffer[pos] == ord("]")
+
+
+def iter_range_offsets(buffer: Buffer, range_size: int) -> Iterator[tuple[int, int]]:
+    """Cut the pgn data into ranges of whole games of about `range_size` bytes.
+
+    Unlike `iter_chunk_offsets`, the games do not need to be found first, each
+    cut is moved forward to the next game so the ranges can be processed
+    independently.
+
+    Args:
+        buffer: pgn data, e.g. a memory-mapped file.
+        range_size: number of bytes to aim for in each range.
+
+    Returns:
+        Iterator over the (start, end) offsets of each range.
+    """
+    end = len(buffer)
+    start = find_game_start(buffer, 0, end)
+    while start < end:
+        stop = find_game_start(buffer, start + range_size, end)
+        yield start, stop
+        start = stop
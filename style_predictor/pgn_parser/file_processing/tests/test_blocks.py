@@ -0,0 +1,51 @@
+import io
+
+import pytest
+
+from style_predictor.pgn_parser.file_processing.blocks import (
+    BlockReader,
+    is_block_file,
+    iter_block_file,
+    read_range,
+)
+
+PgnGame = b"""[Event "Live Chess"]
+[Result "1-0"]
+
+1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0
+
+"""
+
+
+def block_file(data: bytes, block_size: int, piece: int = 333) -> io.BytesIO:
+    pieces = (data[i : i + piece] for i in range(0, len(data), piece))
+    return io.BytesIO(b"".join(iter_block_file(pieces, block_size)))
+
+
+class TestBlocks:
+    def test_round_trip(self):
+        data = PgnGame * 200
+        handle = block_file(data, block_size=1000)
+        assert is_block_file(handle) and handle.tell() == 0  # nosec
+        reader = BlockReader(handle)
+        assert len(reader) == len(data)  # nosec
+        assert len(reader.index) == -(-len(data) // 1000)  # nosec
+        assert b"".join(reader.iter_blocks()) == data  # nosec
+        assert len(handle.getvalue()) < len(data) // 4  # nosec
+
+    @pytest.mark.parametrize(
+        "start,end", [(0, 10), (990, 1010), (500, 3500), (2000, 3000), (0, 10**9)]
+    )
+    def test_ranges_across_blocks(self, start, end):
+        data = PgnGame * 200
+        assert read_range(block_file(data, 1000), start, end) == data[start:end]  # nosec
+
+    def test_plain_files_are_read_as_they_are(self):
+        handle = io.BytesIO(PgnGame)
+        assert not is_block_file(handle)  # nosec
+        assert read_range(handle, 3, 8) == PgnGame[3:8]  # nosec
+
+    def test_empty_pgn(self):
+        handle = block_file(b"", 1000)
+        assert len(BlockReader(handle)) == 0  # nosec
+        assert read_range(handle, 0, 10) == b""  # nosec
@@ -0,0 +1,84 @@
+import bz2
+import gzip
+import io
+import lzma
+import zipfile
+
+import pytest
+
+from style_predictor.pgn_parser.file_processing.decompress import (
+    DecompressionError,
+    IteratorReader,
+    detect_compression,
+    iter_decompressed,
+)
+
+PgnGame = b"""[Event "Live Chess"]
+[Result "1-0"]
+
+1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0
+
+"""
+
+
+def make_zip(members: dict[str, bytes]) -> bytes:
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return data.getvalue()
+
+
+class TestDecompress:
+    @pytest.mark.parametrize(
+        "compression,compress",
+        [
+            ("gzip", gzip.compress),
+            ("bz2", bz2.compress),
+            ("xz", lzma.compress),
+            ("zip", lambda data: make_zip({"games.pgn": data})),
+        ],
+    )
+    def test_formats(self, compression, compress):
+        data = PgnGame * 1000
+        handle = io.BytesIO(compress(data))
+        assert detect_compression(handle) == compression  # nosec
+        assert handle.tell() == 0  # nosec
+        blocks = list(iter_decompressed(handle, compression))
+        assert b"".join(blocks).rstrip() == data.rstrip()  # nosec
+
+    def test_plain_pgn_is_not_compressed(self):
+        assert detect_compression(io.BytesIO(PgnGame)) is None  # nosec
+        assert detect_compression(io.BytesIO(b"")) is None  # nosec
+
+    def test_zip_with_many_members(self):
+        archive = make_zip(
+            {
+                "2023/january.pgn": PgnGame.replace(b"1-0", b"0-1").rstrip(),
+                "2023/README.txt": b"not games",
+                "2023/february.PGN": PgnGame,
+            }
+        )
+        data = b"".join(iter_decompressed(io.BytesIO(archive), "zip"))
+        assert data.count(b"[Event") == 2  # nosec
+        assert b"not games" not in data  # nosec
+        assert b"0-1\n\n[Event" in data  # nosec
+
+    def test_inflating_past_max_size(self):
+        # Blocks of zeros compress to almost nothing.
+        bomb = gzip.compress(bytes(10 * 2**20))
+        with pytest.raises(DecompressionError):
+            for _ in iter_decompressed(io.BytesIO(bomb), "gzip", max_size=2**20):
+                pass
+
+    def test_corrupt_upload(self):
+        corrupt = gzip.compress(PgnGame * 100)[:-20]
+        with pytest.raises(DecompressionError):
+            list(iter_decompressed(io.BytesIO(corrupt), "gzip"))
+
+    def test_iterator_reader(self):
+        reader = IteratorReader(iter([b"abc", b"", b"defgh"]))
+        assert reader.read(2) == b"ab"  # nosec
+        assert reader.read(4) == b"c"  # nosec
+        assert reader.read() == b"defgh"  # nosec
+        assert reader.read(1) == b""  # nosec
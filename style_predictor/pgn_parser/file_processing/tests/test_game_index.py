@@ -0,0 +1,112 @@
+from unittest import mock
+
+import pytest
+
+from style_predictor.pgn_parser.file_processing.game_index import (
+    GameIndex,
+    GameIndexError,
+    build_game_index,
+)
+from style_predictor.pgn_parser.file_processing.splitter import (
+    GameScanner,
+    iter_game_offsets,
+)
+
+PgnGame = b"""[Event "Live Chess"]
+[White "playerOne"]
+[Black "player\\"Two\\""]
+[Result "1-0"]
+[WhiteElo "1200"]
+[BlackElo "?"]
+[TimeControl "60"]
+[Date "2024.01.02"]
+[ECO "C20"]
+
+1. e4 {[%clk 0:00:59.2]} e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0
+
+"""
+
+Untagged = b"""[White "PLAYERONE"]
+[Black "playerThree"]
+[Result "0-1"]
+
+1. f3 e5 2. g4 Qh4# 0-1
+"""
+
+
+def pieces(data: bytes, size: int) -> list[bytes]:
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+class TestGameIndex:
+    @pytest.mark.parametrize("piece_size", [1, 7, 100, 10**6])
+    def test_offsets_match_the_splitter(self, piece_size):
+        data = b"junk before the games\n" + (PgnGame + Untagged) * 20
+        data += PgnGame.replace(b"\n", b"\r\n")
+        index = build_game_index(pieces(data, piece_size))
+        assert list(index.iter_offsets()) == list(iter_game_offsets(data))  # nosec
+        assert index.size == len(data) and len(index) == 41  # nosec
+
+    def test_long_game_is_scanned_once(self):
+        data = PgnGame + Untagged.replace(b"f3", b"f3 e6 " * 1000) + PgnGame
+        scan = GameScanner.scan
+        with mock.patch.object(
+            GameScanner, "scan", autospec=True, side_effect=scan
+        ) as scanned:
+            index = build_game_index(pieces(data, 64))
+        assert list(index.iter_offsets()) == list(iter_game_offsets(data))  # nosec
+        ranges = [end - start for (_, _, start, end), _ in scanned.call_args_list]
+        assert sum(ranges) <= len(data)  # nosec
+
+    def test_header_columns(self):
+        index = build_game_index([PgnGame, Untagged])
+        assert index.column("White") == ["playerOne", "PLAYERONE"]  # nosec
+        assert index.column("Black") == ['player"Two"', "playerThree"]  # nosec
+        assert index.column("WhiteElo") == [1200, None]  # nosec
+        assert index.column("BlackElo") == [None, None]  # nosec
+        assert index.column("ECO") == ["C20", ""]  # nosec
+        assert index.where("White", ["playerone"]) == [0, 1]  # nosec
+        assert index.where("Result", ["0-1", "1/2-1/2"]) == [1]  # nosec
+        assert index.where("WhiteElo", [1200]) == [0]  # nosec
+
+    def test_offsets_between(self):
+        data = PgnGame * 5
+        index = build_game_index([data])
+        start, end = len(PgnGame), 3 * len(PgnGame) + 10
+        assert list(index.iter_offsets(start, end)) == [  # nosec
+            (len(PgnGame), 2 * len(PgnGame)),
+            (2 * len(PgnGame), 3 * len(PgnGame)),
+            (3 * len(PgnGame), end),
+        ]
+
+    def test_chunks_of_games(self):
+        data = PgnGame * 2 + Untagged + PgnGame * 3
+        index = build_game_index([data])
+        assert index.games_between(1, 2 * len(PgnGame) + 1) == range(1, 3)  # nosec
+        games = [i for i, eco in enumerate(index.column("ECO")) if eco]
+        assert games == [0, 1, 3, 4, 5]  # nosec
+        after = 2 * len(PgnGame) + len(Untagged)
+        assert list(index.iter_chunk_offsets(games, 2)) == [  # nosec
+            (0, 2 * len(PgnGame)),
+            (after, after + 2 * len(PgnGame)),
+            (after + 2 * len(PgnGame), len(data)),
+        ]
+
+    def test_round_trip(self):
+        index = build_game_index(pieces(PgnGame * 100, 1000))
+        loaded = GameIndex.from_bytes(index.to_bytes())
+        assert loaded.sha256 == index.sha256 and len(loaded) == 100  # nosec
+        assert loaded.column("Date") == index.column("Date")  # nosec
+        assert len(index.to_bytes()) < len(PgnGame) * 100 // 20  # nosec
+
+    def test_corrupt_index(self):
+        data = bytearray(build_game_index([PgnGame]).to_bytes())
+        data[-1] ^= 0xFF
+        with pytest.raises(GameIndexError):
+            GameIndex.from_bytes(bytes(data))
+        with pytest.raises(GameIndexError):
+            GameIndex.from_bytes(PgnGame)
+
+    def test_empty_pgn(self):
+        index = build_game_index([])
+        assert len(index) == 0 and list(index.iter_offsets()) == []  # nosec
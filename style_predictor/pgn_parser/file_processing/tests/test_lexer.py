@@ -113,3 +113,33 @@ class TestLexer:
         with pytest.raises(PGNLexerError) as pgn_err:
             Lexer(ErrPgnFile).lex()
         assert pgn_err.value.args[0] == "TagPair Not correctly structured"  # nosec
+
+    def test_lex_movetext_across_line_breaks(self):
+        wrapped = PgnFileWithSeparatedMoves.replace("} ", "}\n").replace("\n", "\r\n")
+        expected = [(t.ttype, t.tvalue) for t in Lexer(PgnFileWithSeparatedMoves).lex()]
+        assert [(t.ttype, t.tvalue) for t in Lexer(wrapped).lex()] == expected  # nosec
+
+    def test_lex_movetext_many_games(self):
+        tokens = Lexer(PgnFileWithMoves * 50).lex()
+        assert (
+            len([token for token in tokens if token.ttype == TokenType.GAMETERM]) == 50
+        )  # nosec
+        assert (
+            len([token for token in tokens if token.ttype == TokenType.MOVENUMBER])
+            == 23 * 50
+        )  # nosec
+
+    def test_lex_truncated_tag_pair(self):
+        with pytest.raises(PGNLexerError) as pgn_err:
+            Lexer('[Event "Unterminated').lex()
+        assert pgn_err.value.args[0] == "TagPair Not correctly structured"  # nosec
+
+    def test_lex_headers_only(self):
+        tokens = Lexer(PgnFileWithSeparatedMoves, headers_only=True).lex()
+        assert not [t for t in tokens if t.ttype == TokenType.MOVENUMBER]  # nosec
+        movetext = [t for t in tokens if t.ttype == TokenType.MOVETEXT]
+        assert len(movetext) == 1  # nosec
+        span = PgnFileWithSeparatedMoves[movetext[0].tstart : movetext[0].tend]
+        assert span.startswith("1. e4") and span.strip().endswith("0-1")  # nosec
+        assert tokens[-1].ttype == TokenType.GAMETERM  # nosec
+        assert tokens[-1].tvalue == "0-1"  # nosec
@@ -29,3 +29,22 @@ class TestParser:
         assert len(games) == 1  # nosec
         assert games[0].Result == "1/2-1/2"  # nosec
         assert games[0].White == "Garry Kasparov"  # nosec
+
+    def test_iter_parse_from_token_iterator(self):
+        tokens = Lexer(PgnFileWithMoves * 3).iter_tokens()
+        games = Parser(tokens).iter_parse()
+        assert next(games).White == "Garry Kasparov"  # nosec
+        assert len(list(games)) == 2  # nosec
+
+    def test_parse_headers_only(self):
+        data = PgnFileWithMoves * 3
+        eager: list[PGNGame] = Parser(Lexer(data).iter_tokens()).parse()
+        lazy: list[PGNGame] = Parser(
+            Lexer(data, headers_only=True).iter_tokens()
+        ).parse()
+        assert len(lazy) == 3  # nosec
+        for eager_game, lazy_game in zip(eager, lazy):
+            assert lazy_game._movetext is not None  # nosec
+            assert lazy_game.tag_pairs == eager_game.tag_pairs  # nosec
+            assert repr(lazy_game.moves) == repr(eager_game.moves)  # nosec
+            assert lazy_game._movetext is None  # nosec
@@ -0,0 +1,99 @@
+import io
+
+import pytest
+
+from style_predictor.pgn_parser.file_processing.splitter import (
+    decode_range,
+    iter_chunk_offsets,
+    iter_game_offsets,
+    iter_game_texts,
+    iter_range_offsets,
+    map_file,
+)
+
+PgnFileWithMoves = """[Event "46th URS-ch selection"]
+[Site "Daugavpils URS"]
+[Result "1/2-1/2"]
+[White "Garry Kasparov"]
+[Black "Igor Vasilievich Ivanov"]
+
+1.d4 Nf6 2.Nf3 d5 3.e3 Bf5 4.c4 c6 5.Nc3 e6 6.Bd3 Bxd3 7.Qxd3 Nbd7 8.b3 Bd6
+9.O-O O-O 10.Bb2 Qe7 1/2-1/2
+
+"""
+
+PgnFileWithoutEvent = """[Site "Chess.com"]
+[Result "1-0"]
+
+1. e4 {[%clk 0:00:59.2]} 1... e5 {
+[%clk 0:00:59.9]} 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0
+
+"""
+
+
+class TestSplitter:
+    def test_iter_game_texts(self):
+        handle = io.StringIO(PgnFileWithMoves * 3)
+        assert list(iter_game_texts(handle)) == [PgnFileWithMoves] * 3  # nosec
+
+    def test_iter_game_texts_binary(self):
+        data = (PgnFileWithMoves + PgnFileWithoutEvent).replace("\n", "\r\n")
+        texts = list(iter_game_texts(io.BytesIO(data.encode())))
+        assert texts == [  # nosec
+            PgnFileWithMoves.replace("\n", "\r\n"),
+            PgnFileWithoutEvent.replace("\n", "\r\n"),
+        ]
+
+    def test_iter_game_texts_empty(self):
+        assert list(iter_game_texts(io.StringIO("\n\n"))) == []  # nosec
+
+    @pytest.mark.parametrize("newline", ("\n", "\r\n"))
+    def test_iter_game_offsets(self, newline: str):
+        games = [PgnFileWithMoves, PgnFileWithoutEvent, PgnFileWithMoves]
+        games = [game.replace("\n", newline) for game in games]
+        data = "".join(games).encode()
+        texts = [decode_range(data, *offsets) for offsets in iter_game_offsets(data)]
+        assert texts == games  # nosec
+
+    def test_iter_game_offsets_skips_leading_text(self):
+        data = ("\ufeff; exported games\n\n" + PgnFileWithoutEvent).encode()
+        offsets = list(iter_game_offsets(data))
+        assert len(offsets) == 1  # nosec
+        assert decode_range(data, *offsets[0]) == PgnFileWithoutEvent  # nosec
+
+    def test_iter_chunk_offsets(self, tmp_path):
+        path = tmp_path / "games.pgn"
+        path.write_text(PgnFileWithMoves * 5 + PgnFileWithoutEvent * 2)
+        with open(path, "rb") as f, map_file(f) as buffer:
+            chunks = list(iter_chunk_offsets(iter_game_offsets(buffer), 3))
+            assert len(chunks) == 3  # nosec
+            assert chunks[0][0] == 0 and chunks[-1][1] == len(buffer)  # nosec
+            assert [  # nosec
+                len(list(iter_game_offsets(buffer, *chunk))) for chunk in chunks
+            ] == [3, 3, 1]
+            last_chunk = decode_range(buffer, *chunks[-1])
+            assert last_chunk == PgnFileWithoutEvent  # nosec
+
+    def test_map_empty_file(self, tmp_path):
+        path = tmp_path / "empty.pgn"
+        path.write_bytes(b"")
+        with open(path, "rb") as f, map_file(f) as buffer:
+            assert list(iter_game_offsets(buffer)) == []  # nosec
+
+    @pytest.mark.parametrize("newline", ("\n", "\r\n"))
+    def test_iter_range_offsets_cut_at_games(self, newline: str):
+        games = [PgnFileWithMoves, PgnFileWithoutEvent] * 3
+        data = ("; exported games\n" + "".join(games)).replace("\n", newline).encode()
+        game_offsets = list(iter_game_offsets(data))
+        starts = {start for start, _ in game_offsets}
+        # Cut at every possible position, including inside tag pairs.
+        for range_size in range(1, len(data) + 2, 7):
+            ranges = list(iter_range_offsets(data, range_size))
+            assert ranges[0][0] == game_offsets[0][0]  # nosec
+            assert ranges[-1][1] == len(data)  # nosec
+            for (_, stop), (start, _) in zip(ranges, ranges[1:]):
+                assert stop == start and start in starts  # nosec
+
+    def test_iter_range_offsets_empty(self):
+        assert list(iter_range_offsets(b"", 10)) == []  # nosec
+        assert list(iter_range_offsets(b"\n\n", 10)) == []  # nosec
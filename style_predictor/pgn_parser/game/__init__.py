@@ -1,14 +1,50 @@
 __all__ = ("PGNGame",)
 
+from collections.abc import Iterator
+from typing import IO
+
 from .game import PGNGame
 
 
-def get_games(data: str) -> list[PGNGame] | None:
-    from style_predictor.pgn_parser.file_processing.lexer import Lexer, Token
+def get_games(data: str, headers_only: bool = False) -> list[PGNGame]:
+    """Parse all the games in `data`.
+
+    Args:
+        data: pgn text.
+        headers_only: only lex the tags, the moves are decoded on first access.
+
+    Returns:
+        List of the parsed games.
+    """
+    from style_predictor.pgn_parser.file_processing.lexer import Lexer
+    from style_predictor.pgn_parser.file_processing.parser import Parser
+
+    return Parser(Lexer(data, headers_only=headers_only).iter_tokens()).parse()
+
+
+def iter_games(
+    handle: IO[str] | IO[bytes], headers_only: bool = False
+) -> Iterator[PGNGame]:
+    """Lazily parse the games of an open pgn file.
+
+    The file is read one game at a time and tokens flow straight from the
+    lexer into the parser, so memory is bounded by the largest single game.
+
+    Args:
+        handle: open pgn file, in either text or binary mode.
+        headers_only: only lex the tags, the moves are decoded on first access.
+
+    Returns:
+        Iterator over the parsed games.
+    """
+    from itertools import chain
+
+    from style_predictor.pgn_parser.file_processing.lexer import Lexer
     from style_predictor.pgn_parser.file_processing.parser import Parser
+    from style_predictor.pgn_parser.file_processing.splitter import iter_game_texts
 
-    tokens: list[Token] | None = Lexer(data).lex()
-    games: list[PGNGame] | None = None
-    if tokens:
-        games = Parser(tokens).parse()
-    return games
+    tokens = chain.from_iterable(
+        Lexer(text, headers_only=headers_only).iter_tokens()
+        for text in iter_game_texts(handle)
+    )
+    yield from Parser(tokens).iter_parse()
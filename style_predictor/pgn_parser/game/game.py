@@ -1,5 +1,5 @@
 import json
-from collections import defaultdict
+from collections.abc import Iterator, Mapping
 from typing import override
 
 valid_pgn_tags = (
@@ -45,7 +45,18 @@ valid_pgn_tags = (
 )
 
 
+_tag_index: dict[str, int] = {tag: i for i, tag in enumerate(valid_pgn_tags)}
+
+
 class PGNMove:
+    __slots__ = (
+        "_black_move",
+        "_black_move_comment",
+        "_move_number",
+        "_white_move",
+        "_white_move_comment",
+    )
+
     def __init__(self, moveobject: dict[str, str | None]):
         self._move_number = moveobject.get("move_number")
         self._white_move = moveobject.get("white_move")
@@ -78,36 +89,121 @@ class PGNMove:
         return f"{self._move_number} {self._white_move} {self._black_move}"
 
 
+class TagPairs(Mapping[str, str | None]):
+    """Read-only view over the tags of a game.
+
+    Missing tags read as None, like the `defaultdict` this view replaces,
+    while `get` still honours its default.
+    """
+
+    __slots__ = ("_game",)
+
+    def __init__(self, game: "PGNGame"):
+        self._game = game
+
+    @override
+    def __getitem__(self, key: str) -> str | None:
+        return self.get(key)
+
+    @override
+    def get(self, key: str, default=None):
+        if (idx := _tag_index.get(key)) is not None:
+            value = self._game._tag_values[idx]
+        elif self._game._extra_tags:
+            value = self._game._extra_tags.get(key)
+        else:
+            value = None
+        return default if value is None else value
+
+    @override
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self.get(key) is not None
+
+    @override
+    def __iter__(self) -> Iterator[str]:
+        for tag, value in zip(valid_pgn_tags, self._game._tag_values):
+            if value is not None:
+                yield tag
+        if self._game._extra_tags:
+            yield from self._game._extra_tags
+
+    @override
+    def __len__(self) -> int:
+        known = len(valid_pgn_tags) - self._game._tag_values.count(None)
+        return known + len(self._game._extra_tags or ())
+
+    @override
+    def __repr__(self) -> str:
+        return f"TagPairs({dict(self)})"
+
+
 class PGNGame:
+    """A parsed game.
+
+    Known tags live in a fixed list indexed by their position in
+    `valid_pgn_tags`; any other tag goes to a side dict created on demand.
+    Games parsed in headers only mode keep the span of their movetext, which is
+    decoded into moves on first access.
+    """
+
+    __slots__ = ("_extra_tags", "_moves", "_movetext", "_tag_values")
+
     def __init__(self):
-        self._tags: dict[str, None | str] = defaultdict(lambda: None)
+        self._tag_values: list[str | None] = [None] * len(valid_pgn_tags)
+        self._extra_tags: dict[str, str] | None = None
         self._moves: list[PGNMove] = list()
+        self._movetext: tuple[str, int, int] | None = None
 
     def add_tag(self, tag_name: str, tag_value: str):
-        setattr(self, tag_name, tag_value)
-        self._tags[tag_name] = tag_value
+        if (idx := _tag_index.get(tag_name)) is not None:
+            self._tag_values[idx] = tag_value
+        else:
+            if self._extra_tags is None:
+                self._extra_tags = {}
+            self._extra_tags[tag_name] = tag_value
 
     def add_move(self, move: PGNMove):
-        self._moves.append(move)
+        self.moves.append(move)
+
+    def add_movetext(self, source: str, start: int, end: int):
+        """Defer parsing the moves lying between `start` and `end` in `source`."""
+        self._movetext = (source, start, end)
 
     @property
     def moves(self) -> list[PGNMove]:
+        if self._movetext is not None:
+            from style_predictor.pgn_parser.file_processing.parser import (
+                parse_movetext,
+            )
+
+            self._moves = parse_movetext(*self._movetext)
+            self._movetext = None
         return self._moves
 
     @property
-    def tag_pairs(self) -> dict[str, None | str]:
-        return self._tags
+    def plies(self) -> tuple[str, ...]:
+        """The SAN moves of the game in the order they were played."""
+        return tuple(
+            ply
+            for move in self.moves
+            for ply in (move.white_move, move.black_move)
+            if ply
+        )
+
+    @property
+    def tag_pairs(self) -> TagPairs:
+        return TagPairs(self)
 
     @property
     def white_moves(self) -> str | None:
         return " ".join(
-            [move.white_move for move in self._moves if move and move.white_move]
+            [move.white_move for move in self.moves if move and move.white_move]
         )
 
     @property
     def white_comments(self) -> str | None:
         comments: list[str] = list()
-        for move in self._moves:
+        for move in self.moves:
             if self._moves and move.white_move_comment:
                 comments.append(move.white_move_comment)
             elif move and move.white_move_comment is None:
@@ -117,7 +213,7 @@ class PGNGame:
     @property
     def black_comments(self) -> str | None:
         comments: list[str] = list()
-        for move in self._moves:
+        for move in self.moves:
             if self._moves and move.black_move_comment:
                 comments.append(move.black_move_comment)
             elif move and move.black_move_comment is None:
@@ -127,16 +223,27 @@ class PGNGame:
     @property
     def black_moves(self) -> str | None:
         return " ".join(
-            [move.black_move for move in self._moves if move and move.black_move]
+            [move.black_move for move in self.moves if move and move.black_move]
         )
 
     def to_json(self):
-        return json.dumps(self, default=lambda o: o.__dict__)
+        return json.dumps(
+            {"_tags": dict(self.tag_pairs), "_moves": self.moves},
+            default=lambda o: {slot: getattr(o, slot) for slot in o.__slots__},
+        )
+
+    def __getstate__(self):
+        # Decode pending movetext so the source buffer is not pickled along.
+        _ = self.moves
+        return super().__getstate__()
 
     def __getattr__(self, name: str):
-        if name in valid_pgn_tags:
-            return None
-        else:
-            raise AttributeError(
-                f"'{self.__class__.__name__}' object has no attribute '{name}'"
-            )
+        # Only reached when normal lookup fails, i.e. for tag names.
+        if not name.startswith("_"):
+            if (idx := _tag_index.get(name)) is not None:
+                return self._tag_values[idx]
+            if self._extra_tags and name in self._extra_tags:
+                return self._extra_tags[name]
+        raise AttributeError(
+            f"'{self.__class__.__name__}' object has no attribute '{name}'"
+        )
@@ -1,8 +1,23 @@
+import io
+import json
+import pickle  # nosec
+
 import pytest
 
-from style_predictor.pgn_parser.game import PGNGame
+from style_predictor.openings import to_plies
+from style_predictor.pgn_parser.game import PGNGame, iter_games
 from style_predictor.pgn_parser.game.game import PGNMove
 
+PgnFileWithMoves = """[Event "Live Chess"]
+[Site "Chess.com"]
+[White "playerOne"]
+[Black "playerTwo"]
+[Result "1-0"]
+
+1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0
+
+"""
+
 
 class TestPGNGame:
     @pytest.mark.parametrize(
@@ -76,3 +91,51 @@ class TestPGNGame:
                 black_comments.append("~")
         assert game.black_comments == " ".join(black_comments)  # nosec
         assert len(game.moves) == len(move_objects)  # nosec
+
+    @pytest.mark.parametrize(
+        "handle",
+        (
+            io.StringIO(PgnFileWithMoves * 3),
+            io.BytesIO((PgnFileWithMoves * 3).encode()),
+        ),
+    )
+    def test_iter_games(self, handle):
+        games = iter_games(handle)
+        game = next(games)
+        assert game.White == "playerOne"  # nosec
+        assert game.white_moves == "e4 Qh5 Bc4 Qxf7#"  # nosec
+        assert len(list(games)) == 2  # nosec
+
+    def test_tag_pairs_known_and_unknown_tags(self):
+        game = PGNGame()
+        game.add_tag("White", "playerOne")
+        game.add_tag("Timezone", "UTC")
+        tags = game.tag_pairs
+        assert tags["White"] == game.White == "playerOne"  # nosec
+        assert tags["Timezone"] == game.Timezone == "UTC"  # nosec
+        assert tags["Black"] is None and game.Black is None  # nosec
+        assert tags.get("Result", "?") == "?"  # nosec
+        assert "Black" not in tags  # nosec
+        assert dict(tags) == {"White": "playerOne", "Timezone": "UTC"}  # nosec
+        with pytest.raises(AttributeError):
+            _ = game.NotATag
+
+    @pytest.mark.parametrize("headers_only", (False, True))
+    def test_pickle_and_json(self, headers_only: bool):
+        handle = io.StringIO(PgnFileWithMoves)
+        game = next(iter_games(handle, headers_only=headers_only))
+        copy = pickle.loads(pickle.dumps(game))  # nosec
+        assert copy.tag_pairs == game.tag_pairs  # nosec
+        assert copy.white_moves == game.white_moves  # nosec
+        data = json.loads(game.to_json())
+        assert data["_tags"]["Result"] == "1-0"  # nosec
+        assert data["_moves"][0]["_white_move"] == "e4"  # nosec
+
+    @pytest.mark.parametrize(
+        "movetext",
+        ("1. e4 e5 2. Nf3 *", "1.e4 e5 2.Nf3 *", "1. e4 1... e5 2. Nf3 *"),
+    )
+    def test_plies_match_opening_moves(self, movetext: str):
+        handle = io.StringIO(f'[Event "Live Chess"]\n\n{movetext}\n\n')
+        game = next(iter_games(handle))
+        assert game.plies == to_plies("1. e4 e5 2. Nf3") == ("e4", "e5", "Nf3")  # nosec
@@ -0,0 +1,213 @@
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any
+
+import redis
+from django.core.cache import BaseCache
+
+from style_predictor.apis.pgn.rate_limit import FetchMetrics
+
+LOG = logging.getLogger(__name__)
+
+# Bumped whenever the analysis of a chunk changes, so older results are ignored.
+RESULT_CACHE_VERSION = 1
+RESULT_CACHE_PREFIX = "chunk_analysis"
+RESULT_CACHE_METRICS = "result-cache"
+
+# Records the result of ARGV[1] as the most recently used in the sorted set
+# KEYS[1], then drops those used the longest ago until at most ARGV[2] are
+# left. Results expired meanwhile are only dropped from the set once evicted.
+# Returns the keys of the evicted results.
+RECORD_RESULT_SCRIPT = """
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+redis.call("ZADD", KEYS[1], now, ARGV[1])
+local excess = redis.call("ZCARD", KEYS[1]) - tonumber(ARGV[2])
+if excess <= 0 then
+    return {}
+end
+local evicted = redis.call("ZRANGE", KEYS[1], 0, excess - 1)
+redis.call("ZREMRANGEBYRANK", KEYS[1], 0, excess - 1)
+return evicted
+"""
+
+# Marks the result of ARGV[1] as the most recently used, if still recorded.
+TOUCH_RESULT_SCRIPT = """
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+redis.call("ZADD", KEYS[1], "XX", now, ARGV[1])
+"""
+
+
+def content_key(data: bytes | memoryview, *parts: str) -> str:
+    """Key the analysis of `data` by its hash and the other inputs of the analysis.
+
+    Args:
+        data: raw pgn text, e.g. a view of the games of a chunk.
+        parts: other inputs the result depends on, e.g. the usernames.
+
+    Returns:
+        Hex digest identifying the content.
+    """
+    digest = hashlib.sha256(data)
+    for part in parts:
+        digest.update(b"\0" + part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Bounded cache of the analysis results of pgn content.
+
+    Recently used results are kept in the process, at most `maxsize` of them,
+    evicting the least recently used first. Results are also stored in the
+    shared `backend` for `timeout` seconds, renewed on every hit, so that
+    other worker processes and later sessions skip parsing content already
+    seen. At most `max_entries` results are kept in the backend, those used
+    the longest ago being deleted first.
+
+    The hits and misses are counted in the backend, for all the workers, while
+    the results stored in the backend are accounted in this process, so each
+    process only evicts the results it stored. See `RedisResultCache` for one
+    shared by all the workers.
+    """
+
+    def __init__(
+        self,
+        backend: BaseCache,
+        maxsize: int,
+        timeout: int | None,
+        max_entries: int,
+    ):
+        self.backend = backend
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.metrics = FetchMetrics(RESULT_CACHE_METRICS, backend)
+        self._local: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        # Keys of the results stored in the backend, least recently used first.
+        self._stored: OrderedDict[str, None] = OrderedDict()
+
+    def _backend_key(self, key: str) -> str:
+        return f"{RESULT_CACHE_PREFIX}:{RESULT_CACHE_VERSION}:{key}"
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """Get the result stored for `key`, else None."""
+        if (result := self._local.get(key)) is not None:
+            self._local.move_to_end(key)
+        else:
+            backend_key = self._backend_key(key)
+            try:
+                result = self.backend.get(backend_key)
+                if result is not None:
+                    self.backend.touch(backend_key, self.timeout)
+            except Exception as exc:
+                LOG.warning(f"Analysis result cache unavailable: {exc}")
+                result = None
+            if result is not None:
+                self._touch(key)
+                self._remember(key, result)
+        self.metrics.incr("misses" if result is None else "hits")
+        return result
+
+    def set(self, key: str, result: dict[str, Any]):
+        """Store the result of the content identified by `key`, evicting the
+        results used the longest ago when over the cap.
+        """
+        self._remember(key, result)
+        try:
+            self.backend.set(self._backend_key(key), result, self.timeout)
+        except Exception as exc:
+            LOG.warning(f"Analysis result cache unavailable: {exc}")
+            return
+        evicted = self._record(key)
+        if not evicted:
+            return
+        try:
+            self.backend.delete_many([self._backend_key(key) for key in evicted])
+        except Exception as exc:
+            LOG.warning(f"Analysis result cache unavailable: {exc}")
+        LOG.info(f"Evicted {len(evicted)} analysis results to keep {self.max_entries}.")
+
+    def _remember(self, key: str, result: dict[str, Any]):
+        self._local[key] = result
+        self._local.move_to_end(key)
+        while len(self._local) > self.maxsize:
+            self._local.popitem(last=False)
+
+    def _touch(self, key: str):
+        """Mark the stored result of `key` as just used."""
+        if key in self._stored:
+            self._stored.move_to_end(key)
+
+    def _record(self, key: str) -> list[str]:
+        """Account the result of `key` as stored in the backend.
+
+        Returns:
+            The keys of the results to evict.
+        """
+        self._stored[key] = None
+        self._stored.move_to_end(key)
+        evicted: list[str] = []
+        while len(self._stored) > self.max_entries:
+            evicted.append(self._stored.popitem(last=False)[0])
+        return evicted
+
+    def _entries(self) -> int:
+        return len(self._stored)
+
+    def stats(self) -> dict[str, int]:
+        """Hits and misses of all the workers, results kept in this process and
+        results stored in the backend.
+        """
+        counters = self.metrics.get(("hits", "misses"))
+        return {**counters, "size": len(self._local), "entries": self._entries()}
+
+
+class RedisResultCache(ResultCache):
+    """Result cache accounted in redis, so the cap holds across all the workers.
+
+    The keys of the stored results are kept in a sorted set by when they were
+    last used, so recording a result and evicting those used the longest ago
+    is a single atomic call. Results are stored without accounting when redis
+    is unavailable.
+    """
+
+    def __init__(
+        self,
+        backend: BaseCache,
+        client: redis.Redis,
+        maxsize: int,
+        timeout: int | None,
+        max_entries: int,
+    ):
+        super().__init__(backend, maxsize, timeout, max_entries)
+        self.client = client
+        self._record_script = client.register_script(RECORD_RESULT_SCRIPT)
+        self._touch_script = client.register_script(TOUCH_RESULT_SCRIPT)
+
+    def _state_key(self) -> str:
+        return f"{RESULT_CACHE_PREFIX}:{RESULT_CACHE_VERSION}:lru"
+
+    def _touch(self, key: str):
+        try:
+            self._touch_script(keys=[self._state_key()], args=[key])
+        except redis.RedisError as exc:
+            LOG.warning(f"Analysis result cache accounting unavailable: {exc}")
+
+    def _record(self, key: str) -> list[str]:
+        try:
+            evicted = self._record_script(
+                keys=[self._state_key()], args=[key, self.max_entries]
+            )
+        except redis.RedisError as exc:
+            LOG.warning(f"Analysis result cache accounting unavailable: {exc}")
+            return []
+        return [key.decode("utf-8") for key in evicted]
+
+    def _entries(self) -> int:
+        try:
+            return self.client.zcard(self._state_key())
+        except redis.RedisError as exc:
+            LOG.warning(f"Analysis result cache accounting unavailable: {exc}")
+            return 0
@@ -45,6 +45,16 @@ class FormDetails(Schema):
     include_roast: bool = False
 
 
+class ChunkedUploadDetails(Schema):
+    usernames: str
+    include_roast: bool = False
+    size: int | None = None
+
+
+class FinalizeUpload(Schema):
+    sha256: str | None = None
+
+
 class ExternalUser(Schema):
     username: str
     platform: SupportedPlatforms = "chess.com"
@@ -1,37 +1,93 @@
+import hashlib
+import json
 import logging
-from collections import Counter, defaultdict
-from dataclasses import dataclass
-from typing import Any, Callable, NamedTuple
-from uuid import UUID
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable
+from functools import lru_cache
+from typing import IO, Any, NamedTuple
+from uuid import UUID, uuid4
 
 import palitra
-from celery import chord, current_app, shared_task
-from celery.signals import task_postrun
+import redis
+from celery import chord, current_app, shared_task, states
+from celery.signals import (
+    task_postrun,
+    worker_process_init,
+    worker_process_shutdown,
+)
+from django.conf import settings
 from django.core.cache import cache
-from django.core.files.base import ContentFile
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import Storage, default_storage
 from django.db import transaction
 from django.db.models.functions import Length
 
 import style_predictor.constants as constants
 from style_predictor.apis.analysis.models import AnalysisStage, TaskResult
+from style_predictor.apis.pgn.http_pool import close_http_pool, open_http_pool
 from style_predictor.apis.pgn.models import (
     ChessOpening,
     FileSource,
     PGNFileUpload,
     RoastRegister,
 )
-from style_predictor.apis.pgn.utils import get_chess_dot_com_games, get_lichess_games
+from style_predictor.apis.pgn.utils import (
+    get_chess_dot_com_archive_urls,
+    iter_chess_dot_com_archives,
+    iter_lichess_games,
+    lichess_game_start,
+    should_cache_archive,
+)
+from style_predictor.openings import MappedOpeningIndex, OpeningIndex
+from style_predictor.pgn_parser.file_processing.blocks import (
+    iter_block_file,
+    iter_pgn,
+    read_range,
+)
+from style_predictor.pgn_parser.file_processing.decompress import (
+    DecompressionError,
+    IteratorReader,
+    detect_compression,
+    iter_decompressed,
+    iter_stream,
+)
+from style_predictor.pgn_parser.file_processing.game_index import (
+    GameIndex,
+    GameIndexBuilder,
+    GameIndexError,
+    build_game_index,
+    index_name,
+)
+from style_predictor.pgn_parser.file_processing.splitter import (
+    Buffer,
+    decode_range,
+    iter_chunk_offsets,
+    iter_game_offsets,
+)
 from style_predictor.pgn_parser.game import get_games
 from style_predictor.pgn_parser.game.game import PGNGame
+from style_predictor.result_cache import (
+    RESULT_CACHE_VERSION,
+    RedisResultCache,
+    ResultCache,
+    content_key,
+)
 from style_predictor.roasts import generate_roast
 from style_predictor.utils import (
     average_rating,
     group_openings_with_eco,
     merge_game_objects,
+    plan_chunks,
     sort_openings,
 )
 
 LOG = logging.getLogger(__name__)
+# Names of the pgn files stored once per content, see `blob_name`.
+blob_name_pattern = re.compile(r"blobs/[0-9a-f]{64}\.pgnb")
 
 
 class ChessOpeningDetails(NamedTuple):
@@ -40,12 +96,6 @@ class ChessOpeningDetails(NamedTuple):
     number: int
 
 
-@dataclass(frozen=True)
-class OpeningFound:
-    eco_code: str
-    full_name: str
-
-
 def get_openings_from_cache() -> list[ChessOpening]:
     """Access all cached openings.
 
@@ -63,52 +113,62 @@ def get_openings_from_cache() -> list[ChessOpening]:
     return all_openings
 
 
-def find_best_opening_by_moves(
-    move_str: str, opening_bucket: dict[str, list[ChessOpening]]
-) -> OpeningFound | None:
-    """Get the best chess opening fitting the moves provided.
+@lru_cache(maxsize=1)
+def get_opening_index() -> OpeningIndex | MappedOpeningIndex:
+    """Load the index of the openings once per process.
 
-    Args:
-        move_str: Contains the moves to categorize.
-        opening_bucket: Maps the first_move to openings with that first move.
+    The prebuilt index written by `import_chess_openings` is memory-mapped when
+    present, else the index is built from the cached openings.
 
     Returns:
-        first match of the opening based on the move, else None.
+        Index of all the chess openings.
     """
-    parts = move_str.split(" ")
-    first_move = " ".join(parts[:2]) if len(parts) >= 2 else move_str
-    candidates = opening_bucket.get(first_move, [])
-    return next(
-        (
-            OpeningFound(opening.eco_code, opening.full_name)
-            for opening in candidates
-            if move_str.startswith(opening.moves)
-        ),
-        None,
+    try:
+        return MappedOpeningIndex.open(settings.OPENINGS_INDEX_PATH)
+    except (OSError, ValueError) as exc:
+        LOG.warning(f"Building openings index, prebuilt one not loaded: {exc}")
+        return OpeningIndex(get_openings_from_cache())
+
+
+@lru_cache(maxsize=1)
+def get_result_cache() -> ResultCache:
+    """Get the cache of the chunk analysis results of this process, accounted
+    in redis when configured.
+    """
+    if not settings.ANALYSIS_RESULT_CACHE_REDIS_URL:
+        return ResultCache(
+            cache,
+            maxsize=settings.ANALYSIS_RESULT_CACHE_SIZE,
+            timeout=settings.ANALYSIS_RESULT_CACHE_TIMEOUT,
+            max_entries=settings.ANALYSIS_RESULT_CACHE_MAX_ENTRIES,
+        )
+    return RedisResultCache(
+        cache,
+        redis.Redis.from_url(settings.ANALYSIS_RESULT_CACHE_REDIS_URL),
+        maxsize=settings.ANALYSIS_RESULT_CACHE_SIZE,
+        timeout=settings.ANALYSIS_RESULT_CACHE_TIMEOUT,
+        max_entries=settings.ANALYSIS_RESULT_CACHE_MAX_ENTRIES,
     )
 
 
-def bucket_openings_by_first_move(
-    openings: list[ChessOpening],
-) -> dict[str, list[ChessOpening]]:
-    """Create buckets of openings by the first moves.
-    e.g. All openings begin with e4 will be in the same bucket.
+@worker_process_init.connect
+def load_opening_index(**kwargs):
+    get_opening_index()
 
-    Args:
-        openings - List of ChessOpening objects.
 
-    Returns:
-        bucket containing the groups of chess openings.
-    """
-    buckets: dict[str, list[ChessOpening]] = defaultdict(list)
-    for opening in openings:
-        parts = opening.moves.split(" ")
-        key = " ".join(parts[:2]) if len(parts) >= 2 else opening.moves
-        buckets[key].append(opening)
-    return buckets
+@worker_process_init.connect
+def open_worker_http_pool(**kwargs):
+    open_http_pool()
+
 
+@worker_process_shutdown.connect
+def close_worker_http_pool(**kwargs):
+    close_http_pool()
 
-def map_eco_code(eco_codes: list[tuple[str, str]]) -> list[ChessOpeningDetails]:
+
+def map_eco_code(
+    eco_codes: list[tuple[str, tuple[str, ...]]],
+) -> list[ChessOpeningDetails]:
     """Get the opening name from the eco code in the game details.
 
     Args:
@@ -118,19 +178,15 @@ def map_eco_code(eco_codes: list[tuple[str, str]]) -> list[ChessOpeningDetails]:
         list of chess opening details - eco_code, moves, number of times the opening is used in the games.
     """
     res: list[tuple[str, str]] = []
-    all_openings = get_openings_from_cache()
-    fallbacks = {opening.eco_code: opening.full_name for opening in all_openings}
-    opening_buckets = bucket_openings_by_first_move(all_openings)
-    for eco_code, move_str in eco_codes:
-        if moves_found := find_best_opening_by_moves(
-            move_str, opening_bucket=opening_buckets
-        ):
+    opening_index = get_opening_index()
+    for eco_code, plies in eco_codes:
+        if moves_found := opening_index.find_by_moves(plies):
             res.append((moves_found.eco_code, moves_found.full_name))
-        elif full_name := fallbacks.get(eco_code):
+        elif full_name := opening_index.fallbacks.get(eco_code):
             res.append((eco_code, full_name))
             LOG.info(f"No approx. for {eco_code} using {full_name}")
         else:
-            LOG.warning(f"ECO {eco_code} for {move_str[:20]=} not found.")
+            LOG.warning(f"ECO {eco_code} for {plies[:6]=} not found.")
     eco_counter = Counter(res)
     return [ChessOpeningDetails(*eco[0], eco[1]) for eco in eco_counter.most_common(5)]
 
@@ -201,62 +257,426 @@ def get_avg_opponent_rating_by_time_control(
 
 
 def save_file_and_queue_task(
-    session_id: UUID, username: str, pgn_data: str, source: FileSource
+    session_id: UUID,
+    username: str,
+    pgn_data: str | bytes | IO[bytes],
+    source: FileSource,
+    archive_ranges: list[tuple[str, int, int]] | None = None,
+    cached_results: list[dict[str, Any]] | None = None,
 ) -> dict[str, Any]:
     """Saves the file and starts the celery tasks.
 
     Args:
         session_id: Identifying ID for user.
         username: username owner of file.
-        pgn_data: Data to be saved in the file.
+        pgn_data: Data to be saved in the file, or a file to copy it from.
         source: Where the file comes from.
+        archive_ranges: (result_key, start, end) of the archives in the file
+            whose analysis is to be cached.
+        cached_results: analyses of games not in the file, found in the cache.
 
     Returns:
         result of the task. A dict with OK.
     """
     upload_file = PGNFileUpload(
-        user=None, session_id=session_id, usernames=username, source=source
+        user=None,
+        session_id=session_id,
+        usernames=username,
+        source=source,
+        archive_ranges=archive_ranges,
+        cached_results=cached_results,
     )
-    upload_file.file.save(str(session_id), ContentFile(pgn_data))
+    if isinstance(pgn_data, str):
+        pgn_data = pgn_data.encode("utf-8")
+    if isinstance(pgn_data, bytes):
+        upload_file.content_hash = content_sha256([pgn_data])
+        data: Iterable[bytes] = [pgn_data]
+    else:
+        _ = pgn_data.seek(0)
+        upload_file.content_hash = content_sha256(iter_stream(pgn_data))
+        _ = pgn_data.seek(0)
+        data = iter_stream(pgn_data)
+    save_blob(upload_file, data)
+    return queue_analysis(upload_file)
+
+
+def queue_analysis(
+    upload_file: PGNFileUpload, record_upload: bool = False
+) -> dict[str, Any]:
+    """Saves the details of a file already in storage and starts the celery tasks.
+
+    Only the session id is sent to the analysis task, which reads the file
+    from storage.
+
+    Args:
+        upload_file: Details of the stored file.
+        record_upload: Whether to record the FILE_UPLOAD stage of the session,
+            for the uploads not made by a task whose result records it.
+
+    Returns:
+        result of the task. A dict with OK.
+    """
+    session_id = upload_file.session_id
+    result = {
+        "session_id": str(session_id),
+        "result": {
+            "status": "OK",
+            "source": upload_file.source,
+            "usernames": upload_file.usernames,
+        },
+    }
     upload_file.save()
+    if upload_file.content_hash and reuse_finished_analysis(
+        upload_file, copy_upload=record_upload
+    ):
+        LOG.info(f"Analysis of {session_id} taken from a session with its content.")
+        return result
+    if record_upload:
+        _ = TaskResult.objects.create(
+            task_id=f"{session_id}:{constants.GET_FILE_GAMES_TASK}",
+            session_id=session_id,
+            status=states.SUCCESS,
+            stage=AnalysisStage.FILE_UPLOAD,
+            result={"result": result["result"]},
+        )
     transaction.on_commit(
         lambda: current_app.send_task(constants.ANALYZE_GAMES_TASK, args=[session_id])
     )
-    return {
-        "session_id": str(session_id),
-        "result": {"status": "OK", "source": source, "usernames": username},
-    }
+    return result
 
 
-def get_games_analysis(
-    session_id: UUID, pgn_games: list[PGNGame], username: str
-) -> dict[str, Any]:
-    """Get the chess games analysis - basic stats.
+def block_file(data: Iterable[bytes]) -> File:
+    """File to save pgn to storage with, compressed in the block format.
 
     Args:
-        session_id: Identifying ID for user.
-        pgn_games: list of chess games as `PGNGame` objects.
-        username: username to check in the games.
+        data: raw pgn, in pieces of any size.
 
     Returns:
-        Dict with statistical analysis of the games provided.
+        File reading the compressed pgn as it is produced.
+    """
+    return File(IteratorReader(iter_block_file(data, settings.PGN_STORAGE_BLOCK_SIZE)))
+
+
+def content_sha256(data: Iterable[bytes]) -> str:
+    """Hex sha256 of content read in pieces, the key its file is stored under."""
+    digest = hashlib.sha256()
+    for piece in data:
+        digest.update(piece)
+    return digest.hexdigest()
+
+
+def blob_name(content_hash: str) -> str:
+    """Name in storage of the pgn file of the content with `content_hash`."""
+    return f"blobs/{content_hash}.pgnb"
+
+
+def session_block_name(upload_file: PGNFileUpload) -> str:
+    """Name in storage of the pgn file of an upload stored without its hash."""
+    return upload_file.file.field.generate_filename(
+        upload_file, f"{upload_file.session_id}.pgnb"
+    )
+
+
+def is_stored_in_blocks(upload_file: PGNFileUpload) -> bool:
+    """Whether an upload points at a block file written by the workers.
+
+    Only the names the workers store pgn under are trusted, the files under
+    uploads/ are as sent by the client whatever their content.
+    """
+    name = upload_file.file.name
+    return bool(blob_name_pattern.fullmatch(name)) or name == session_block_name(
+        upload_file
+    )
+
+
+def link_blob(upload_file: PGNFileUpload) -> bool:
+    """Point an upload at the stored file of its content, when there is one.
+
+    Args:
+        upload_file: Details of the upload, with its content_hash.
+
+    Returns:
+        Whether the content was already stored.
+    """
+    if not upload_file.content_hash:
+        return False
+    name = blob_name(upload_file.content_hash)
+    if not upload_file.file.storage.exists(name):
+        return False
+    upload_file.file.name = name
+    return True
+
+
+def save_blob(upload_file: PGNFileUpload, data: Iterable[bytes]):
+    """Store the pgn of an upload under its content_hash, once per content.
+
+    Args:
+        upload_file: Details of the upload, pointed at the stored file.
+        data: raw pgn, only read when the content is not stored yet.
+    """
+    if link_blob(upload_file):
+        return
+    upload_file.file.name = store_blob(
+        upload_file.file.storage, str(upload_file.content_hash), data
+    )
+
+
+def partial_blob_name() -> str:
+    """Name in storage to write a blob under until it is whole, see `move_blob`."""
+    return f"blobs/{uuid4().hex}.pgnb.part"
+
+
+def move_blob(storage: Storage, partial: str, name: str):
+    """Move a blob written under `partial` to `name` in a single step.
+
+    The file under the name of a blob is then always whole, so that sessions
+    with the same content never read it while it is written. A file already
+    under `name` holds the same content and is replaced.
+
+    Args:
+        storage: where the blob is stored, on the local file system.
+        partial: name the blob was written under, see `partial_blob_name`.
+        name: name of the blob, see `blob_name`.
     """
-    names = {n.strip().lower() for n in username.split("||")}
-    total = len(pgn_games)
-    wins = losses = draws = 0
-    opp_mapping: list[tuple[int, int | None]] = []
-    opening_mapper: list[tuple[str, str]] = []
+    os.replace(storage.path(partial), storage.path(name))
 
-    for g in pgn_games:
-        tags = g.tag_pairs
-        result = tags.get("Result", "?")
-        white, black = tags.get("White", ""), tags.get("Black", "")
-        if eco_code := tags.get("ECO", None):
-            opening_mapper.append((eco_code, " ".join([str(move) for move in g.moves])))
 
-        is_white = white.lower() in names
-        is_black = black.lower() in names
+def write_partial_blob(storage: Storage, data: Iterable[bytes]) -> str:
+    """Store pgn in the block format under a name of its own.
 
+    Args:
+        storage: where to store the pgn.
+        data: raw pgn, in pieces of any size.
+
+    Returns:
+        Name of the stored file, see `partial_blob_name`.
+    """
+    partial = partial_blob_name()
+    try:
+        return storage.save(partial, block_file(data))
+    except Exception:
+        # Nothing is left of pgn that could not be read whole.
+        storage.delete(partial)
+        raise
+
+
+def store_blob(storage: Storage, content_hash: str, data: Iterable[bytes]) -> str:
+    """Store pgn in the block format with its game index, once per content.
+
+    Args:
+        storage: where to store the pgn.
+        content_hash: hash of the content, see `content_sha256`.
+        data: raw pgn, only read when the content is not stored yet.
+
+    Returns:
+        Name of the stored file.
+    """
+    name = blob_name(content_hash)
+    if storage.exists(name):
+        return name
+    index = GameIndexBuilder()
+    move_blob(storage, write_partial_blob(storage, index.iter_feed(data)), name)
+    store_game_index(storage, name, index.finish())
+    return name
+
+
+def store_hashed_blob(storage: Storage, data: Iterable[bytes]) -> str:
+    """Store pgn whose hash is only known once read, once per content.
+
+    The pgn is stored in the block format while it is hashed and indexed,
+    then moved under its content hash unless stored there already.
+
+    Args:
+        storage: where to store the pgn.
+        data: raw pgn, in pieces of any size.
+
+    Returns:
+        The content hash of the pgn, see `content_sha256`.
+    """
+    builder = GameIndexBuilder()
+    partial = write_partial_blob(storage, builder.iter_feed(data))
+    index = builder.finish()
+    name = blob_name(index.sha256)
+    if storage.exists(name):
+        storage.delete(partial)
+    else:
+        move_blob(storage, partial, name)
+        store_game_index(storage, name, index)
+    return index.sha256
+
+
+def store_game_index(storage: Storage, name: str, index: GameIndex):
+    """Save the index of the games of the stored pgn file `name` next to it."""
+    saved = storage.save(index_name(name), ContentFile(index.to_bytes()))
+    if saved != index_name(name):
+        # Indexed meanwhile by another session.
+        storage.delete(saved)
+
+
+def get_game_index(upload_file: PGNFileUpload) -> GameIndex:
+    """Load the index of the games of an upload, built when it was stored.
+
+    Files stored before their index, or whose index is corrupt, are read
+    once to build it.
+
+    Args:
+        upload_file: Details of the stored file.
+
+    Returns:
+        Index of the games of the file.
+    """
+    storage = upload_file.file.storage
+    name = index_name(upload_file.file.name)
+    if storage.exists(name):
+        try:
+            with storage.open(name, "rb") as f:
+                return GameIndex.from_bytes(f.read())
+        except GameIndexError as exc:
+            LOG.warning(f"Rebuilding the game index {name}: {exc}")
+            storage.delete(name)
+    with upload_file.file.open("rb") as f:
+        index = build_game_index(iter_pgn(f))
+    store_game_index(storage, upload_file.file.name, index)
+    return index
+
+
+def username_set(usernames: str | None) -> frozenset[str]:
+    """Usernames separated by '||', in any order or case."""
+    return frozenset(n.strip().lower() for n in (usernames or "").split("||"))
+
+
+def find_finished_analysis(upload_file: PGNFileUpload) -> PGNFileUpload | None:
+    """Find a session whose analysis gives the result of the upload.
+
+    Its content and usernames are those of the upload, as are the analyses
+    of the archives it took from the cache, and its analysis has succeeded.
+
+    Args:
+        upload_file: Details of the upload, with its content_hash.
+
+    Returns:
+        The latest such session, None when there is none.
+    """
+    usernames = username_set(upload_file.usernames)
+    cached_results = json.dumps(upload_file.cached_results or [], sort_keys=True)
+    candidates = (
+        PGNFileUpload.objects.filter(content_hash=upload_file.content_hash)
+        .exclude(session_id=upload_file.session_id)
+        .order_by("-uploaded_at")
+    )
+    for previous in candidates:
+        if (
+            username_set(previous.usernames) == usernames
+            and json.dumps(previous.cached_results or [], sort_keys=True)
+            == cached_results
+            and TaskResult.objects.filter(
+                session_id=previous.session_id,
+                stage=AnalysisStage.GAME,
+                status=states.SUCCESS,
+            ).exists()
+        ):
+            return previous
+    return None
+
+
+def reuse_finished_analysis(
+    upload_file: PGNFileUpload, copy_upload: bool = False
+) -> bool:
+    """Answer the status of an upload from the analysis of the same content.
+
+    The results of the finished session are copied to the upload, so no
+    analysis task runs. Only a roast asked for and missing is generated.
+
+    Args:
+        upload_file: Details of the upload, with its content_hash.
+        copy_upload: Whether to copy the FILE_UPLOAD stage too, for the
+            uploads not made by a task whose result records it.
+
+    Returns:
+        Whether a finished analysis was found.
+    """
+    if (previous := find_finished_analysis(upload_file)) is None:
+        return False
+    session_id = upload_file.session_id
+    roast = RoastRegister.objects.filter(session_id=session_id).first()
+    include_roast = bool(roast and roast.include_roast)
+    stages = [AnalysisStage.GAME, AnalysisStage.CHESS_STYLE]
+    if copy_upload:
+        stages.append(AnalysisStage.FILE_UPLOAD)
+    if include_roast:
+        stages.append(AnalysisStage.ROASTING)
+    # One result per stage, as the status of a session shows. Their ids are
+    # made from the stage, the finished session being possibly a copy itself.
+    results = {
+        res.stage: res
+        for res in TaskResult.objects.filter(
+            session_id=previous.session_id, stage__in=stages
+        )
+    }.values()
+    _ = TaskResult.objects.bulk_create(
+        TaskResult(
+            task_id=f"{session_id}:{AnalysisStage(res.stage).name}",
+            session_id=session_id,
+            status=res.status,
+            stage=res.stage,
+            result=res.result,
+        )
+        for res in results
+    )
+    if include_roast and all(res.stage != AnalysisStage.ROASTING for res in results):
+        game = next(res for res in results if res.stage == AnalysisStage.GAME)
+        result = (game.result or {}).get("result", {})
+        transaction.on_commit(
+            lambda: current_app.send_task(
+                constants.ROASTING_TASK, args=[str(session_id), result]
+            )
+        )
+    return True
+
+
+def read_pgn_range(storage_key: str, start: int, end: int) -> bytes:
+    """Read the bytes between `start` and `end` of a stored pgn file.
+
+    Only the blocks holding the range are decompressed for files stored in
+    the block format.
+
+    Args:
+        storage_key: name of the file in storage.
+        start: offset of the first byte to read.
+        end: offset after the last byte to read.
+
+    Returns:
+        The bytes read.
+    """
+    with default_storage.open(storage_key, "rb") as f:
+        return read_range(f, start, end)
+
+
+# Result, whether the user is white, whether the user is black, WhiteElo,
+# BlackElo and TimeControl of a game, see `count_results`.
+GameHeaders = tuple[str, bool, bool, int | None, int | None, str | None]
+
+
+def parse_elo(elo: str | None) -> int | None:
+    """Elo rating of a header tag, None when it is missing or unknown."""
+    return int(elo) if elo and elo.isdigit() else None
+
+
+def count_results(games: Iterable[GameHeaders]) -> dict[str, Any]:
+    """Count the results of the games and the ratings of the opponents.
+
+    Args:
+        games: headers of each game, see `GameHeaders`.
+
+    Returns:
+        Dict with the count of games, wins, losses, draws and the average
+        rating of the opponents by time control.
+    """
+    total = wins = losses = draws = 0
+    opp_mapping: list[tuple[int, int]] = []
+
+    for result, is_white, is_black, white_elo, black_elo, time_control in games:
+        total += 1
         # win/loss/draw
         if result == constants.DRAW:
             draws += 1
@@ -270,59 +690,447 @@ def get_games_analysis(
             continue
 
         # opponent rating
-        if norm_time := normalize_time_control(tags.get("TimeControl")):
-            if is_white and tags.get("BlackElo") != "?" and tags.get("BlackElo") != "":
-                opp_rating = int(tags.get("BlackElo", "0"))
-                opp_mapping.append((opp_rating, norm_time))
-            elif (
-                is_black and tags.get("WhiteElo") != "?" and tags.get("WhiteElo") != ""
-            ):
-                opp_rating = int(tags.get("WhiteElo", "0"))
-                opp_mapping.append((opp_rating, norm_time))
-    openings = map_eco_code(opening_mapper)
+        if norm_time := normalize_time_control(time_control):
+            if is_white and black_elo is not None:
+                opp_mapping.append((black_elo, norm_time))
+            elif is_black and white_elo is not None:
+                opp_mapping.append((white_elo, norm_time))
     return {
         "count": total,
         "win_count": wins,
         "loss_count": losses,
         "draw_count": draws,
         "opponents_avg_rating": get_avg_opponent_rating_by_time_control(opp_mapping),
-        "openings": openings,
-        "session_id": str(session_id),
     }
 
 
-def split_pgn_into_games(pgn_text: str) -> list[str]:
-    """Split pgn text into individual games.
+def get_openings_analysis(
+    session_id: UUID | str, pgn_games: list[PGNGame]
+) -> dict[str, Any]:
+    """Get the openings played in the chess games.
+
+    Args:
+        session_id: Identifying ID for user.
+        pgn_games: list of chess games as `PGNGame` objects.
+
+    Returns:
+        Dict with the most played openings of the games.
+    """
+    opening_mapper = [
+        (eco_code, g.plies) for g in pgn_games if (eco_code := g.tag_pairs.get("ECO"))
+    ]
+    return {"openings": map_eco_code(opening_mapper), "session_id": str(session_id)}
+
+
+def get_games_analysis(
+    session_id: UUID | str, pgn_games: list[PGNGame], username: str
+) -> dict[str, Any]:
+    """Get the chess games analysis - basic stats.
 
     Args:
-        png_text: Text to split into games.
+        session_id: Identifying ID for user.
+        pgn_games: list of chess games as `PGNGame` objects.
+        username: username to check in the games.
 
     Returns:
-        List of games in text.
+        Dict with statistical analysis of the games provided.
     """
-    return [f"[Event {g}" for g in pgn_text.split("[Event ")[1:]]
+    names = username_set(username)
+    headers = (
+        (
+            tags.get("Result", "?"),
+            tags.get("White", "").lower() in names,
+            tags.get("Black", "").lower() in names,
+            parse_elo(tags.get("WhiteElo")),
+            parse_elo(tags.get("BlackElo")),
+            tags.get("TimeControl"),
+        )
+        for tags in (g.tag_pairs for g in pgn_games)
+    )
+    return {**count_results(headers), **get_openings_analysis(session_id, pgn_games)}
+
+
+def get_index_headers(index: GameIndex, username: str) -> list[GameHeaders]:
+    """Headers of each game of a stored file, read from its index.
+
+    Args:
+        index: index of the games of the file.
+        username: username to check in the games.
+
+    Returns:
+        The headers of each game, see `GameHeaders`.
+    """
+    names = username_set(username)
+    white, black = set(index.where("White", names)), set(index.where("Black", names))
+    return [
+        (result, i in white, i in black, white_elo, black_elo, time_control)
+        for i, (result, white_elo, black_elo, time_control) in enumerate(
+            zip(
+                index.column("Result"),
+                index.column("WhiteElo"),
+                index.column("BlackElo"),
+                index.column("TimeControl"),
+                strict=True,
+            )
+        )
+    ]
+
+
+def get_index_analysis(
+    session_id: UUID | str, headers: list[GameHeaders], games: Iterable[int]
+) -> dict[str, Any]:
+    """Get the analysis of stored games from their index, but for the openings.
+
+    Args:
+        session_id: Identifying ID for user.
+        headers: headers of each game of the file, see `get_index_headers`.
+        games: numbers of the games to analyse.
+
+    Returns:
+        Dict with statistical analysis of the games, without their openings.
+    """
+    return {
+        **count_results(headers[i] for i in games),
+        "openings": [],
+        "session_id": str(session_id),
+    }
 
 
 @shared_task(name=constants.GET_FILE_GAMES_TASK)
 def pgn_get_games_from_file(session_id: UUID, usernames: str, pgn_data: str):
-    """Celery task to get chess games from pgn file."""
+    """Celery task to get chess games from pgn file.
+
+    Uploads are now saved and queued by the upload endpoint itself, this task
+    only handles the uploads queued with their pgn before.
+    """
     return save_file_and_queue_task(session_id, usernames, pgn_data, FileSource.FILE)
 
 
+class GameSpool:
+    """File the games fetched from a platform are streamed to.
+
+    The games are written as they arrive so that only the file goes to
+    storage, whatever the number of games. Ranges of the file can be marked
+    as archives, whose analysis gets cached under their result key.
+    """
+
+    def __init__(self, file: IO[bytes]):
+        self.file = file
+        self.size = 0
+        self.archive_ranges: list[tuple[str, int, int]] = []
+
+    def write(self, data: bytes):
+        self.file.write(data)
+        self.size += len(data)
+
+    def add_archive(self, result_key: str, start: int):
+        """Mark the games written since `start` as an archive."""
+        self.archive_ranges.append((result_key, start, self.size))
+
+
+def archive_result_key(archive_url: str, usernames: str) -> str:
+    """Key of the cached analysis of a completed monthly archive."""
+    return f"{archive_url}:analysis:{RESULT_CACHE_VERSION}:{usernames.lower()}"
+
+
 @shared_task(name=constants.GET_CHESS_COM_TASK)
 def pgn_get_chess_com_games_by_user(session_id: UUID, username: str):
-    """Celery task to get chess games for user from chess.com."""
-    pgn_data: str = palitra.run(get_chess_dot_com_games(username))
-    return save_file_and_queue_task(
-        session_id, username, pgn_data, FileSource.CHESSDOTCOM
+    """Celery task to get chess games for user from chess.com.
+
+    Completed months never change, so their analysis is cached next to their
+    archive. Only the months without one are fetched and analysed again.
+    """
+    archives = get_chess_dot_com_archive_urls(username)
+    result_keys = {
+        url: archive_result_key(url, username)
+        for url in archives
+        if should_cache_archive(url)
+    }
+    cached = cache.get_many(list(result_keys.values()))
+    to_fetch = [url for url in archives if result_keys.get(url) not in cached]
+    LOG.info(f"{len(cached)} of {len(archives)} archives of {username} analysed.")
+    if settings.ANALYSIS_PIPELINE:
+        return pipeline_chess_dot_com_archives(
+            session_id, username, to_fetch, result_keys, list(cached.values())
+        )
+
+    async def spool_archives(spool: GameSpool):
+        # The archives are written back to back as they arrive, with the
+        # ranges of the completed ones so that their analysis is cached.
+        async for url, pgn in iter_chess_dot_com_archives(to_fetch):
+            start = spool.size
+            spool.write(pgn.encode("utf-8") + b"\n\n")
+            # An empty archive is one that could not be fetched, try it next time.
+            if pgn and url in result_keys:
+                spool.add_archive(result_keys[url], start)
+
+    with tempfile.TemporaryFile() as f:
+        spool = GameSpool(f)
+        palitra.run(spool_archives(spool))
+        return save_file_and_queue_task(
+            session_id,
+            username,
+            f,
+            FileSource.CHESSDOTCOM,
+            archive_ranges=spool.archive_ranges,
+            cached_results=list(cached.values()),
+        )
+
+
+def pipeline_key(session_id: UUID | str, name: str) -> str:
+    """Key of the state of the pipelined analysis of a session in the cache."""
+    return f"pipeline:{session_id}:{name}"
+
+
+def pipeline_chess_dot_com_archives(
+    session_id: UUID,
+    username: str,
+    archives: list[str],
+    result_keys: dict[str, str],
+    cached_results: list[dict[str, Any]],
+) -> dict[str, Any]:
+    """Analyse the chess.com archives while the others are still downloading.
+
+    Each archive is stored and split into chunks as soon as it is fetched. The
+    number of chunks still to analyse is counted in the cache, with one more
+    held until every archive is fetched or fetching them failed, and the chunk
+    bringing it to zero starts `finalize_analysis`, whether it succeeded or
+    failed. The count is kept alive as long as archives arrive or chunks end.
+
+    Args:
+        session_id: Identifying ID for user.
+        username: username owner of the games.
+        archives: urls of the archives to fetch.
+        result_keys: key to cache the analysis of each completed archive under.
+        cached_results: analyses of the archives found in the cache.
+
+    Returns:
+        result of the task. A dict with OK.
+    """
+    upload_file = PGNFileUpload(
+        user=None,
+        session_id=session_id,
+        usernames=username,
+        source=FileSource.CHESSDOTCOM,
+        cached_results=cached_results,
+    )
+    upload_file.save()
+    timeout = settings.ANALYSIS_PIPELINE_TIMEOUT
+    pending = pipeline_key(session_id, "pending")
+    cache.set(pending, 1, timeout)
+    chunks = 0
+
+    async def dispatch_archives():
+        nonlocal chunks
+        async for url, pgn in iter_chess_dot_com_archives(archives):
+            if not pgn:
+                continue
+            data = pgn.encode("utf-8")
+            _ = cache.touch(pending, timeout)
+            # Archives are stored once whatever the number of sessions
+            # fetching them, like the other games.
+            storage_key = store_blob(default_storage, content_sha256([data]), [data])
+            if url in result_keys:
+                ranges = [(0, len(data), result_keys[url])]
+            else:
+                game_offsets = list(iter_game_offsets(data))
+                plan = plan_chunks(
+                    len(game_offsets),
+                    len(data),
+                    concurrency=settings.CELERY_WORKER_CONCURRENCY,
+                    target_seconds=settings.ANALYSIS_CHUNK_TARGET_SECONDS,
+                    bytes_per_second=settings.ANALYSIS_BYTES_PER_SECOND,
+                    min_chunk_size=settings.ANALYSIS_CHUNK_MIN_GAMES,
+                )
+                ranges = [
+                    (start, end, None)
+                    for start, end in iter_chunk_offsets(
+                        iter(game_offsets), int(plan["chunk_size"])
+                    )
+                ]
+            for start, end, result_key in ranges:
+                cache.incr(pending)
+                analyze_pgn_chunk.s(
+                    session_id, username, storage_key, start, end, chunks, result_key
+                ).apply_async(
+                    link=pipeline_chunk_done.s(str(session_id), chunks),
+                    link_error=pipeline_chunk_failed.s(str(session_id), chunks),
+                )
+                chunks += 1
+
+    try:
+        palitra.run(dispatch_archives())
+    finally:
+        # The chunks already dispatched are finalized even when fetching or
+        # storing an archive failed, so the session does not stay pending.
+        cache.set(pipeline_key(session_id, "chunks"), chunks, timeout)
+        LOG.info(f"Dispatched {chunks} chunks of the archives of {username}.")
+        release_pipeline(str(session_id))
+    return {
+        "session_id": str(session_id),
+        "result": {
+            "status": "OK",
+            "source": upload_file.source,
+            "usernames": upload_file.usernames,
+        },
+    }
+
+
+@shared_task(name=constants.PIPELINE_CHUNK_DONE_TASK)
+def pipeline_chunk_done(result: dict[str, Any], session_id: str, idx: int):
+    """Celery task to keep the analysis of a chunk of a pipelined session."""
+    cache.set(
+        pipeline_key(session_id, f"result:{idx}"),
+        result,
+        settings.ANALYSIS_PIPELINE_TIMEOUT,
     )
+    release_pipeline(session_id)
+
+
+@shared_task(name=constants.PIPELINE_CHUNK_FAILED_TASK)
+def pipeline_chunk_failed(request, exc, traceback, session_id: str, idx: int):
+    """Celery errback counting a failed chunk of a pipelined session as done,
+    so that the session is still finalized with the other chunks.
+    """
+    LOG.error(f"Chunk {idx} of pipelined session {session_id} failed: {exc}")
+    release_pipeline(session_id)
+
+
+def release_pipeline(session_id: str):
+    """Count one part of a pipelined session as done, finalizing after the last.
+
+    Args:
+        session_id: Identifying ID for user.
+    """
+    pending = pipeline_key(session_id, "pending")
+    if cache.decr(pending) > 0:
+        _ = cache.touch(pending, settings.ANALYSIS_PIPELINE_TIMEOUT)
+        return
+    chunks = pipeline_key(session_id, "chunks")
+    keys = [pipeline_key(session_id, f"result:{i}") for i in range(cache.get(chunks))]
+    results = cache.get_many(keys)
+    cache.delete_many([pending, chunks, *keys])
+    objects = [results[key] for key in keys if key in results]
+    finalize_analysis.delay(objects or [{"session_id": session_id}])
+
+
+def lichess_state_key(username: str) -> str:
+    """Key of what is known of the games of `username` on lichess."""
+    return f"lichess-games-{username.lower()}"
 
 
 @shared_task(name=constants.GET_LICHESS_TASK)
 def pgn_get_lichess_games_by_user(session_id: UUID, username: str):
-    """Celery task to get chess games for user from lichess."""
-    pgn_data: str = get_lichess_games(username)
-    return save_file_and_queue_task(session_id, username, pgn_data, FileSource.LICHESS)
+    """Celery task to get chess games for user from lichess.
+
+    Only the games started since the latest game of the previous run, the
+    watermark, are fetched. They are cut into batches whose analysis is cached
+    like the completed chess.com months, and the analysis of the batches of
+    the earlier runs is taken from the cache.
+    """
+    state_key = lichess_state_key(username)
+    state: dict[str, Any] = cache.get(state_key) or {}
+    result_keys: list[str] = state.get("result_keys", [])
+    cached = cache.get_many(result_keys)
+    if len(cached) != len(result_keys):
+        LOG.warning(f"Analysis of {username} lichess games missing, fetching all.")
+        state, result_keys, cached = {}, [], {}
+    watermark: int = state.get("watermark", 0)
+    # Games are found by when they started, so the games still being played
+    # at the previous run are only fetched when starting a while before it.
+    overlap = settings.LICHESS_WATERMARK_OVERLAP_SECONDS * 1000
+    since = watermark - overlap if watermark else None
+    recent: dict[str, int] = state.get("recent_games", {})
+
+    with tempfile.TemporaryFile() as f:
+        spool = GameSpool(f)
+        batch_start, batch_games, digest = 0, 0, hashlib.sha256()
+
+        def end_batch():
+            nonlocal batch_start, batch_games, digest
+            key = f"{state_key}:{RESULT_CACHE_VERSION}:{digest.hexdigest()}"
+            spool.add_archive(key, batch_start)
+            result_keys.append(key)
+            batch_start, batch_games, digest = spool.size, 0, hashlib.sha256()
+
+        # Games are written one by one as lichess streams them.
+        for pgn in iter_lichess_games(username, since=since):
+            started, url = lichess_game_start(pgn)
+            if url in recent:
+                continue
+            recent[url] = started
+            watermark = max(watermark, started)
+            data = pgn.encode("utf-8") + b"\n\n"
+            spool.write(data)
+            digest.update(data)
+            batch_games += 1
+            if batch_games == settings.LICHESS_BATCH_GAMES:
+                end_batch()
+        if batch_games:
+            end_batch()
+        LOG.info(
+            f"{spool.size} bytes of new lichess games of {username} since {since}."
+        )
+
+        cache.set(
+            state_key,
+            {
+                "watermark": watermark,
+                "recent_games": {
+                    url: started
+                    for url, started in recent.items()
+                    if started >= watermark - overlap
+                },
+                "result_keys": result_keys,
+            },
+        )
+        return save_file_and_queue_task(
+            session_id,
+            username,
+            f,
+            FileSource.LICHESS,
+            archive_ranges=spool.archive_ranges,
+            cached_results=list(cached.values()),
+        )
+
+
+def store_upload_in_blocks(upload_file: PGNFileUpload):
+    """Replace an upload in storage by its pgn compressed in the block format.
+
+    gzip, bz2, xz and zip uploads are inflated as a stream straight into the
+    blocks, so neither the upload nor its pgn is held in memory. The pgn is
+    stored once per content, keyed by the hash of the inflated pgn so that
+    the same games compressed differently share their file. Files the workers
+    stored in the block format are left as they are.
+
+    Args:
+        upload_file: Details of the stored file, updated to the block file.
+
+    Raises:
+        DecompressionError: if the upload is corrupt or inflates past
+            ANALYSIS_MAX_DECOMPRESSED_BYTES.
+    """
+    if is_stored_in_blocks(upload_file):
+        return
+    upload_name = upload_file.file.name
+    storage = upload_file.file.storage
+    with upload_file.file.open("rb") as f:
+        compression = detect_compression(f)
+        if compression is None and upload_file.content_hash:
+            # Hashed when uploaded, the pgn being stored as it was sent.
+            save_blob(upload_file, iter_stream(f))
+        else:
+            if compression is not None:
+                LOG.info(f"Decompressing {compression} upload {upload_name}")
+                data = iter_decompressed(
+                    f, compression, settings.ANALYSIS_MAX_DECOMPRESSED_BYTES
+                )
+            else:
+                data = iter_stream(f)
+            upload_file.content_hash = store_hashed_blob(storage, data)
+            upload_file.file.name = blob_name(upload_file.content_hash)
+    storage.delete(upload_name)
+    upload_file.save(update_fields=["file", "content_hash"])
 
 
 @shared_task(name=constants.ANALYZE_GAMES_TASK)
@@ -333,34 +1141,140 @@ def pgn_analyze_games(session_id: UUID) -> dict[str, Any]:
     statistical analysis of the games.
     """
     file_obj = PGNFileUpload.objects.get(session_id=session_id)  # noqa: F841
-    content: str = ""
-    # games: list[PGNGame] = []
-    with file_obj.file.open("r") as f:
-        content = f.read()
-    games = split_pgn_into_games(content)
-    chunk_size = 100
-    chunks = [games[i : i + chunk_size] for i in range(0, len(games), chunk_size)]
+    try:
+        store_upload_in_blocks(file_obj)
+    except DecompressionError as exc:
+        LOG.error(f"Upload of session {session_id} cannot be analysed: {exc}")
+        _ = TaskResult.objects.create(
+            task_id=f"{session_id}:{constants.ANALYZE_GAMES_TASK}",
+            session_id=session_id,
+            status=states.FAILURE,
+            stage=AnalysisStage.GAME,
+            result={"result": {"status": states.FAILURE, "message": str(exc)}},
+        )
+        return {"session_id": str(session_id), "result": []}
+    # The results, ratings and time controls of the games are counted from
+    # the index of the games built when the file was stored. Only the games
+    # with an ECO tag are read back from storage, by the chunks parsing their
+    # moves to find their opening.
+    index = get_game_index(file_obj)
+    headers = get_index_headers(index, file_obj.usernames)
+    eco_codes = index.column("ECO")
+    # Each completed archive of the file is a chunk of its own whose analysis
+    # gets cached, the games between the archives are split as usual.
+    archive_ranges = sorted(file_obj.archive_ranges or [], key=lambda r: r[1])
+    chunks = [
+        (
+            start,
+            end,
+            key,
+            get_index_analysis(session_id, headers, index.games_between(start, end)),
+        )
+        for key, start, end in archive_ranges
+    ]
+    games: list[int] = []
+    gap_start = 0
+    for _, start, end in [*archive_ranges, (None, index.size, index.size)]:
+        games.extend(index.games_between(gap_start, start))
+        gap_start = end
+    opening_games = [i for i in games if eco_codes[i]]
+    other_games = [i for i in games if not eco_codes[i]]
+    # Chunk tasks get a byte range and read it from storage, so the messages
+    # stay small whatever the size of the upload.
+    plan = plan_chunks(
+        len(opening_games),
+        sum(index.lengths[i] for i in opening_games),
+        concurrency=settings.CELERY_WORKER_CONCURRENCY,
+        target_seconds=settings.ANALYSIS_CHUNK_TARGET_SECONDS,
+        bytes_per_second=settings.ANALYSIS_BYTES_PER_SECOND,
+        min_chunk_size=settings.ANALYSIS_CHUNK_MIN_GAMES,
+    )
+    chunks.extend(
+        (
+            start,
+            end,
+            None,
+            get_index_analysis(session_id, headers, index.games_between(start, end)),
+        )
+        for start, end in index.iter_chunk_offsets(
+            opening_games, int(plan["chunk_size"])
+        )
+    )
+    index_result = get_index_analysis(session_id, headers, other_games)
+    plan["dispatched_at"] = time.time()
+    file_obj.chunk_plan = plan
+    file_obj.save(update_fields=["chunk_plan"])
     # Split the pgn text into chunks to help with Parallelized analysis of the chunks.
     # This helps in reducing time for analysis.
     if not chunks:
-        finalize_analysis.delay([{"session_id": str(session_id)}])
+        finalize_analysis.delay([index_result])
         return {"session_id": str(session_id), "result": []}
     else:
         res = chord(
             [
-                analyze_pgn_chunk.s(session_id, file_obj.usernames, chunk, i)
-                for i, chunk in enumerate(chunks)
+                analyze_pgn_chunk.s(
+                    session_id,
+                    file_obj.usernames,
+                    file_obj.file.name,
+                    start,
+                    end,
+                    i,
+                    result_key,
+                    chunk_result,
+                )
+                for i, (start, end, result_key, chunk_result) in enumerate(chunks)
             ],
-            finalize_analysis.s(),
+            finalize_analysis.s(index_result),
         ).apply_async()
     return {"result": res.id, "session_id": str(session_id)}
 
 
 @shared_task(name=constants.FINALIZE_ANALYSIS_TASK)
-def finalize_analysis(objects: list[dict[str, Any]]) -> dict[str, Any]:
-    """Celery task to finalize chess game statistical analysis."""
-    result = {}
+def finalize_analysis(
+    objects: list[dict[str, Any]], index_result: dict[str, Any] | None = None
+) -> dict[str, Any]:
+    """Celery task to finalize chess game statistical analysis.
+
+    The analyses of the archives found in the cache when fetching the games,
+    and that of the games counted from the index of the file, are merged with
+    those of the chunks.
+    """
+    if index_result is not None:
+        objects = [*objects, index_result]
     session_id = objects[0].get("session_id", "")
+    upload_file = PGNFileUpload.objects.filter(session_id=UUID(session_id)).first()
+    if upload_file and upload_file.cached_results:
+        objects = objects + [
+            {**cached, "session_id": session_id}
+            for cached in upload_file.cached_results
+        ]
+    result = merge_chunk_results(session_id, objects)
+    record_observed_throughput(upload_file)
+    LOG.info("Checking if roasting is allowed")
+    if roast := RoastRegister.objects.filter(session_id=UUID(session_id)).first():
+        if roast.include_roast:
+            LOG.info("Let the roast begin.")
+            current_app.send_task(constants.ROASTING_TASK, args=[session_id, result])
+        else:
+            LOG.info("No roasts please.")
+    else:
+        LOG.info("Something is up with roasting register.")
+    return {"session_id": str(session_id), "result": result}
+
+
+def merge_chunk_results(
+    session_id: str, objects: list[dict[str, Any]]
+) -> dict[str, Any]:
+    """Merge the analyses of the chunks of a session into its statistics.
+
+    Args:
+        session_id: Identifying ID for user.
+        objects: results of `get_games_analysis` for each chunk.
+
+    Returns:
+        Dict with the statistical analysis of all the games.
+    """
+    result: dict[str, Any] = {}
     for d in objects:
         if d.get("session_id") != session_id:
             LOG.warning(
@@ -374,16 +1288,25 @@ def finalize_analysis(objects: list[dict[str, Any]]) -> dict[str, Any]:
     result["opponents_avg_rating"] = average_rating(
         result.get("opponents_avg_rating", {})
     )
-    LOG.info("Checking if roasting is allowed")
-    if roast := RoastRegister.objects.filter(session_id=UUID(session_id)).first():
-        if roast.include_roast:
-            LOG.info("Let the roast begin.")
-            current_app.send_task(constants.ROASTING_TASK, args=[session_id, result])
-        else:
-            LOG.info("No roasts please.")
-    else:
-        LOG.info("Something is up with roasting register.")
-    return {"session_id": str(session_id), "result": result}
+    return result
+
+
+def record_observed_throughput(upload_file: PGNFileUpload | None):
+    """Complete the chunk plan of the session with how long the analysis took.
+
+    Args:
+        upload_file: Details of the analysed file.
+    """
+    if not upload_file or not (plan := upload_file.chunk_plan):
+        return
+    elapsed = max(time.time() - plan.get("dispatched_at", time.time()), 1e-3)
+    workers = max(min(plan.get("concurrency", 1), plan.get("chunks", 1)), 1)
+    plan["elapsed_seconds"] = elapsed
+    plan["observed_bytes_per_second"] = plan.get("bytes", 0) / elapsed / workers
+    upload_file.save(update_fields=["chunk_plan"])
+    LOG.info(
+        f"Analysis of {upload_file.session_id} took {elapsed:.2f}s with plan {plan}"
+    )
 
 
 @shared_task(name=constants.ROASTING_TASK)
@@ -393,18 +1316,98 @@ def generate_roast_from_llm(session_id: str, result: dict[str, Any]) -> dict[str
 
 
 @shared_task(name=constants.ANALYZE_PGN_CHUNK_TASK)
-def analyze_pgn_chunk(session_id: UUID, usernames: str, chunk: list[str], idx: int):
-    """Celery task to analyse the pgn chunks and to convert to PGNGame objects."""
+def analyze_pgn_chunk(
+    session_id: UUID,
+    usernames: str,
+    storage_key: str,
+    start: int,
+    end: int,
+    idx: int,
+    result_key: str | None = None,
+    index_result: dict[str, Any] | None = None,
+):
+    """Celery task to analyse the pgn chunks and to convert to PGNGame objects.
+
+    The chunk is the byte range between `start` and `end` of the stored file.
+    When the analysis of its games was counted from the index of the file as
+    `index_result`, only their openings are found. When the chunk is a
+    completed archive, its analysis is cached under `result_key` for later
+    sessions.
+    """
+    chunk = read_pgn_range(storage_key, start, end)
+    if index_result is None:
+        result = analyze_pgn_buffer(session_id, usernames, chunk, idx=idx)
+    else:
+        openings = analyze_pgn_buffer(
+            session_id, usernames, chunk, idx=idx, openings_only=True
+        )
+        result = {**index_result, **openings}
+    if result_key:
+        cache.set(
+            result_key,
+            {k: v for k, v in result.items() if k != "session_id"},
+            settings.ARCHIVE_RESULT_TTL,
+        )
+    return result
+
+
+def analyze_pgn_buffer(
+    session_id: UUID | str,
+    usernames: str,
+    buffer: Buffer,
+    start: int = 0,
+    end: int | None = None,
+    idx: int = 0,
+    use_cache: bool = True,
+    openings_only: bool = False,
+) -> dict[str, Any]:
+    """Parse and analyse the games between `start` and `end` of `buffer`.
+
+    Args:
+        session_id: Identifying ID for user.
+        usernames: usernames to check in the games.
+        buffer: pgn data, e.g. a memory-mapped file.
+        start: offset of the first game.
+        end: offset after the last game, defaults to the buffer length.
+        idx: number of the chunk, for the logs.
+        use_cache: whether to look the result up in the shared result cache
+            and store it there.
+        openings_only: whether to only find the openings of the games, see
+            `get_openings_analysis`.
+
+    Returns:
+        Dict with statistical analysis of the games, see `get_games_analysis`.
+    """
+    end = len(buffer) if end is None else end
+    # The same games are analysed again whenever a user reruns an analysis,
+    # so results are looked up by the hash of the pgn before parsing it.
+    result_cache = get_result_cache() if use_cache else None
+    if result_cache is not None:
+        with memoryview(buffer)[start:end] as view:
+            # The openings of the games do not depend on the usernames.
+            key = content_key(view) if openings_only else content_key(view, usernames)
+        if (result := result_cache.get(key)) is not None:
+            LOG.info(f"Chunk {idx} analysis found in cache {result_cache.stats()}")
+            return {**result, "session_id": str(session_id)}
     parsed_games = []
-    for raw in chunk:
+    for game_start, game_end in iter_game_offsets(buffer, start, end):
         try:
-            parsed_games.extend(get_games(raw))
+            raw = decode_range(buffer, game_start, game_end)
+            # Moves are only decoded for the games needing opening detection.
+            parsed_games.extend(get_games(raw, headers_only=True))
         except Exception as exc:
             LOG.warning(
                 f"Exception while parsing PGN Chunk at {idx}: {exc}", exc_info=True
             )
             continue
-    return get_games_analysis(session_id, parsed_games, usernames)
+    if openings_only:
+        result = get_openings_analysis(session_id, parsed_games)
+    else:
+        result = get_games_analysis(session_id, parsed_games, usernames)
+    if result_cache is not None:
+        result_cache.set(key, {k: v for k, v in result.items() if k != "session_id"})
+        LOG.info(f"Chunk {idx} analysis not found in cache {result_cache.stats()}")
+    return result
 
 
 @shared_task(name=constants.CHESS_STYLE_TASK)
@@ -418,6 +1421,8 @@ def save_task_result(sender, task_id, task, args, kwargs, retval, state, **extra
     if sender.name in (
         constants.ANALYZE_GAMES_TASK,
         constants.ANALYZE_PGN_CHUNK_TASK,
+        constants.PIPELINE_CHUNK_DONE_TASK,
+        constants.PIPELINE_CHUNK_FAILED_TASK,
     ):
         return None
     res = {"result": result} if (result := retval.get("result")) else None
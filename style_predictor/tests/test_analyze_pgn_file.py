@@ -0,0 +1,52 @@
+import json
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+
+from style_predictor import tasks
+from style_predictor.management.commands import analyze_pgn_file
+
+PgnGame = """[Event "Live Chess"]
+[White "playerOne"]
+[Black "playerTwo"]
+[Result "{result}"]
+[TimeControl "60"]
+[WhiteElo "1200"]
+[BlackElo "1100"]
+
+1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# {result}
+
+"""
+
+
+class TestAnalyzePgnFileCommand:
+    def test_file_is_analysed_without_the_result_cache(self, tmp_path):
+        path = tmp_path / "games.pgn"
+        path.write_text(
+            PgnGame.format(result="1-0") * 30 + PgnGame.format(result="0-1") * 10
+        )
+        output = tmp_path / "analysis.json"
+        stdout = StringIO()
+        with (
+            mock.patch.object(tasks, "map_eco_code", return_value=[]),
+            mock.patch.object(analyze_pgn_file, "get_opening_index"),
+            # The ranges are analysed in forked processes, where a call
+            # fails the command rather than being recorded on the mock.
+            mock.patch.object(
+                tasks, "get_result_cache", side_effect=AssertionError("cache used")
+            ),
+        ):
+            call_command(
+                "analyze_pgn_file",
+                str(path),
+                usernames="playerOne",
+                workers=2,
+                range_size=1000,
+                output=str(output),
+                stdout=stdout,
+            )
+        result = json.loads(output.read_text())
+        assert result["count"] == 40  # nosec
+        assert result["win_count"] == 30 and result["loss_count"] == 10  # nosec
+        assert "Analysed 40 games" in stdout.getvalue()  # nosec
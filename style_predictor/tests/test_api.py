@@ -0,0 +1,259 @@
+import gzip
+import hashlib
+import tracemalloc
+import uuid
+from unittest import mock
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.test import RequestFactory
+
+from style_predictor import tasks
+from style_predictor.apis.pgn import api
+from style_predictor.schemas import (
+    ChunkedUploadDetails,
+    ExternalUser,
+    FinalizeUpload,
+    FormDetails,
+)
+
+PgnGame = b"""[Event "Live Chess"]
+[White "playerOne"]
+[Black "playerTwo"]
+[Result "1-0"]
+
+1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0
+
+"""
+
+
+class TestFileUpload:
+    def test_upload_is_streamed_to_storage(self, tmp_path):
+        # 16 MiB of games, spooled to disk as Django does past the memory size.
+        upload = TemporaryUploadedFile("games.pgn", "application/x-chess-pgn", 0, None)
+        for _ in range(16 * 2**20 // len(PgnGame)):
+            upload.write(PgnGame)
+        upload.size = upload.tell()
+        upload.seek(0)
+        storage = FileSystemStorage(location=tmp_path)
+        details = FormDetails(usernames="playerOne", include_roast=False)
+        with (
+            mock.patch.object(
+                api.PGNFileUpload._meta.get_field("file"), "storage", storage
+            ),
+            mock.patch.object(api.PGNFileUpload, "save") as save,
+            mock.patch.object(api, "RoastRegister"),
+            mock.patch.object(tasks.transaction, "on_commit", lambda f: f()),
+            mock.patch.object(tasks.current_app, "send_task") as send_task,
+            mock.patch.object(tasks, "find_finished_analysis", return_value=None),
+            mock.patch.object(tasks.TaskResult.objects, "create") as create_result,
+        ):
+            tracemalloc.start()
+            response = api.file_upload(mock.MagicMock(), details, upload)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        upload.close()
+
+        session_id = response["status_id"]
+        save.assert_called_once()
+        send_task.assert_called_once_with(
+            tasks.constants.ANALYZE_GAMES_TASK, args=[mock.ANY]
+        )
+        assert str(send_task.call_args.kwargs["args"][0]) == session_id  # nosec
+        create_result.assert_called_once_with(
+            task_id=f"{session_id}:{tasks.constants.GET_FILE_GAMES_TASK}",
+            session_id=uuid.UUID(session_id),
+            status="SUCCESS",
+            stage=tasks.AnalysisStage.FILE_UPLOAD,
+            result={
+                "result": {
+                    "status": "OK",
+                    "source": tasks.FileSource.FILE,
+                    "usernames": "playerOne",
+                }
+            },
+        )
+        stored = tmp_path / "uploads" / session_id
+        assert stored.stat().st_size == upload.size  # nosec
+        assert peak < 2**20  # nosec
+
+    def test_same_content_is_stored_once(self, tmp_path):
+        storage = FileSystemStorage(location=tmp_path)
+        details = FormDetails(usernames="playerOne", include_roast=False)
+        with (
+            mock.patch.object(
+                api.PGNFileUpload._meta.get_field("file"), "storage", storage
+            ),
+            mock.patch.object(api.PGNFileUpload, "save", autospec=True),
+            mock.patch.object(api, "RoastRegister"),
+            mock.patch.object(tasks.transaction, "on_commit", lambda f: f()),
+            mock.patch.object(tasks.current_app, "send_task") as send_task,
+            mock.patch.object(tasks, "find_finished_analysis", return_value=None),
+            mock.patch.object(tasks.TaskResult.objects, "create"),
+        ):
+            first = save_upload(details)
+            # The worker stores the first upload under its content.
+            first.file.name = storage.save(
+                tasks.blob_name(first.content_hash), ContentFile(b"pgnb")
+            )
+            second = save_upload(details)
+        assert first.content_hash == hashlib.sha256(PgnGame).hexdigest()  # nosec
+        assert second.file.name == first.file.name  # nosec
+        assert not storage.exists(f"uploads/{second.session_id}")  # nosec
+        assert send_task.call_count == 2  # nosec
+
+    def test_compressed_uploads_are_hashed_by_the_workers(self, tmp_path):
+        storage = FileSystemStorage(location=tmp_path)
+        details = FormDetails(usernames="playerOne", include_roast=False)
+        with (
+            mock.patch.object(
+                api.PGNFileUpload._meta.get_field("file"), "storage", storage
+            ),
+            mock.patch.object(api.PGNFileUpload, "save", autospec=True),
+            mock.patch.object(api, "RoastRegister"),
+            mock.patch.object(tasks.transaction, "on_commit", lambda f: f()),
+            mock.patch.object(tasks.current_app, "send_task") as send_task,
+            mock.patch.object(tasks, "find_finished_analysis") as find_finished,
+            mock.patch.object(tasks.TaskResult.objects, "create"),
+        ):
+            upload = save_upload(details, gzip.compress(PgnGame))
+        assert upload.content_hash is None  # nosec
+        assert upload.file.name == f"uploads/{upload.session_id}"  # nosec
+        find_finished.assert_not_called()
+        send_task.assert_called_once()
+
+
+def save_upload(details: FormDetails, data: bytes = PgnGame) -> api.PGNFileUpload:
+    """Upload games with `file_upload` and return the saved upload."""
+    upload = SimpleUploadedFile("games.pgn", data)
+    _ = api.file_upload(mock.MagicMock(), details, upload)
+    return api.PGNFileUpload.save.call_args.args[0]
+
+
+@pytest.fixture
+def chunked_upload(tmp_path):
+    """Create a chunked upload of three games, with no database.
+
+    Yields the id of the upload, the upload, the mock queueing its analysis and
+    the mock recording its task results.
+    """
+    storage = FileSystemStorage(location=tmp_path)
+    saved: list[api.PGNFileUpload] = []
+
+    def filter_uploads(session_id, source):
+        found = [u for u in saved if u.session_id == session_id]
+        return mock.Mock(first=mock.Mock(return_value=found[0] if found else None))
+
+    with (
+        mock.patch.object(
+            api.PGNFileUpload._meta.get_field("file"), "storage", storage
+        ),
+        mock.patch.object(
+            api.PGNFileUpload, "save", autospec=True, side_effect=saved.append
+        ),
+        mock.patch.object(api.PGNFileUpload.objects, "filter", filter_uploads),
+        mock.patch.object(api, "RoastRegister"),
+        mock.patch.object(tasks.transaction, "on_commit", lambda f: f()),
+        mock.patch.object(tasks.current_app, "send_task") as send_task,
+        mock.patch.object(tasks, "find_finished_analysis", return_value=None),
+        mock.patch.object(tasks.TaskResult.objects, "create") as create_result,
+    ):
+        details = ChunkedUploadDetails(usernames="playerOne", size=len(PgnGame) * 3)
+        response = api.create_chunked_upload(mock.MagicMock(), details)
+        yield uuid.UUID(response["upload_id"]), saved[0], send_task, create_result
+
+
+def put_chunk(upload_id: uuid.UUID, data: bytes, start: int, sha256: str | None = None):
+    request = RequestFactory().put(
+        f"/uploads/{upload_id}/",
+        data=data,
+        content_type="application/octet-stream",
+        headers={
+            "Content-Range": f"bytes {start}-{start + len(data) - 1}/*",
+            "X-Content-SHA256": sha256 or hashlib.sha256(data).hexdigest(),
+        },
+    )
+    return api.upload_chunk(request, upload_id)
+
+
+class TestChunkedUpload:
+    def test_chunks_are_appended_in_order(self, chunked_upload):
+        upload_id, upload_file, send_task, create_result = chunked_upload
+        size = len(PgnGame)
+        assert put_chunk(upload_id, PgnGame, 0)["offset"] == size  # nosec
+        # A retried chunk is acknowledged again, a later one must wait.
+        assert put_chunk(upload_id, PgnGame, 0)["offset"] == size  # nosec
+        assert put_chunk(upload_id, PgnGame, 2 * size)[0] == 409  # nosec
+        status, _ = put_chunk(upload_id, PgnGame, size, sha256="0" * 64)
+        assert status == 400  # nosec
+        offset = api.chunked_upload_offset(mock.MagicMock(), upload_id)
+        assert offset["offset"] == size  # nosec
+
+        assert put_chunk(upload_id, PgnGame, size)["offset"] == 2 * size  # nosec
+        finalize = FinalizeUpload(sha256=hashlib.sha256(PgnGame * 3).hexdigest())
+        status, _ = api.finalize_chunked_upload(mock.MagicMock(), upload_id, finalize)
+        assert status == 400  # nosec
+        send_task.assert_not_called()
+        create_result.assert_not_called()
+
+        assert put_chunk(upload_id, PgnGame, 2 * size)["offset"] == 3 * size  # nosec
+        response = api.finalize_chunked_upload(mock.MagicMock(), upload_id, finalize)
+        assert response == {"status_id": str(upload_id)}  # nosec
+        assert upload_file.upload_complete  # nosec
+        send_task.assert_called_once_with(
+            tasks.constants.ANALYZE_GAMES_TASK, args=[upload_file.session_id]
+        )
+        assert (  # nosec
+            create_result.call_args.kwargs["stage"] == tasks.AnalysisStage.FILE_UPLOAD
+        )
+        with upload_file.file.open("rb") as f:
+            assert f.read() == PgnGame * 3  # nosec
+        assert put_chunk(upload_id, PgnGame, 3 * size)[0] == 409  # nosec
+
+    def test_checksum_of_the_file_is_checked(self, chunked_upload):
+        upload_id, upload_file, send_task, _ = chunked_upload
+        for start in range(0, len(PgnGame) * 3, len(PgnGame)):
+            put_chunk(upload_id, PgnGame, start)
+        finalize = FinalizeUpload(sha256=hashlib.sha256(PgnGame).hexdigest())
+        status, _ = api.finalize_chunked_upload(mock.MagicMock(), upload_id, finalize)
+        assert status == 400  # nosec
+        assert not upload_file.upload_complete  # nosec
+        send_task.assert_not_called()
+
+    def test_invalid_content_range(self, chunked_upload):
+        upload_id, _, _, _ = chunked_upload
+        request = RequestFactory().put(
+            f"/uploads/{upload_id}/", data=PgnGame, content_type="text/plain"
+        )
+        assert api.upload_chunk(request, upload_id)[0] == 400  # nosec
+
+
+class TestExternalUser:
+    @pytest.mark.parametrize(
+        "platform, exists, task",
+        (
+            (
+                "chess.com",
+                "does_chess_dot_com_player_exists",
+                "pgn_get_chess_com_games_by_user",
+            ),
+            ("lichess", "does_lichess_player_exists", "pgn_get_lichess_games_by_user"),
+        ),
+    )
+    def test_roast_is_registered_before_dispatch(self, platform, exists, task):
+        calls = mock.Mock()
+        details = ExternalUser(username="playerOne", platform=platform)
+        with (
+            mock.patch.object(api, exists, return_value=True),
+            mock.patch.object(api, "RoastRegister", calls.roast),
+            mock.patch.object(getattr(api, task), "delay", calls.delay),
+        ):
+            response = api.external_user(mock.MagicMock(), details)
+        assert [name for name, _, _ in calls.mock_calls] == [  # nosec
+            "roast",
+            "roast().save",
+            "delay",
+        ]
+        assert str(calls.delay.call_args.args[0]) == response["status_id"]  # nosec
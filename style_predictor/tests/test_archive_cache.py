@@ -0,0 +1,195 @@
+import random
+import uuid
+from io import StringIO
+from unittest import mock
+
+import pytest
+import redis
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+
+from style_predictor.apis.pgn.archive_cache import (
+    ArchiveCache,
+    RedisArchiveCache,
+    archive_owner,
+)
+from style_predictor.management.commands import clear_legacy_archive_cache
+
+ArchivesUrl = "https://api.chess.com/pub/player/{}/games/{}/{:02}"
+Moves = ("e4", "e5", "Nf3", "Nc6", "Bb5", "a6", "Ba4", "Nf6", "O-O", "Be7", "d4")
+
+
+def make_archive(rng: random.Random, games: int = 20) -> str:
+    """Games with random moves and clocks, compressing about like real ones."""
+    pgns = []
+    for n in range(games):
+        moves = " ".join(
+            f"{i + 1}. {rng.choice(Moves)} {{[%clk 0:0{rng.randint(0, 9)}:"
+            f"{rng.randint(10, 59)}.{rng.randint(0, 9)}]}} {rng.choice(Moves)}"
+            for i in range(40)
+        )
+        pgns.append(
+            f'[Event "Live Chess"]\n[Site "Chess.com"]\n[White "playerOne"]\n'
+            f'[Black "opponent{rng.randint(0, 10**6)}"]\n[Result "1-0"]\n'
+            f'[WhiteElo "{rng.randint(800, 2400)}"]\n[Link "game/{n}"]\n\n'
+            f"{moves} 1-0\n"
+        )
+    return "\n".join(pgns)
+
+
+def cache_of(max_bytes: int = 2**30) -> ArchiveCache:
+    return ArchiveCache(LocMemCache(str(uuid.uuid4()), {}), max_bytes, timeout=60)
+
+
+class TestArchiveCache:
+    def test_archive_owner(self):
+        url = ArchivesUrl.format("PlayerOne", 2024, 1)
+        assert archive_owner(url) == "playerone"  # nosec
+        assert archive_owner("https://example.com/x") == "https://example.com/x"  # nosec
+
+    def test_ten_years_in_one_round_trip(self):
+        rng = random.Random(1)
+        archives = {
+            ArchivesUrl.format("playerone", year, month): make_archive(rng)
+            for year in range(2014, 2024)
+            for month in range(1, 13)
+        }
+        archive_cache = cache_of()
+        for url, pgn in archives.items():
+            archive_cache.set(url, pgn)
+
+        backend = mock.Mock(wraps=archive_cache.backend)
+        archive_cache.backend = backend
+        assert archive_cache.get_many(archives) == archives  # nosec
+        assert backend.get_many.call_count == 1  # nosec
+        assert backend.get.call_count == 0  # nosec
+
+        stats = archive_cache.stats()
+        assert stats["archives"] == 120  # nosec
+        assert stats["raw_bytes"] == sum(len(pgn) for pgn in archives.values())  # nosec
+        assert stats["bytes"] < stats["raw_bytes"] / 3  # nosec
+
+    def test_least_recently_used_users_are_evicted(self):
+        rng = random.Random(2)
+        pgn = make_archive(rng)
+        archive_cache = cache_of()
+        archive_cache.set(ArchivesUrl.format("first", 2020, 1), pgn)
+        size = archive_cache.stats()["bytes"]
+        archive_cache.max_bytes = size * 2
+        for user in ("first", "second"):
+            archive_cache.set(ArchivesUrl.format(user, 2020, 1), pgn)
+        # The archives of the first user were used more recently.
+        assert archive_cache.get_many([ArchivesUrl.format("first", 2020, 1)])  # nosec
+
+        archive_cache.set(ArchivesUrl.format("third", 2020, 1), pgn)
+        assert archive_cache.get_many(  # nosec
+            ArchivesUrl.format(user, 2020, 1) for user in ("first", "second", "third")
+        ).keys() == {
+            ArchivesUrl.format("first", 2020, 1),
+            ArchivesUrl.format("third", 2020, 1),
+        }
+        assert archive_cache.stats()["users"] == 2  # nosec
+        assert archive_cache.stats()["bytes"] <= size * 2  # nosec
+
+    def test_expired_users_leave_the_ledger(self):
+        archive_cache = cache_of()
+        with mock.patch("time.time", return_value=0):
+            archive_cache.set(ArchivesUrl.format("first", 2020, 1), "1. e4 e5 1-0")
+        with mock.patch("time.time", return_value=120):
+            archive_cache.set(ArchivesUrl.format("second", 2020, 1), "1. d4 d5 1-0")
+        assert archive_cache.stats()["users"] == 1  # nosec
+
+    def test_backend_errors_are_misses(self):
+        backend = mock.MagicMock()
+        backend.get_many.side_effect = ConnectionError("cache is down")
+        archive_cache = ArchiveCache(backend, 2**20, timeout=60)
+        archive_cache.set(ArchivesUrl.format("first", 2020, 1), "1. e4 e5 1-0")
+        assert archive_cache.get_many([ArchivesUrl.format("first", 2020, 1)]) == {}  # nosec
+
+
+@pytest.fixture
+def redis_client():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return fakeredis.FakeRedis()
+
+
+def redis_cache_of(client, max_bytes: int = 2**30) -> RedisArchiveCache:
+    return RedisArchiveCache(
+        LocMemCache(str(uuid.uuid4()), {}), client, max_bytes, timeout=60
+    )
+
+
+class TestRedisArchiveCache:
+    def test_workers_share_the_accounting(self, redis_client):
+        pgn = make_archive(random.Random(3))
+        first, second = redis_cache_of(redis_client), redis_cache_of(redis_client)
+        first.set(ArchivesUrl.format("first", 2020, 1), pgn)
+        second.set(ArchivesUrl.format("second", 2020, 1), pgn)
+        second.set(ArchivesUrl.format("second", 2020, 1), pgn)
+        stats = first.stats()
+        assert stats["users"] == 2 and stats["archives"] == 2  # nosec
+        assert stats["raw_bytes"] == 2 * len(pgn)  # nosec
+        assert stats == second.stats()  # nosec
+
+    def test_least_recently_used_users_are_evicted(self, redis_client):
+        pgn = make_archive(random.Random(2))
+        archive_cache = redis_cache_of(redis_client)
+        archive_cache.set(ArchivesUrl.format("first", 2020, 1), pgn)
+        size = archive_cache.stats()["bytes"]
+        archive_cache.max_bytes = size * 2
+        archive_cache.set(ArchivesUrl.format("second", 2020, 1), pgn)
+        assert archive_cache.get_many([ArchivesUrl.format("first", 2020, 1)])  # nosec
+
+        archive_cache.set(ArchivesUrl.format("third", 2020, 1), pgn)
+        assert archive_cache.get_many(  # nosec
+            ArchivesUrl.format(user, 2020, 1) for user in ("first", "second", "third")
+        ).keys() == {
+            ArchivesUrl.format("first", 2020, 1),
+            ArchivesUrl.format("third", 2020, 1),
+        }
+        assert archive_cache.stats() == {  # nosec
+            "users": 2,
+            "archives": 2,
+            "bytes": size * 2,
+            "raw_bytes": len(pgn) * 2,
+        }
+
+    def test_a_user_over_the_cap_is_kept(self, redis_client):
+        archive_cache = redis_cache_of(redis_client, max_bytes=1)
+        for month in (1, 2):
+            archive_cache.set(ArchivesUrl.format("first", 2020, month), "1. e4 e5 1-0")
+        assert archive_cache.stats()["archives"] == 2  # nosec
+
+    def test_redis_errors_still_store_archives(self):
+        client = mock.MagicMock()
+        client.register_script.return_value.side_effect = redis.ConnectionError()
+        archive_cache = RedisArchiveCache(
+            LocMemCache(str(uuid.uuid4()), {}), client, 2**20, timeout=60
+        )
+        url = ArchivesUrl.format("first", 2020, 1)
+        archive_cache.set(url, "1. e4 e5 1-0")
+        assert archive_cache.get_many([url]) == {url: "1. e4 e5 1-0"}  # nosec
+
+
+class TestClearLegacyArchiveCache:
+    def test_only_legacy_archives_are_deleted(self, redis_client):
+        legacy = [
+            cache.make_key(ArchivesUrl.format(user, 2020, 1))
+            for user in ("first", "second")
+        ]
+        kept = cache.make_key(f"archive:1:{ArchivesUrl.format('first', 2020, 1)}")
+        for key in [*legacy, kept]:
+            redis_client.set(key, b"pgn")
+        stdout = StringIO()
+        with mock.patch.object(
+            clear_legacy_archive_cache.redis.Redis,
+            "from_url",
+            return_value=redis_client,
+        ):
+            call_command("clear_legacy_archive_cache", dry_run=True, stdout=stdout)
+            assert redis_client.exists(*legacy) == 2  # nosec
+            call_command("clear_legacy_archive_cache", stdout=stdout)
+        assert redis_client.keys() == [kept.encode()]  # nosec
+        assert "Deleted 2 legacy archives" in stdout.getvalue()  # nosec
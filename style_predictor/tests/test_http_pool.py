@@ -0,0 +1,117 @@
+import asyncio
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import chessdotcom
+import pytest
+from django.core.cache.backends.locmem import LocMemCache
+
+from style_predictor.apis.pgn import http_pool, utils
+from style_predictor.apis.pgn.archive_cache import ArchiveCache
+from style_predictor.apis.pgn.rate_limit import (
+    AdaptiveConcurrency,
+    FetchMetrics,
+    RateLimiter,
+    TokenBucket,
+)
+
+
+@pytest.fixture
+def keep_alive_server():
+    """Answer every request over HTTP/1.1 keep-alive, counting the connections."""
+    state = {"connections": 0, "requests": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            state["connections"] += 1
+
+        def do_GET(self):
+            state["requests"] += 1
+            if "missing" in self.path:
+                body, status = b'{"message": "User not found"}', 404
+            else:
+                body, status = json.dumps({"username": "playerone"}).encode(), 200
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", state
+    server.shutdown()
+    server.server_close()
+
+
+def archive_cache() -> ArchiveCache:
+    return ArchiveCache(LocMemCache(str(uuid.uuid4()), {}), 2**20, timeout=None)
+
+
+def make_limiter() -> RateLimiter:
+    return RateLimiter(
+        TokenBucket(rate=1000, capacity=1000),
+        AdaptiveConcurrency(1),
+        FetchMetrics("test", LocMemCache(str(uuid.uuid4()), {})),
+    )
+
+
+async def running_loop() -> asyncio.AbstractEventLoop:
+    return asyncio.get_running_loop()
+
+
+class TestPooledSessions:
+    def test_archive_downloads_reuse_connections(self, keep_alive_server):
+        url, state = keep_alive_server
+        archives = [f"{url}/2024/{m:02}" for m in range(1, 7)]
+
+        async def fetch_twice():
+            # Two tasks of the same worker, on its single event loop.
+            try:
+                for month in (archives[:3], archives[3:]):
+                    _ = [a async for a in utils.iter_chess_dot_com_archives(month)]
+            finally:
+                await http_pool.close_aiohttp_session()
+
+        with (
+            mock.patch.object(utils, "get_archive_cache", return_value=archive_cache()),
+            mock.patch.object(utils, "get_rate_limiter", return_value=make_limiter()),
+        ):
+            asyncio.run(fetch_twice())
+        assert state["requests"] == 6  # nosec
+        assert state["connections"] == 1  # nosec
+
+    def test_chess_dot_com_requests_reuse_connections(self, keep_alive_server):
+        url, state = keep_alive_server
+        http_pool.get_requests_session.cache_clear()
+        with mock.patch.object(utils, "CHESS_DOT_COM_API", url):
+            for _ in range(3):
+                player = utils.get_chess_dot_com("/player/playerOne")
+                assert player["username"] == "playerone"  # nosec
+            with pytest.raises(chessdotcom.ChessDotComClientError) as exc:
+                utils.get_chess_dot_com("/player/missing")
+        http_pool.close_http_pool()
+        assert exc.value.status_code == 404  # nosec
+        assert exc.value.json == {"message": "User not found"}  # nosec
+        assert state["requests"] == 4  # nosec
+        assert state["connections"] == 1  # nosec
+
+    def test_worker_sessions_are_closed(self):
+        http_pool.open_http_pool()
+        loop = http_pool.palitra.run(running_loop())
+        session = http_pool._sessions[loop]
+        with mock.patch.object(utils.session, "close") as close_lichess_session:
+            http_pool.close_http_pool()
+        assert session.closed  # nosec
+        assert loop not in http_pool._sessions  # nosec
+        close_lichess_session.assert_called_once()
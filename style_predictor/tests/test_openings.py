@@ -0,0 +1,115 @@
+import glob
+from typing import NamedTuple
+
+import pytest
+
+from style_predictor.openings import (
+    MappedOpeningIndex,
+    OpeningFound,
+    OpeningIndex,
+    to_plies,
+    write_index,
+)
+
+
+class Opening(NamedTuple):
+    eco_code: str
+    full_name: str
+    moves: str
+
+
+Openings = [
+    Opening("C20", "King's Pawn Game", "1. e4 e5"),
+    Opening("C40", "King's Knight Opening", "1. e4 e5 2. Nf3"),
+    Opening("C60", "Ruy Lopez", "1. e4 e5 2. Nf3 Nc6 3. Bb5"),
+    Opening("C44", "King's Pawn Game: Tayler Opening", "1. e4 e5 2. Nf3 Nc6 3. Be2"),
+    Opening("B00", "King's Pawn Game", "1. e4"),
+]
+
+
+def load_tsv_openings() -> list[Opening]:
+    openings: list[Opening] = []
+    for path in sorted(glob.glob("data/*.tsv")):
+        with open(path, encoding="utf-8") as f:
+            next(f)
+            openings.extend(Opening(*line.strip().split("\t")) for line in f)
+    return sorted(openings, key=lambda opening: -len(opening.moves))
+
+
+class TestToPlies:
+    @pytest.mark.parametrize(
+        "move_str",
+        [
+            "1. e4 e5 2. Nf3",
+            "1.e4 e5 2.Nf3",
+            "1. e4 1... e5 2. Nf3",
+            " 1.e4  e5\n2.Nf3 ",
+        ],
+    )
+    def test_move_numbers_and_spacing_are_ignored(self, move_str):
+        assert to_plies(move_str) == ("e4", "e5", "Nf3")  # nosec
+
+    def test_empty(self):
+        assert to_plies("") == ()  # nosec
+
+
+class TestOpeningIndex:
+    @pytest.mark.parametrize(
+        "move_str,expected",
+        [
+            ("1. e4 e5 2. Nf3 Nc6 3. Bb5 a6", OpeningFound("C60", "Ruy Lopez")),
+            (
+                "1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5",
+                OpeningFound("C40", "King's Knight Opening"),
+            ),
+            ("1. e4 c5 2. Nf3", OpeningFound("B00", "King's Pawn Game")),
+            ("1. e4", OpeningFound("B00", "King's Pawn Game")),
+            ("1. d4 d5", None),
+            ("", None),
+        ],
+    )
+    def test_find_by_moves(self, move_str, expected):
+        index = OpeningIndex(Openings)
+        assert index.find_by_moves(to_plies(move_str)) == expected  # nosec
+
+    def test_fallbacks(self):
+        index = OpeningIndex(Openings)
+        assert index.fallbacks["C60"] == "Ruy Lopez"  # nosec
+        assert "A00" not in index.fallbacks  # nosec
+
+    def test_matches_linear_scan_on_tsv_openings(self):
+        openings = load_tsv_openings()
+        index = OpeningIndex(openings)
+        opening_plies = [to_plies(o.moves) for o in openings]
+        for opening in openings:
+            plies = to_plies(f"{opening.moves} Kh1 Kh8")
+            expected = next(
+                (
+                    OpeningFound(o.eco_code, o.full_name)
+                    for o, o_plies in zip(openings, opening_plies)
+                    if plies[: len(o_plies)] == o_plies
+                ),
+                None,
+            )
+            assert index.find_by_moves(plies) == expected  # nosec
+
+
+class TestMappedOpeningIndex:
+    def test_matches_opening_index(self, tmp_path):
+        openings = load_tsv_openings()
+        path = tmp_path / "openings.idx"
+        write_index(openings, path)
+        mapped = MappedOpeningIndex.open(path)
+        index = OpeningIndex(openings)
+        assert mapped.fallbacks == index.fallbacks  # nosec
+        games = [f"{opening.moves} Kh1 Kh8" for opening in openings]
+        games += ["1. e4 c5 2. Nf3 Kh8", "1. Kh1", ""]
+        for move_str in games:
+            plies = to_plies(move_str)
+            assert mapped.find_by_moves(plies) == index.find_by_moves(plies)  # nosec
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / "openings.idx"
+        path.write_bytes(b"\0" * 64)
+        with pytest.raises(ValueError):
+            MappedOpeningIndex.open(path)
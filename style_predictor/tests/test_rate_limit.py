@@ -0,0 +1,259 @@
+import asyncio
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import aiohttp
+import berserk
+import pytest
+import redis
+from django.core.cache.backends.locmem import LocMemCache
+
+from style_predictor.apis.pgn import rate_limit, utils
+from style_predictor.apis.pgn.archive_cache import ArchiveCache
+from style_predictor.apis.pgn.http_pool import close_aiohttp_session
+from style_predictor.apis.pgn.rate_limit import (
+    AdaptiveConcurrency,
+    FetchMetrics,
+    RateLimiter,
+    RedisTokenBucket,
+    TokenBucket,
+    backoff_delay,
+)
+
+PgnGame = """[Event "Live Chess"]
+[Site "https://lichess.org/game0001"]
+[Result "1-0"]
+
+1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0"""
+
+
+@pytest.fixture
+def fake_server():
+    """Serve `PgnGame` after answering the first `throttle` requests with 429.
+
+    Yields the url of the server and its state: the number of requests to
+    throttle, the requests received and the most requests seen in flight.
+    """
+    state = {"throttle": 0, "requests": 0, "in_flight": 0, "max_in_flight": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                state["requests"] += 1
+                state["in_flight"] += 1
+                state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+                throttled = state["throttle"] > 0
+                state["throttle"] -= throttled
+            time.sleep(0.02)
+            if throttled:
+                self.send_response(429)
+                self.send_header("Retry-After", "0")
+                self.end_headers()
+            else:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-chess-pgn")
+                self.end_headers()
+                self.wfile.write(PgnGame.encode())
+            with lock:
+                state["in_flight"] -= 1
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", state
+    server.shutdown()
+    server.server_close()
+
+
+def archive_cache() -> ArchiveCache:
+    return ArchiveCache(LocMemCache(str(uuid.uuid4()), {}), 2**20, timeout=None)
+
+
+def make_limiter(concurrency: int, rate: float = 1000, capacity: float = 1000):
+    metrics = FetchMetrics("test", LocMemCache(str(uuid.uuid4()), {}))
+    return RateLimiter(
+        TokenBucket(rate, capacity),
+        AdaptiveConcurrency(concurrency),
+        metrics,
+        backoff_base=0.01,
+        backoff_cap=0.05,
+    )
+
+
+class TestTokenBucket:
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=2, capacity=3)
+        assert [bucket.take(0) for _ in range(3)] == [0, 0, 0]  # nosec
+        assert bucket.take(0) == pytest.approx(0.5)  # nosec
+        assert bucket.take(0.5) == 0  # nosec
+        # Refilled to the capacity only.
+        assert [bucket.take(100) for _ in range(4)][-1] == pytest.approx(0.5)  # nosec
+
+    def test_acquire_waits_for_a_token(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+        assert asyncio.run(bucket.acquire()) == 0  # nosec
+        assert 0 < asyncio.run(bucket.acquire()) <= 0.05  # nosec
+
+    def test_redis_errors_let_requests_through(self):
+        client = mock.MagicMock()
+        client.register_script.return_value.side_effect = redis.ConnectionError()
+        bucket = RedisTokenBucket(client, "rate-limit:test", rate=1, capacity=1)
+        assert bucket.take(0) == 0  # nosec
+
+    def test_redis_wait_is_returned(self):
+        client = mock.MagicMock()
+        client.register_script.return_value.return_value = b"0.25"
+        bucket = RedisTokenBucket(client, "rate-limit:test", rate=4, capacity=1)
+        assert bucket.take_now() == 0.25  # nosec
+        client.register_script.return_value.assert_called_once_with(
+            keys=["rate-limit:test"], args=[4, 1]
+        )
+
+    def test_redis_script_burst_then_rate(self):
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        client = fakeredis.FakeRedis()
+        bucket = RedisTokenBucket(client, "rate-limit:test", rate=2, capacity=3)
+        assert [bucket.take_now() for _ in range(3)] == [0, 0, 0]  # nosec
+        assert bucket.take_now() == pytest.approx(0.5, abs=0.05)  # nosec
+        # Another bucket on the same key shares the tokens.
+        other = RedisTokenBucket(client, "rate-limit:test", rate=2, capacity=3)
+        assert other.take_now() > 0  # nosec
+        assert 0 < client.ttl("rate-limit:test") <= 3  # nosec
+
+    def test_redis_acquire_waits_for_a_token(self):
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        bucket = RedisTokenBucket(
+            fakeredis.FakeRedis(), "rate-limit:test", rate=50, capacity=1
+        )
+        with mock.patch.object(
+            rate_limit.asyncio, "to_thread", wraps=asyncio.to_thread
+        ) as to_thread:
+            assert asyncio.run(bucket.acquire()) == 0  # nosec
+            assert 0 < asyncio.run(bucket.acquire()) <= 0.05  # nosec
+        to_thread.assert_called_with(bucket.take_now)
+
+
+class TestBackoff:
+    def test_jitter_is_bounded(self):
+        rng = random.Random(7)
+        for attempt in range(10):
+            delays = [backoff_delay(attempt, 1, 30, rng) for _ in range(50)]
+            assert all(0 <= d <= min(30, 2**attempt) for d in delays)  # nosec
+            assert len(set(delays)) > 1  # nosec
+
+    def test_aimd(self):
+        concurrency = AdaptiveConcurrency(8, minimum=1, maximum=8)
+        concurrency.on_throttle()
+        concurrency.on_throttle()
+        assert int(concurrency.limit) == 2  # nosec
+        for _ in range(2):
+            concurrency.on_success()
+        assert int(concurrency.limit) == 3  # nosec
+        for _ in range(100):
+            concurrency.on_success()
+        assert concurrency.limit == 8  # nosec
+        for _ in range(10):
+            concurrency.on_throttle()
+        assert concurrency.limit == 1  # nosec
+
+    def test_limit_is_kept_across_batches(self):
+        rate_limit.get_concurrency.cache_clear()
+        limiter = rate_limit.get_rate_limiter("lichess", 4)
+
+        async def batch(limiter: RateLimiter) -> int:
+            async with limiter.request():
+                pass
+            return int(limiter.concurrency.limit)
+
+        with mock.patch.object(rate_limit.asyncio, "sleep"):
+            asyncio.run(limiter.on_throttle(0))
+        # Each batch runs in an event loop of its own.
+        assert asyncio.run(batch(limiter)) == 2  # nosec
+        assert asyncio.run(batch(rate_limit.get_rate_limiter("lichess", 4))) == 2  # nosec
+        assert rate_limit.get_rate_limiter("chess_dot_com", 4).concurrency.limit == 4  # nosec
+
+
+class TestFetchArchive:
+    def fetch(self, urls: list[str], limiter: RateLimiter) -> list[tuple[str, str]]:
+        async def fetch_all():
+            try:
+                return [item async for item in utils.iter_chess_dot_com_archives(urls)]
+            finally:
+                await close_aiohttp_session()
+
+        with (
+            mock.patch.object(utils, "get_archive_cache", return_value=archive_cache()),
+            mock.patch.object(utils, "get_rate_limiter", return_value=limiter),
+        ):
+            return asyncio.run(fetch_all())
+
+    def test_throttled_requests_are_retried(self, fake_server):
+        url, state = fake_server
+        state["throttle"] = 3
+        limiter = make_limiter(concurrency=4)
+        fetched = self.fetch([f"{url}/2024/0{m}" for m in range(1, 5)], limiter)
+        assert [pgn for _, pgn in fetched] == [PgnGame] * 4  # nosec
+        assert state["requests"] == 7  # nosec
+        metrics = limiter.metrics.get()
+        assert metrics["requests"] == state["requests"] == 7  # nosec
+        assert metrics["throttled_responses"] == 3  # nosec
+        assert metrics["throttled_ms"] > 0  # nosec
+        assert limiter.concurrency.limit < 4  # nosec
+
+    def test_requests_in_flight_are_limited(self, fake_server):
+        url, state = fake_server
+        limiter = make_limiter(concurrency=2)
+        fetched = self.fetch([f"{url}/2024/{m:02}" for m in range(1, 9)], limiter)
+        assert len(fetched) == 8  # nosec
+        assert state["max_in_flight"] <= 2  # nosec
+
+    def test_rate_is_limited(self, fake_server):
+        url, _ = fake_server
+        limiter = make_limiter(concurrency=8, rate=50, capacity=1)
+        started = time.perf_counter()
+        self.fetch([f"{url}/2024/{m:02}" for m in range(1, 6)], limiter)
+        assert time.perf_counter() - started >= 4 / 50  # nosec
+        assert limiter.metrics.get()["throttled_ms"] > 0  # nosec
+
+    def test_gives_up_when_still_throttled(self, fake_server):
+        url, state = fake_server
+        state["throttle"] = 100
+        limiter = make_limiter(concurrency=1)
+
+        async def fetch():
+            async with aiohttp.ClientSession() as session:
+                return await utils.fetch_archive(
+                    f"{url}/2024/01", session, limiter, max_attempts=3
+                )
+
+        assert asyncio.run(fetch()) == ""  # nosec
+        assert state["requests"] == 3  # nosec
+
+
+class TestLichessThrottling:
+    def test_throttled_export_is_retried(self, fake_server):
+        url, state = fake_server
+        state["throttle"] = 1
+        client = berserk.Client(base_url=url)
+        limiter = make_limiter(1)
+        with (
+            mock.patch.object(utils, "lichessClient", client),
+            mock.patch.object(utils, "get_rate_limiter", return_value=limiter),
+            mock.patch.object(rate_limit.settings, "FETCH_BACKOFF_BASE_SECONDS", 0.01),
+        ):
+            games = list(utils.iter_lichess_games("playerOne"))
+        assert games == [PgnGame]  # nosec
+        assert state["requests"] == 2  # nosec
+        metrics = limiter.metrics.get()
+        assert metrics["requests"] == 2  # nosec
+        assert metrics["throttled_responses"] == 1  # nosec
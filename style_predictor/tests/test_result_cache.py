@@ -0,0 +1,114 @@
+import uuid
+from unittest import mock
+
+import pytest
+import redis
+from django.core.cache.backends.locmem import LocMemCache
+
+from style_predictor.result_cache import RedisResultCache, ResultCache, content_key
+
+
+def result_cache_of(backend, max_entries: int = 8) -> ResultCache:
+    return ResultCache(backend, maxsize=2, timeout=None, max_entries=max_entries)
+
+
+class TestResultCache:
+    def test_content_key(self):
+        key = content_key(b"1. e4 e5 1-0", "playerOne")
+        assert key == content_key(memoryview(b"1. e4 e5 1-0"), "playerOne")  # nosec
+        assert key != content_key(b"1. e4 e5 1-0", "playerTwo")  # nosec
+        assert key != content_key(b"1. e4 e5 1-0")  # nosec
+
+    def test_least_recently_used_is_evicted(self):
+        backend = LocMemCache(str(uuid.uuid4()), {})
+        results = result_cache_of(backend)
+        for key in ("a", "b"):
+            results.set(key, {"count": 1})
+        assert results.get("a") == {"count": 1}  # nosec
+        results.set("c", {"count": 3})
+        assert results.stats() == {  # nosec
+            "hits": 1,
+            "misses": 0,
+            "size": 2,
+            "entries": 3,
+        }
+        for key in ("b", "c"):
+            backend.delete(results._backend_key(key))
+        assert results.get("b") is None  # nosec
+        assert results.get("a") == {"count": 1}  # nosec
+        assert results.stats()["hits"] == 2  # nosec
+        assert results.stats()["misses"] == 1  # nosec
+
+    def test_shared_store_is_bounded(self):
+        backend = LocMemCache(str(uuid.uuid4()), {})
+        results = result_cache_of(backend, max_entries=2)
+        for key in ("a", "b"):
+            results.set(key, {"count": 1})
+        assert result_cache_of(backend).get("a") is not None  # nosec
+        results._touch("a")
+        results.set("c", {"count": 3})
+        other = result_cache_of(backend)
+        assert other.get("b") is None  # nosec
+        assert other.get("a") is not None and other.get("c") is not None  # nosec
+        assert results.stats()["entries"] == 2  # nosec
+
+    def test_shared_between_processes(self):
+        backend = LocMemCache(str(uuid.uuid4()), {})
+        result_cache_of(backend).set("a", {"count": 1})
+        other = result_cache_of(backend)
+        assert other.get("a") == {"count": 1}  # nosec
+        assert other.get("b") is None  # nosec
+        assert result_cache_of(backend).stats()["hits"] == 1  # nosec
+        assert result_cache_of(backend).stats()["misses"] == 1  # nosec
+
+    def test_backend_errors_are_misses(self):
+        backend = mock.MagicMock()
+        backend.get.side_effect = ConnectionError("cache is down")
+        backend.set.side_effect = ConnectionError("cache is down")
+        results = result_cache_of(backend)
+        assert results.get("a") is None  # nosec
+        results.set("a", {"count": 1})
+        assert results.get("a") == {"count": 1}  # nosec
+
+
+@pytest.fixture
+def redis_client():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return fakeredis.FakeRedis()
+
+
+def redis_cache_of(backend, client, max_entries: int = 8) -> RedisResultCache:
+    return RedisResultCache(
+        backend, client, maxsize=2, timeout=None, max_entries=max_entries
+    )
+
+
+class TestRedisResultCache:
+    def test_workers_share_the_cap(self, redis_client):
+        backend = LocMemCache(str(uuid.uuid4()), {})
+        first = redis_cache_of(backend, redis_client, max_entries=2)
+        second = redis_cache_of(backend, redis_client, max_entries=2)
+        first.set("a", {"count": 1})
+        second.set("b", {"count": 2})
+        assert redis_cache_of(backend, redis_client).get("a") is not None  # nosec
+        second.set("c", {"count": 3})
+        reader = redis_cache_of(backend, redis_client)
+        assert reader.get("b") is None  # nosec
+        assert reader.get("a") is not None and reader.get("c") is not None  # nosec
+        assert first.stats() == {  # nosec
+            "hits": 3,
+            "misses": 1,
+            "size": 1,
+            "entries": 2,
+        }
+
+    def test_redis_errors_still_store_results(self):
+        client = mock.MagicMock()
+        client.register_script.return_value.side_effect = redis.ConnectionError()
+        client.zcard.side_effect = redis.ConnectionError()
+        backend = LocMemCache(str(uuid.uuid4()), {})
+        redis_cache_of(backend, client).set("a", {"count": 1})
+        results = redis_cache_of(backend, client)
+        assert results.get("a") == {"count": 1}  # nosec
+        assert results.stats()["entries"] == 0  # nosec
@@ -0,0 +1,823 @@
+import gzip
+import hashlib
+import io
+import json
+import tempfile
+import threading
+import uuid
+import zipfile
+from datetime import UTC, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import berserk
+import pytest
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from kombu.utils.json import dumps
+
+from style_predictor import tasks
+from style_predictor.apis.pgn import utils
+from style_predictor.apis.pgn.rate_limit import (
+    AdaptiveConcurrency,
+    FetchMetrics,
+    RateLimiter,
+    TokenBucket,
+)
+from style_predictor.pgn_parser.file_processing.blocks import (
+    BlockReader,
+    is_block_file,
+    iter_block_file,
+    iter_pgn,
+)
+from style_predictor.result_cache import ResultCache
+
+PgnGame = """[Event "Live Chess"]
+[Site "Chess.com"]
+[White "playerOne"]
+[Black "playerTwo"]
+[Result "1-0"]
+[TimeControl "60"]
+[WhiteElo "1200"]
+[BlackElo "1100"]
+[ECO "C50"]
+
+1. e4 {[%clk 0:00:59.2]} 1... e5 {[%clk 0:00:58.1]} 2. Qh5 Nc6 3. Bc4 Nf6
+4. Qxf7# 1-0
+
+"""
+
+
+@pytest.fixture(autouse=True)
+def result_cache():
+    """Give every test an empty cache of the analysis results."""
+    result_cache = ResultCache(
+        LocMemCache(str(uuid.uuid4()), {}), maxsize=8, timeout=None, max_entries=8
+    )
+    with mock.patch.object(tasks, "get_result_cache", return_value=result_cache):
+        yield result_cache
+
+
+@pytest.fixture
+def stored_pgn(tmp_path):
+    """Store `count` games and point the tasks at them."""
+
+    def store(count: int):
+        path = tmp_path / "upload.pgn"
+        path.write_text(PgnGame * count)
+        file_obj = mock.MagicMock(
+            usernames="playerOne", archive_ranges=None, content_hash=None
+        )
+        file_obj.file.name = "uploads/upload.pgn"
+        file_obj.file.open.side_effect = lambda mode: open(path, mode)
+        file_obj.file.storage = FileSystemStorage(location=tmp_path / "storage")
+        return path, file_obj
+
+    return store
+
+
+class TestClaimCheckChunks:
+    # Fixed chunks of 100 games whatever the size of the upload.
+    fixed_chunks = mock.patch.multiple(
+        tasks.settings,
+        ANALYSIS_CHUNK_MIN_GAMES=100,
+        ANALYSIS_BYTES_PER_SECOND=1,
+    )
+
+    def dispatch(self, file_obj) -> list:
+        with (
+            mock.patch.object(
+                tasks.PGNFileUpload.objects, "get", return_value=file_obj
+            ),
+            mock.patch.object(tasks, "chord") as chord,
+            self.fixed_chunks,
+        ):
+            tasks.pgn_analyze_games(uuid.uuid4())
+        return chord.call_args.args[0]
+
+    def test_chunk_payload_size_is_constant(self, stored_pgn):
+        _, small_file = stored_pgn(100)
+        small = self.dispatch(small_file)
+        _, large_file = stored_pgn(100 * 50)
+        large = self.dispatch(large_file)
+        assert len(small) == 1 and len(large) == 50  # nosec
+        # Only the digits of the offsets, chunk index and counts of the games
+        # taken from the index vary, never the pgn.
+        sizes = {len(dumps(dict(signature))) for signature in [*small, *large]}
+        assert max(sizes) < 1024  # nosec
+        assert max(sizes) - min(sizes) < 32  # nosec
+
+    def test_analyze_chunk_reads_its_range(self, stored_pgn):
+        path, file_obj = stored_pgn(250)
+        signatures = self.dispatch(file_obj)
+        with (
+            mock.patch.object(
+                tasks.default_storage,
+                "open",
+                side_effect=lambda name, mode: open(path, mode),
+            ),
+            mock.patch.object(tasks, "map_eco_code", return_value=[]),
+        ):
+            results = [
+                tasks.analyze_pgn_chunk(*signature.args) for signature in signatures
+            ]
+        assert [result["count"] for result in results] == [100, 100, 50]  # nosec
+        assert sum(result["win_count"] for result in results) == 250  # nosec
+
+    def test_only_games_with_openings_are_parsed(self, stored_pgn):
+        untagged = (
+            PgnGame.replace('[ECO "C50"]\n', "")
+            .replace('"1-0"', '"1/2-1/2"')
+            .replace('"1100"', '"?"')
+        )
+        path, file_obj = stored_pgn(0)
+        data = PgnGame * 3 + untagged * 2 + PgnGame * 2 + untagged
+        path.write_text(data)
+        session_id = uuid.uuid4()
+        with (
+            mock.patch.object(
+                tasks.PGNFileUpload.objects, "get", return_value=file_obj
+            ),
+            mock.patch.object(tasks, "chord") as chord,
+            self.fixed_chunks,
+        ):
+            tasks.pgn_analyze_games(session_id)
+        signatures, body = chord.call_args.args
+        with (
+            mock.patch.object(
+                tasks.default_storage,
+                "open",
+                side_effect=lambda name, mode: open(path, mode),
+            ),
+            mock.patch.object(tasks, "get_games", wraps=tasks.get_games) as parse,
+            mock.patch.object(tasks, "map_eco_code", return_value=[]),
+        ):
+            results = [tasks.analyze_pgn_chunk(*sig.args) for sig in signatures]
+            assert parse.call_count == 5  # nosec
+            full = tasks.analyze_pgn_buffer(
+                session_id, "playerOne", data.encode(), use_cache=False
+            )
+        # The chunks only hold the runs of games with an ECO tag.
+        second_run = 3 * len(PgnGame) + 2 * len(untagged)
+        assert [(sig.args[3], sig.args[4]) for sig in signatures] == [  # nosec
+            (0, 3 * len(PgnGame)),
+            (second_run, second_run + 2 * len(PgnGame)),
+        ]
+        # The games without one are counted from the index alone.
+        merged = tasks.merge_chunk_results(str(session_id), [*results, *body.args])
+        assert merged == tasks.merge_chunk_results(str(session_id), [full])  # nosec
+        assert merged["count"] == 8 and merged["draw_count"] == 3  # nosec
+
+
+class TestChunkPlan:
+    def test_plan_is_recorded(self, stored_pgn):
+        _, file_obj = stored_pgn(150)
+        with (
+            mock.patch.object(
+                tasks.PGNFileUpload.objects, "get", return_value=file_obj
+            ),
+            mock.patch.object(tasks, "chord") as chord,
+            mock.patch.multiple(
+                tasks.settings,
+                CELERY_WORKER_CONCURRENCY=4,
+                ANALYSIS_CHUNK_MIN_GAMES=10,
+            ),
+        ):
+            tasks.pgn_analyze_games(uuid.uuid4())
+        assert file_obj.chunk_plan["chunk_size"] == 19  # nosec
+        assert len(chord.call_args.args[0]) == file_obj.chunk_plan["chunks"] == 8  # nosec
+        file_obj.save.assert_called_with(update_fields=["chunk_plan"])
+
+    def test_plan_uses_the_index_built_at_ingest(self, tmp_path):
+        storage = FileSystemStorage(location=tmp_path)
+        with (
+            mock.patch.object(
+                tasks.PGNFileUpload._meta.get_field("file"), "storage", storage
+            ),
+            mock.patch.object(tasks.PGNFileUpload, "save", autospec=True) as save,
+            mock.patch.object(tasks.transaction, "on_commit"),
+            mock.patch.object(tasks, "find_finished_analysis", return_value=None),
+        ):
+            tasks.save_file_and_queue_task(
+                uuid.uuid4(), "playerOne", PgnGame * 150, tasks.FileSource.LICHESS
+            )
+            upload = save.call_args.args[0]
+            with (
+                mock.patch.object(
+                    tasks.PGNFileUpload.objects, "get", return_value=upload
+                ),
+                mock.patch.object(tasks, "build_game_index") as build_game_index,
+                mock.patch.object(tasks, "chord") as chord,
+                mock.patch.multiple(
+                    tasks.settings,
+                    CELERY_WORKER_CONCURRENCY=4,
+                    ANALYSIS_CHUNK_MIN_GAMES=10,
+                ),
+            ):
+                tasks.pgn_analyze_games(upload.session_id)
+        build_game_index.assert_not_called()
+        assert upload.chunk_plan["games"] == 150  # nosec
+        assert len(chord.call_args.args[0]) == 8  # nosec
+
+
+class TestCompressedUploads:
+    @pytest.mark.parametrize("compression", ("plain", "gzip", "zip"))
+    def test_upload_is_stored_in_blocks_before_splitting(self, tmp_path, compression):
+        data = pgn = (PgnGame * 30).encode()
+        if compression == "plain":
+            compressed = data
+        elif compression == "gzip":
+            compressed = gzip.compress(data)
+        else:
+            archive = io.BytesIO()
+            with zipfile.ZipFile(archive, "w") as z:
+                z.writestr("part1.pgn", data[: len(data) // 2])
+                z.writestr("part2.pgn", data[len(data) // 2 :])
+            compressed = archive.getvalue()
+            # Each member ends on an empty line.
+            pgn = data[: len(data) // 2] + b"\n\n" + data[len(data) // 2 :] + b"\n\n"
+        storage = FileSystemStorage(location=tmp_path)
+        with (
+            mock.patch.object(
+                tasks.PGNFileUpload._meta.get_field("file"), "storage", storage
+            ),
+            mock.patch.object(tasks.PGNFileUpload, "save") as save,
+            mock.patch.object(tasks.PGNFileUpload.objects, "get") as get,
+            mock.patch.object(tasks, "default_storage", storage),
+            mock.patch.object(tasks, "chord") as chord,
+            mock.patch.object(tasks, "map_eco_code", return_value=[]),
+            mock.patch.object(tasks.settings, "PGN_STORAGE_BLOCK_SIZE", 1000),
+        ):
+            upload = get.return_value = tasks.PGNFileUpload(usernames="playerOne")
+            upload.file.name = storage.save("uploads/games", ContentFile(compressed))
+            tasks.pgn_analyze_games(upload.session_id)
+            results = [
+                tasks.analyze_pgn_chunk(*signature.args)
+                for signature in chord.call_args.args[0]
+            ]
+        # Stored under the hash of the pgn, whatever its compression.
+        assert upload.content_hash == hashlib.sha256(pgn).hexdigest()  # nosec
+        assert upload.file.name == tasks.blob_name(upload.content_hash)  # nosec
+        assert [p.name for p in (tmp_path / "uploads").iterdir()] == []  # nosec
+        with storage.open(upload.file.name, "rb") as f:
+            assert is_block_file(f) and len(BlockReader(f).index) > 1  # nosec
+        save.assert_any_call(update_fields=["file", "content_hash"])
+        assert sum(result["count"] for result in results) == 30  # nosec
+
+    def test_block_files_are_only_trusted_from_the_workers(self, tmp_path):
+        data = (PgnGame * 30).encode()
+        blocks = b"".join(iter_block_file([data], 1000))
+        storage = FileSystemStorage(location=tmp_path)
+        with (
+            mock.patch.object(
+                tasks.PGNFileUpload._meta.get_field("file"), "storage", storage
+            ),
+            mock.patch.object(tasks.PGNFileUpload, "save") as save,
+        ):
+            sent = tasks.PGNFileUpload(usernames="playerOne")
+            sent.file.name = storage.save("uploads/games", ContentFile(blocks))
+            tasks.store_upload_in_blocks(sent)
+            stored = tasks.PGNFileUpload(usernames="playerOne")
+            stored.file.name = storage.save(
+                tasks.blob_name("0" * 64), ContentFile(blocks)
+            )
+            tasks.store_upload_in_blocks(stored)
+        # A block file sent by a client is pgn like any other upload.
+        assert sent.file.name == tasks.blob_name(sent.content_hash)  # nosec
+        with storage.open(sent.file.name, "rb") as f:
+            assert b"".join(iter_pgn(f)) == blocks  # nosec
+        assert stored.file.name == tasks.blob_name("0" * 64)  # nosec
+        save.assert_called_once_with(update_fields=["file", "content_hash"])
+
+    @pytest.mark.parametrize("content_hash", (None, "0" * 64))
+    @pytest.mark.parametrize(
+        "compressed, message",
+        (
+            (b"\x1f\x8b\x08garbage", "Corrupt gzip upload"),
+            (gzip.compress(b"\n" * 10**6), "Upload inflates past 1000 bytes."),
+        ),
+    )
+    def test_bad_upload_fails_the_session(
+        self, tmp_path, content_hash, compressed, message
+    ):
+        storage = FileSystemStorage(location=tmp_path)
+        with (
+            mock.patch.object(
+                tasks.PGNFileUpload._meta.get_field("file"), "storage", storage
+            ),
+            mock.patch.object(tasks.PGNFileUpload, "save"),
+            mock.patch.object(tasks.PGNFileUpload.objects, "get") as get,
+            mock.patch.object(tasks.TaskResult.objects, "create") as create_result,
+            mock.patch.object(tasks, "chord") as chord,
+            mock.patch.object(tasks.settings, "ANALYSIS_MAX_DECOMPRESSED_BYTES", 1000),
+        ):
+            upload = get.return_value = tasks.PGNFileUpload(
+                usernames="playerOne", content_hash=content_hash
+            )
+            upload.file.name = storage.save("uploads/games", ContentFile(compressed))
+            result = tasks.pgn_analyze_games(upload.session_id)
+        assert result == {"session_id": str(upload.session_id), "result": []}  # nosec
+        chord.assert_not_called()
+        kwargs = create_result.call_args.kwargs
+        assert kwargs["session_id"] == upload.session_id  # nosec
+        assert kwargs["status"] == "FAILURE"  # nosec
+        assert kwargs["stage"] == tasks.AnalysisStage.GAME  # nosec
+        assert message in kwargs["result"]["result"]["message"]  # nosec
+        # Nothing is left half written.
+        assert [p.name for p in tmp_path.rglob("*") if p.is_file()] == ["games"]  # nosec
+
+
+class TestDeduplication:
+    def test_fetched_games_are_stored_once(self, tmp_path):
+        storage = FileSystemStorage(location=tmp_path)
+        data = (PgnGame * 10).encode()
+        with (
+            mock.patch.object(
+                tasks.PGNFileUpload._meta.get_field("file"), "storage", storage
+            ),
+            mock.patch.object(tasks.PGNFileUpload, "save", autospec=True) as save,
+            mock.patch.object(tasks.transaction, "on_commit", lambda f: f()),
+            mock.patch.object(tasks.current_app, "send_task") as send_task,
+            mock.patch.object(tasks, "find_finished_analysis", return_value=None),
+        ):
+            for source in (tasks.FileSource.CHESSDOTCOM, tasks.FileSource.LICHESS):
+                with tempfile.TemporaryFile() as f:
+                    f.write(data)
+                    tasks.save_file_and_queue_task(uuid.uuid4(), "playerOne", f, source)
+            tasks.save_file_and_queue_task(uuid.uuid4(), "playerOne", data, source)
+        uploads = [call.args[0] for call in save.call_args_list]
+        assert {upload.content_hash for upload in uploads} == {  # nosec
+            hashlib.sha256(data).hexdigest()
+        }
+        assert {upload.file.name for upload in uploads} == {  # nosec
+            tasks.blob_name(uploads[0].content_hash)
+        }
+        assert sorted(p.name for p in (tmp_path / "blobs").iterdir()) == [  # nosec
+            f"{uploads[0].content_hash}.pgnb",
+            f"{uploads[0].content_hash}.pgnb.idx",
+        ]
+        assert send_task.call_count == 3  # nosec
+
+    def test_blob_is_only_linked_once_whole(self, tmp_path):
+        storage = FileSystemStorage(location=tmp_path)
+        data = (PgnGame * 10).encode()
+        content_hash = hashlib.sha256(data).hexdigest()
+        other = tasks.PGNFileUpload(content_hash=content_hash)
+        linked: list[bool] = []
+
+        def pieces():
+            for i in range(0, len(data), 100):
+                # Another session with the same content meanwhile.
+                linked.append(tasks.link_blob(other))
+                yield data[i : i + 100]
+
+        with mock.patch.object(
+            tasks.PGNFileUpload._meta.get_field("file"), "storage", storage
+        ):
+            name = tasks.store_blob(storage, content_hash, pieces())
+            assert tasks.link_blob(other)  # nosec
+        assert not any(linked)  # nosec
+        assert other.file.name == name == tasks.blob_name(content_hash)  # nosec
+        assert sorted(p.name for p in (tmp_path / "blobs").iterdir()) == [  # nosec
+            f"{content_hash}.pgnb",
+            f"{content_hash}.pgnb.idx",
+        ]
+
+    def test_upload_queued_with_its_pgn_is_stored(self, tmp_path):
+        storage = FileSystemStorage(location=tmp_path)
+        data = PgnGame * 10
+        with (
+            mock.patch.object(
+                tasks.PGNFileUpload._meta.get_field("file"), "storage", storage
+            ),
+            mock.patch.object(tasks.PGNFileUpload, "save", autospec=True) as save,
+            mock.patch.object(tasks.transaction, "on_commit", lambda f: f()),
+            mock.patch.object(tasks.current_app, "send_task") as send_task,
+            mock.patch.object(tasks, "find_finished_analysis", return_value=None),
+        ):
+            tasks.pgn_get_games_from_file(uuid.uuid4(), "playerOne", data)
+        (upload,) = [call.args[0] for call in save.call_args_list]
+        assert upload.source == tasks.FileSource.FILE  # nosec
+        assert upload.file.name == tasks.blob_name(  # nosec
+            hashlib.sha256(data.encode()).hexdigest()
+        )
+        send_task.assert_called_once()
+
+    def test_finished_analysis_is_reused(self):
+        upload = tasks.PGNFileUpload(usernames="playerOne", content_hash="0" * 64)
+        previous = tasks.PGNFileUpload(usernames="playerOne", content_hash="0" * 64)
+        game = tasks.TaskResult(
+            task_id="game-task",
+            session_id=previous.session_id,
+            status="SUCCESS",
+            stage=tasks.AnalysisStage.GAME,
+            result={"result": {"win_count": 10}},
+        )
+        with (
+            mock.patch.object(tasks.PGNFileUpload, "save"),
+            mock.patch.object(tasks, "find_finished_analysis", return_value=previous),
+            mock.patch.object(tasks.RoastRegister.objects, "filter") as roasts,
+            mock.patch.object(tasks.TaskResult.objects, "filter", return_value=[game]),
+            mock.patch.object(tasks.TaskResult.objects, "bulk_create") as bulk_create,
+            mock.patch.object(tasks.transaction, "on_commit", lambda f: f()),
+            mock.patch.object(tasks.current_app, "send_task") as send_task,
+        ):
+            roasts.return_value.first.return_value.include_roast = True
+            tasks.queue_analysis(upload)
+        (copied,) = bulk_create.call_args.args[0]
+        assert copied.task_id == f"{upload.session_id}:GAME"  # nosec
+        assert copied.session_id == upload.session_id  # nosec
+        assert copied.stage == tasks.AnalysisStage.GAME  # nosec
+        assert copied.result == game.result  # nosec
+        # Only the roast missing from the finished session is generated.
+        send_task.assert_called_once_with(
+            tasks.constants.ROASTING_TASK,
+            args=[str(upload.session_id), {"win_count": 10}],
+        )
+
+    def test_upload_stage_is_copied_for_uploads(self):
+        upload = tasks.PGNFileUpload(usernames="playerOne", content_hash="0" * 64)
+        previous = tasks.PGNFileUpload(usernames="playerOne", content_hash="0" * 64)
+        with (
+            mock.patch.object(tasks.PGNFileUpload, "save"),
+            mock.patch.object(tasks, "find_finished_analysis", return_value=previous),
+            mock.patch.object(tasks.RoastRegister.objects, "filter") as roasts,
+            mock.patch.object(
+                tasks.TaskResult.objects, "filter", return_value=[]
+            ) as results,
+            mock.patch.object(tasks.TaskResult.objects, "bulk_create"),
+            mock.patch.object(tasks.TaskResult.objects, "create") as create_result,
+            mock.patch.object(tasks.current_app, "send_task") as send_task,
+        ):
+            roasts.return_value.first.return_value = None
+            tasks.queue_analysis(upload, record_upload=True)
+        assert tasks.AnalysisStage.FILE_UPLOAD in results.call_args.kwargs["stage__in"]  # nosec
+        create_result.assert_not_called()
+        send_task.assert_not_called()
+
+    def test_finished_analysis_needs_same_usernames_and_cached_results(self):
+        upload = tasks.PGNFileUpload(
+            usernames="playerOne||PlayerTwo", content_hash="0" * 64, cached_results=[]
+        )
+        candidates = [
+            tasks.PGNFileUpload(usernames="playerOne"),
+            tasks.PGNFileUpload(
+                usernames="playerTwo||playerOne", cached_results=[{"win_count": 1}]
+            ),
+            match := tasks.PGNFileUpload(usernames="playertwo || playerone"),
+        ]
+        with (
+            mock.patch.object(tasks.PGNFileUpload.objects, "filter") as uploads,
+            mock.patch.object(tasks.TaskResult.objects, "filter") as results,
+        ):
+            uploads.return_value.exclude.return_value.order_by.return_value = candidates
+            assert tasks.find_finished_analysis(upload) is match  # nosec
+            results.return_value.exists.return_value = False
+            assert tasks.find_finished_analysis(upload) is None  # nosec
+        uploads.assert_called_with(content_hash="0" * 64)
+
+
+class TestResultCache:
+    def test_rerun_skips_parsing(self, result_cache):
+        data = (PgnGame * 20).encode()
+        with mock.patch.object(tasks, "map_eco_code", return_value=[]):
+            first = tasks.analyze_pgn_buffer("session-1", "playerOne", data)
+            with mock.patch.object(tasks, "get_games") as get_games:
+                rerun = tasks.analyze_pgn_buffer("session-2", "playerOne", data)
+                get_games.assert_not_called()
+            other_user = tasks.analyze_pgn_buffer("session-3", "playerTwo", data)
+        assert rerun == {**first, "session_id": "session-2"}  # nosec
+        assert other_user["win_count"] == 0 and other_user["loss_count"] == 20  # nosec
+        assert result_cache.stats() == {  # nosec
+            "hits": 1,
+            "misses": 2,
+            "size": 2,
+            "entries": 2,
+        }
+
+
+def save_to(path):
+    """Mock `save_file_and_queue_task`, copying the file it is given to `path`."""
+
+    def save(session_id, username, pgn_data, source, **kwargs):
+        pgn_data.seek(0)
+        path.write_bytes(pgn_data.read())
+
+    return mock.patch.object(tasks, "save_file_and_queue_task", side_effect=save)
+
+
+def analyse_saved_file(path, save: mock.MagicMock, backend) -> dict:
+    """Run the analysis of the file given to a mocked `save_file_and_queue_task`."""
+    session_id, username, _, _ = save.call_args.args
+    file_obj = mock.MagicMock(usernames=username, content_hash=None)
+    file_obj.file.name = "uploads/archives.pgn"
+    file_obj.file.open.side_effect = lambda mode: open(path, mode)
+    file_obj.file.storage = FileSystemStorage(location=path.parent / "storage")
+    # Stored in JSON fields.
+    for field, value in save.call_args.kwargs.items():
+        setattr(file_obj, field, json.loads(json.dumps(value)))
+
+    with (
+        mock.patch.object(tasks, "cache", backend),
+        mock.patch.object(tasks.PGNFileUpload.objects, "get", return_value=file_obj),
+        mock.patch.object(tasks.PGNFileUpload.objects, "filter") as uploads,
+        mock.patch.object(tasks.RoastRegister.objects, "filter") as roasts,
+        mock.patch.object(tasks, "chord") as chord,
+        mock.patch.object(tasks.finalize_analysis, "delay") as finalize,
+        mock.patch.object(
+            tasks.default_storage,
+            "open",
+            side_effect=lambda name, mode: open(path, mode),
+        ),
+        mock.patch.object(tasks, "map_eco_code", return_value=[]),
+    ):
+        uploads.return_value.first.return_value = file_obj
+        roasts.return_value.first.return_value = None
+        tasks.pgn_analyze_games(session_id)
+        if not chord.called:
+            return tasks.finalize_analysis(*finalize.call_args.args)
+        signatures, body = chord.call_args.args
+        results = [tasks.analyze_pgn_chunk(*signature.args) for signature in signatures]
+        return tasks.finalize_analysis(json.loads(json.dumps(results)), *body.args)
+
+
+class TestChessDotComArchives:
+    archives_url = "https://api.chess.com/pub/player/playerone/games"
+
+    def analyse(self, tmp_path, archives: dict[str, str], backend) -> tuple:
+        """Fetch and analyse the archives, returning the result and urls fetched."""
+        fetched: list[str] = []
+
+        async def fetch(urls: list[str]):
+            for url in reversed(urls):
+                fetched.append(url)
+                yield url, archives[url]
+
+        with (
+            mock.patch.object(tasks, "cache", backend),
+            mock.patch.object(
+                tasks, "get_chess_dot_com_archive_urls", return_value=list(archives)
+            ),
+            mock.patch.object(tasks, "iter_chess_dot_com_archives", fetch),
+            save_to(tmp_path / "archives.pgn") as save,
+        ):
+            tasks.pgn_get_chess_com_games_by_user(str(uuid.uuid4()), "playerOne")
+        return analyse_saved_file(tmp_path / "archives.pgn", save, backend), fetched
+
+    def test_completed_months_are_not_analysed_again(self, tmp_path):
+        today = datetime.now()
+        current = f"{self.archives_url}/{today.year}/{today.month:02}"
+        archives = {
+            f"{self.archives_url}/2020/01": PgnGame * 3,
+            f"{self.archives_url}/2020/02": PgnGame * 2,
+            current: PgnGame,
+        }
+        backend = LocMemCache("archives", {})
+        first, fetched = self.analyse(tmp_path, archives, backend)
+        assert sorted(fetched) == sorted(archives)  # nosec
+        assert first["result"]["count"] == 6  # nosec
+
+        rerun, fetched = self.analyse(tmp_path, archives, backend)
+        assert fetched == [current]  # nosec
+        assert rerun["result"] == first["result"]  # nosec
+
+    def test_archive_analysis_expires(self):
+        data = (PgnGame * 3).encode()
+        with (
+            mock.patch.object(tasks, "read_pgn_range", return_value=data),
+            mock.patch.object(tasks, "map_eco_code", return_value=[]),
+            mock.patch.object(tasks, "cache") as cache,
+            mock.patch.object(tasks.settings, "ARCHIVE_RESULT_TTL", 60),
+        ):
+            tasks.analyze_pgn_chunk(
+                "session", "playerOne", "uploads/games", 0, len(data), 0, "key"
+            )
+        cache.set.assert_called_once_with("key", mock.ANY, 60)
+        assert cache.set.call_args.args[1]["count"] == 3  # nosec
+
+
+class TestPipeline:
+    archives_url = "https://api.chess.com/pub/player/playerone/games"
+
+    @pytest.mark.parametrize(
+        "chunks_done_while_fetching,chunk_fails",
+        ((False, False), (True, False), (True, True)),
+    )
+    def test_archives_are_analysed_while_fetching(
+        self, tmp_path, chunks_done_while_fetching: bool, chunk_fails: bool
+    ):
+        today = datetime.now()
+        archives = {
+            f"{self.archives_url}/2020/01": PgnGame * 3,
+            f"{self.archives_url}/2020/02": "",
+            f"{self.archives_url}/{today.year}/{today.month:02}": PgnGame * 25,
+        }
+        backend = LocMemCache(str(uuid.uuid4()), {})
+        dispatched: list = []
+        events: list[str] = []
+
+        async def fetch(urls: list[str]):
+            for url in urls:
+                events.append("fetched")
+                yield url, archives[url]
+
+        def run_chunk(args, link, link_error):
+            events.append("dispatched")
+            if chunk_fails and events.count("dispatched") == 1:
+                error = ValueError("Chunk failed")
+                tasks.pipeline_chunk_failed(None, error, None, *link_error.args)
+                return
+            result = tasks.analyze_pgn_chunk(*args)
+            tasks.pipeline_chunk_done(json.loads(json.dumps(result)), *link.args)
+
+        def apply_async(args, kwargs, link, link_error, **options):
+            if chunks_done_while_fetching:
+                run_chunk(args, link, link_error)
+            else:
+                dispatched.append((args, link, link_error))
+
+        session_id = uuid.uuid4()
+        with (
+            mock.patch.object(tasks, "cache", backend),
+            mock.patch.object(
+                tasks, "default_storage", FileSystemStorage(location=tmp_path)
+            ),
+            mock.patch.object(
+                tasks, "get_chess_dot_com_archive_urls", return_value=list(archives)
+            ),
+            mock.patch.object(tasks, "iter_chess_dot_com_archives", fetch),
+            mock.patch.object(tasks.PGNFileUpload, "save"),
+            mock.patch.object(tasks.analyze_pgn_chunk, "apply_async", apply_async),
+            mock.patch.object(tasks.finalize_analysis, "delay") as finalize,
+            mock.patch.object(tasks, "map_eco_code", return_value=[]),
+            mock.patch.multiple(
+                tasks.settings, ANALYSIS_PIPELINE=True, ANALYSIS_CHUNK_MIN_GAMES=10
+            ),
+        ):
+            tasks.pgn_get_chess_com_games_by_user(session_id, "playerOne")
+            for args, link, link_error in dispatched:
+                finalize.assert_not_called()
+                run_chunk(args, link, link_error)
+
+        if chunks_done_while_fetching:
+            assert events[:2] == ["fetched", "dispatched"]  # nosec
+        # One chunk for the completed month, three for the current one.
+        assert events.count("dispatched") == 4  # nosec
+        finalize.assert_called_once()
+        objects = finalize.call_args.args[0]
+        assert {o["session_id"] for o in objects} == {str(session_id)}  # nosec
+        assert backend.get(tasks.pipeline_key(session_id, "pending")) is None  # nosec
+        # The archives are stored once by content, with their game index.
+        assert not (tmp_path / "uploads").exists()  # nosec
+        assert len(list((tmp_path / "blobs").glob("*.pgnb.idx"))) == 2  # nosec
+        if chunk_fails:
+            # The completed month failed, the session ends without it.
+            assert sum(o["count"] for o in objects) == 25  # nosec
+            return
+        assert len(objects) == 4  # nosec
+        assert sum(o["count"] for o in objects) == 28  # nosec
+        assert backend.get(tasks.archive_result_key(list(archives)[0], "playerOne"))  # nosec
+
+    def test_session_is_finalized_when_fetching_fails(self, tmp_path):
+        archives = [f"{self.archives_url}/2020/01", f"{self.archives_url}/2020/02"]
+        backend = LocMemCache(str(uuid.uuid4()), {})
+
+        async def fetch(urls: list[str]):
+            yield urls[0], PgnGame * 3
+            raise ConnectionError("Network error")
+
+        session_id = uuid.uuid4()
+        with (
+            mock.patch.object(tasks, "cache", backend),
+            mock.patch.object(
+                tasks, "default_storage", FileSystemStorage(location=tmp_path)
+            ),
+            mock.patch.object(tasks, "iter_chess_dot_com_archives", fetch),
+            mock.patch.object(tasks.PGNFileUpload, "save"),
+            mock.patch.object(tasks.analyze_pgn_chunk, "apply_async") as apply_async,
+            mock.patch.object(tasks.finalize_analysis, "delay") as finalize,
+        ):
+            with pytest.raises(ConnectionError):
+                tasks.pipeline_chess_dot_com_archives(
+                    session_id, "playerOne", archives, {}, []
+                )
+            finalize.assert_not_called()
+            # The chunk dispatched before the error still ends the session.
+            link = apply_async.call_args.kwargs["link"]
+            tasks.pipeline_chunk_done({"session_id": str(session_id)}, *link.args)
+        finalize.assert_called_once_with([{"session_id": str(session_id)}])
+        assert backend.get(tasks.pipeline_key(session_id, "pending")) is None  # nosec
+
+
+def lichess_game(n: int, started: datetime) -> str:
+    return PgnGame.replace(
+        '[Site "Chess.com"]',
+        f'[Site "https://lichess.org/game{n:04}"]\n'
+        f'[UTCDate "{started:%Y.%m.%d}"]\n[UTCTime "{started:%H:%M:%S}"]',
+    ).strip()
+
+
+@pytest.fixture
+def lichess_export():
+    """Serve the games export of lichess for the games in the returned list."""
+    games: list[tuple[datetime, str]] = []
+    requests: list[dict[str, list[str]]] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            requests.append(query)
+            since = int(query.get("since", ["0"])[0])
+            body = "\n\n\n".join(
+                pgn
+                for started, pgn in sorted(games, reverse=True)
+                if started.timestamp() * 1000 >= since
+            )
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-chess-pgn")
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = berserk.Client(base_url=f"http://127.0.0.1:{server.server_port}")
+    limiter = RateLimiter(
+        TokenBucket(rate=1000, capacity=1000),
+        AdaptiveConcurrency(1),
+        FetchMetrics("lichess", LocMemCache(str(uuid.uuid4()), {})),
+    )
+    with (
+        mock.patch.object(utils, "lichessClient", client),
+        mock.patch.object(utils, "get_rate_limiter", return_value=limiter),
+    ):
+        yield games, requests
+    server.shutdown()
+    server.server_close()
+
+
+class TestLichessWatermark:
+    def analyse(self, tmp_path, backend) -> dict:
+        with (
+            mock.patch.object(tasks, "cache", backend),
+            save_to(tmp_path / "lichess.pgn") as save,
+            mock.patch.multiple(
+                tasks.settings,
+                LICHESS_BATCH_GAMES=4,
+                LICHESS_WATERMARK_OVERLAP_SECONDS=3600,
+            ),
+        ):
+            tasks.pgn_get_lichess_games_by_user(str(uuid.uuid4()), "playerOne")
+        return analyse_saved_file(tmp_path / "lichess.pgn", save, backend)
+
+    def test_only_new_games_are_fetched(self, tmp_path, lichess_export):
+        games, requests = lichess_export
+        backend = LocMemCache("lichess", {})
+        start = datetime(2024, 5, 1, 12, tzinfo=UTC)
+        games.extend(
+            (
+                start + timedelta(minutes=10 * n),
+                lichess_game(n, start + timedelta(minutes=10 * n)),
+            )
+            for n in range(10)
+        )
+        first = self.analyse(tmp_path, backend)
+        assert first["result"]["count"] == 10  # nosec
+        assert "since" not in requests[-1]  # nosec
+
+        later = start + timedelta(days=1)
+        games.extend(
+            (
+                later + timedelta(minutes=n),
+                lichess_game(100 + n, later + timedelta(minutes=n)),
+            )
+            for n in range(3)
+        )
+        second = self.analyse(tmp_path, backend)
+        # Fetched from an hour before the latest game, without counting twice
+        # the games of the overlap.
+        watermark = start + timedelta(minutes=90)
+        assert requests[-1]["since"] == [  # nosec
+            str(int((watermark - timedelta(hours=1)).timestamp() * 1000))
+        ]
+        assert second["result"]["count"] == 13  # nosec
+        assert second["result"]["win_count"] == 13  # nosec
+
+        third = self.analyse(tmp_path, backend)
+        assert third["result"] == second["result"]  # nosec
+
+    def test_missing_analysis_fetches_everything(self, tmp_path, lichess_export):
+        games, requests = lichess_export
+        backend = LocMemCache("lichess-missing", {})
+        started = datetime(2024, 5, 1, 12, tzinfo=UTC)
+        games.append((started, lichess_game(1, started)))
+        self.analyse(tmp_path, backend)
+        state = backend.get(tasks.lichess_state_key("playerOne"))
+        backend.delete(state["result_keys"][0])
+        assert self.analyse(tmp_path, backend)["result"]["count"] == 1  # nosec
+        assert "since" not in requests[-1]  # nosec
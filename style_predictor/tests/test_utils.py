@@ -4,6 +4,7 @@ from style_predictor.utils import (
     average_rating,
     group_openings_with_eco,
     merge_game_objects,
+    plan_chunks,
     sort_openings,
 )
 
@@ -359,3 +360,28 @@ class TestUtils:
         res = game_objects[0]
         res = merge_game_objects(res, game_objects[1])
         assert res == expected  # nosec
+
+    @pytest.mark.parametrize(
+        "game_count,concurrency,expected_size,expected_chunks",
+        [
+            # Small uploads are spread over every worker process.
+            (150, 4, 19, 8),
+            # Large uploads are bounded by the target duration of a chunk.
+            (200_000, 4, 10485, 20),
+            # Tiny uploads keep the minimum chunk size.
+            (5, 4, 10, 1),
+            (0, 4, 10, 0),
+        ],
+    )
+    def test_plan_chunks(self, game_count, concurrency, expected_size, expected_chunks):
+        plan = plan_chunks(
+            game_count,
+            game_count * 2000,
+            concurrency=concurrency,
+            target_seconds=5,
+            bytes_per_second=4 * 1024 * 1024,
+            min_chunk_size=10,
+        )
+        assert plan["chunk_size"] == expected_size  # nosec
+        assert plan["chunks"] == expected_chunks  # nosec
+        assert plan["games"] == game_count  # nosec
@@ -1,4 +1,5 @@
 import logging
+import math
 from collections import defaultdict
 from typing import Any
 
@@ -64,3 +65,48 @@ def merge_game_objects(dest: dict[str, Any], src: dict[str, Any]):
         else:
             dest[k] = dest.get(k, 0) + v
     return dest
+
+
+def plan_chunks(
+    game_count: int,
+    total_bytes: int,
+    concurrency: int,
+    target_seconds: float,
+    bytes_per_second: int,
+    min_chunk_size: int,
+    waves_per_worker: int = 2,
+) -> dict[str, int | float]:
+    """Choose how many games go in each chunk of an analysis.
+
+    Chunks are sized to take about `target_seconds` on one worker process, and
+    made smaller when that would leave worker processes idle. Every process
+    gets `waves_per_worker` chunks so that uneven chunks still balance out.
+
+    Args:
+        game_count: number of games to analyse.
+        total_bytes: size of the pgn holding the games.
+        concurrency: number of worker processes available.
+        target_seconds: time a chunk should take to analyse.
+        bytes_per_second: pgn analysed per second by one worker process.
+        min_chunk_size: fewest games in a chunk.
+        waves_per_worker: chunks to give each worker process at least.
+
+    Returns:
+        The plan - inputs, chunk_size, number of chunks and the estimated
+        seconds per chunk.
+    """
+    avg_game_bytes = max(total_bytes / game_count, 1) if game_count else 1
+    by_duration = int(bytes_per_second * target_seconds / avg_game_bytes)
+    by_parallelism = math.ceil(game_count / max(concurrency * waves_per_worker, 1))
+    chunk_size = max(min_chunk_size, min(by_duration, by_parallelism), 1)
+    return {
+        "games": game_count,
+        "bytes": total_bytes,
+        "concurrency": concurrency,
+        "target_seconds": target_seconds,
+        "bytes_per_second": bytes_per_second,
+        "min_chunk_size": min_chunk_size,
+        "chunk_size": chunk_size,
+        "chunks": math.ceil(game_count / chunk_size),
+        "estimated_chunk_seconds": chunk_size * avg_game_bytes / bytes_per_second,
+    }